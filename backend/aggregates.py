@@ -0,0 +1,379 @@
+"""Shared aggregate queries for the routes and ExpenseService.
+
+Every function returns plain tuples / dicts computed in SQL over the current
+user's rows (see ``tenancy``); no ORM instances are loaded. Unbounded queries are answered from the monthly rollup tables,
+date-bounded ones from the daily running sums: a range total is the difference
+of two prefix-sum lookups per category/source, however long the range. Sums
+are taken over integer cents and only the results are converted to currency units.
+When the in-memory snapshot is enabled (see ``snapshot``) the same results are
+computed from the user's NumPy columns instead, except for ``range_summary``.
+"""
+import math
+from collections import namedtuple
+from datetime import date, timedelta
+from sqlalchemy import Date, and_, column, func, select, true, values
+from api import db, snapshot
+from api.money import CENTS_PER_UNIT, from_cents
+from api.models.expense import Expense
+from api.models.income import Income
+from api.models.rollup import ExpenseDailyTotal, ExpenseMonthlyRollup, IncomeDailyTotal, IncomeMonthlyRollup
+from api.tenancy import current_user_id, scoped
+
+GRANULARITIES = ('day', 'week', 'month')
+MAX_SUMMARY_BUCKETS = 1000
+MAX_ROLLING_WINDOW = 366
+
+# count, sum(amount), sum(amount^2) in currency units: enough for totals, mean and variance
+Stats = namedtuple('Stats', ['count', 'total', 'sum_sq'])
+CategoryStats = namedtuple('CategoryStats', ['category', 'count', 'total', 'sum_sq'])
+
+
+def mean(stats):
+    return stats.total / stats.count if stats.count else 0
+
+
+def stdev(stats):
+    """Sample standard deviation from the sum of squares (matches statistics.stdev)"""
+    if stats.count < 2:
+        return 0
+    variance = (stats.sum_sq - stats.total * stats.total / stats.count) / (stats.count - 1)
+    return math.sqrt(max(variance, 0))
+
+
+def _stats(row):
+    """Stats in currency units from a (count, sum(cents), sum(cents^2)) row"""
+    count, total_cents, sum_sq = row
+    return Stats(count or 0, from_cents(total_cents or 0), (sum_sq or 0) / CENTS_PER_UNIT ** 2)
+
+
+def _rollups(model, *columns):
+    """Query over the current user's rows of a rollup table"""
+    return scoped(db.session.query(*columns), model)
+
+
+def _snapshot_table(model):
+    """The current user's in-memory table for ``model``, or None to query the database"""
+    view = snapshot.current()
+    return view.table(model) if view is not None else None
+
+
+# ===== DAILY PREFIX SUMS =====
+# transaction model: (daily table, its key column, monthly rollup key column listing the keys, running-sum columns)
+_SERIES = {
+    Expense: (ExpenseDailyTotal, ExpenseDailyTotal.category, ExpenseMonthlyRollup.category,
+              (ExpenseDailyTotal.cumulative_count, ExpenseDailyTotal.cumulative_total_cents,
+               ExpenseDailyTotal.cumulative_sum_sq)),
+    Income: (IncomeDailyTotal, IncomeDailyTotal.source, IncomeMonthlyRollup.source,
+             (IncomeDailyTotal.cumulative_count, IncomeDailyTotal.cumulative_total_cents)),
+}
+
+
+def _prefix_sums(model, days):
+    """{key: {day: running sums through the day before ``day``}} for every category/source of ``model``.
+
+    One statement; each (key, day) pair costs two index seeks on the daily
+    table (the latest row before ``day``, then its running sums).
+    """
+    daily, key_column, rollup_key, cumulative = _SERIES[model]
+    days = sorted(set(days))
+    bounds = values(column('day', Date), name='bounds').data([(day,) for day in days]).cte('bounds')
+    keys = _rollups(rollup_key.class_, rollup_key.label('key')).distinct().subquery('keys')
+    user_id = current_user_id()
+    latest = select(func.max(daily.day)).where(
+        daily.user_id == user_id, key_column == keys.c.key, daily.day < bounds.c.day
+    ).correlate(keys, bounds).scalar_subquery()
+    rows = db.session.execute(
+        select(keys.c.key, bounds.c.day, *cumulative)
+        .select_from(bounds).join(keys, true())
+        .outerjoin(daily, and_(daily.user_id == user_id, key_column == keys.c.key, daily.day == latest))
+    )
+    sums = {}
+    for key, day, *running in rows:
+        sums.setdefault(key, {})[day] = tuple(value or 0 for value in running)
+    return sums
+
+
+def _difference(low, high):
+    return tuple(b - a for a, b in zip(low, high))
+
+
+def _range_sums(model, start, end):
+    """{key: (count, cents[, sum_sq])} over [start, end] (either bound optional); keys without rows in range are omitted"""
+    low = start or date.min
+    high = end + timedelta(days=1) if end else date.max
+    sums = {key: _difference(by_day[low], by_day[high]) for key, by_day in _prefix_sums(model, [low, high]).items()}
+    return {key: value for key, value in sums.items() if value[0]}
+
+
+def _bucket_sums(model, boundaries):
+    """{key: [(count, cents[, sum_sq]) for each bucket [boundaries[i], boundaries[i + 1])]}"""
+    return {key: [_difference(by_day[low], by_day[high]) for low, high in zip(boundaries, boundaries[1:])]
+            for key, by_day in _prefix_sums(model, boundaries).items()}
+
+
+def _next_bucket(day, granularity):
+    if granularity == 'month':
+        return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    if granularity == 'week':
+        return day + timedelta(days=7 - day.weekday())  # next Monday
+    return day + timedelta(days=1)
+
+
+def bucket_count(start, end, granularity):
+    """Number of buckets ``bucket_boundaries`` splits [start, end] into, without building them"""
+    if granularity == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    if granularity == 'week':
+        return (end.toordinal() - (start.toordinal() - start.weekday())) // 7 + 1
+    return (end - start).days + 1
+
+
+def bucket_boundaries(start, end, granularity):
+    """First day of every bucket covering [start, end], then the day after ``end`` (``end`` < date.max).
+
+    Buckets are aligned to calendar days, ISO weeks or months, so the first and
+    last ones may be partial.
+    """
+    stop = end + timedelta(days=1)
+    boundaries = [start]
+    while boundaries[-1] < stop:
+        try:
+            boundaries.append(min(_next_bucket(boundaries[-1], granularity), stop))
+        except OverflowError:  # the next bucket would start after date.max; ``stop`` ends this one
+            boundaries.append(stop)
+    return boundaries
+
+
+# ===== EXPENSES =====
+def expense_stats(start=None, end=None):
+    """Stats over all expenses, or over those dated within [start, end]"""
+    table = _snapshot_table(Expense)
+    if table is not None:
+        return _stats(table.stats(start, end))
+    if start is None and end is None:
+        row = _rollups(
+            ExpenseMonthlyRollup,
+            func.sum(ExpenseMonthlyRollup.count),
+            func.sum(ExpenseMonthlyRollup.total_cents),
+            func.sum(ExpenseMonthlyRollup.sum_sq)
+        ).one()
+    else:
+        row = [sum(column) for column in zip((0, 0, 0), *_range_sums(Expense, start, end).values())]
+    return _stats(row)
+
+
+def expense_category_stats(start=None, end=None):
+    """[CategoryStats] per category, largest total first"""
+    table = _snapshot_table(Expense)
+    if table is not None:
+        rows = sorted(table.by_label(start, end).items(), key=lambda item: item[1][1], reverse=True)
+        return [CategoryStats(category, *_stats(row)) for category, row in rows]
+    if start is None and end is None:
+        total = func.sum(ExpenseMonthlyRollup.total_cents)
+        rows = _rollups(
+            ExpenseMonthlyRollup,
+            ExpenseMonthlyRollup.category,
+            func.sum(ExpenseMonthlyRollup.count),
+            total,
+            func.sum(ExpenseMonthlyRollup.sum_sq)
+        ).group_by(ExpenseMonthlyRollup.category).order_by(total.desc()).all()
+        return [CategoryStats(category, *_stats(row)) for category, *row in rows]
+    rows = sorted(_range_sums(Expense, start, end).items(), key=lambda item: item[1][1], reverse=True)
+    return [CategoryStats(category, *_stats(row)) for category, row in rows]
+
+
+def expense_category_totals(start=None, end=None):
+    """{category: total}"""
+    return {row.category: row.total for row in expense_category_stats(start, end)}
+
+
+def _month_cents(model, rollup, start, end):
+    """[(month, cents)] for months with rows; date-bounded ranges come from month buckets of the prefix sums"""
+    table = _snapshot_table(model)
+    if table is not None:
+        return table.by_month(start, end)
+    if start is None and end is None:
+        return _rollups(
+            rollup,
+            rollup.month, func.sum(rollup.total_cents)
+        ).group_by(rollup.month).order_by(rollup.month).all()
+    first, last = _rollups(rollup, func.min(rollup.month), func.max(rollup.month)).one()
+    if first is None:
+        return []
+    start = start or date.fromisoformat(f'{first}-01')
+    end = end or _next_bucket(date.fromisoformat(f'{last}-01'), 'month') - timedelta(days=1)
+    if start > end:
+        return []
+    boundaries = bucket_boundaries(start, end, 'month')
+    buckets = [[0, 0] for _ in boundaries[1:]]
+    for sums in _bucket_sums(model, boundaries).values():
+        for bucket, (count, cents, *_) in zip(buckets, sums):
+            bucket[0] += count
+            bucket[1] += cents
+    return [(month_start.strftime('%Y-%m'), cents)
+            for month_start, (count, cents) in zip(boundaries, buckets) if count]
+
+
+def _expense_month_cents(start, end):
+    return _month_cents(Expense, ExpenseMonthlyRollup, start, end)
+
+
+def expense_month_totals(start=None, end=None):
+    """[(month, total)] ordered by month, month formatted as YYYY-MM"""
+    return [(month, from_cents(cents)) for month, cents in _expense_month_cents(start, end)]
+
+
+def count_expenses_above(threshold):
+    """Number of expenses strictly greater than ``threshold`` (a currency amount)"""
+    table = _snapshot_table(Expense)
+    if table is not None:
+        return table.count_above(threshold * CENTS_PER_UNIT)
+    return scoped(db.session.query(func.count(Expense.id)), Expense).filter(
+        Expense.amount_cents > threshold * CENTS_PER_UNIT
+    ).scalar() or 0
+
+
+# ===== INCOMES =====
+def income_totals(start=None, end=None):
+    """(count, total) over all incomes, or over those dated within [start, end]"""
+    table = _snapshot_table(Income)
+    if table is not None:
+        count, total = table.stats(start, end)[:2]
+    elif start is None and end is None:
+        count, total = _rollups(
+            IncomeMonthlyRollup,
+            func.sum(IncomeMonthlyRollup.count),
+            func.sum(IncomeMonthlyRollup.total_cents)
+        ).one()
+    else:
+        count, total = [sum(column) for column in zip((0, 0), *_range_sums(Income, start, end).values())]
+    return count or 0, from_cents(total or 0)
+
+
+def income_source_totals(start=None, end=None):
+    """{source: total}"""
+    table = _snapshot_table(Income)
+    if table is not None:
+        rows = [(source, cents) for source, (count, cents, _) in table.by_label(start, end).items()]
+    elif start is None and end is None:
+        rows = _rollups(
+            IncomeMonthlyRollup,
+            IncomeMonthlyRollup.source, func.sum(IncomeMonthlyRollup.total_cents)
+        ).group_by(IncomeMonthlyRollup.source).all()
+    else:
+        rows = [(source, cents) for source, (count, cents) in _range_sums(Income, start, end).items()]
+    return {source: from_cents(cents) for source, cents in rows}
+
+
+def _income_month_cents(start, end):
+    return _month_cents(Income, IncomeMonthlyRollup, start, end)
+
+
+def income_month_totals(start=None, end=None):
+    """[(month, total)] ordered by month"""
+    return [(month, from_cents(cents)) for month, cents in _income_month_cents(start, end)]
+
+
+# ===== COMBINED =====
+def monthly_cash_flow(start=None, end=None):
+    """[{'month', 'income', 'expenses', 'net'}] sorted by month"""
+    monthly_data = {}
+    for month, cents in _income_month_cents(start, end):
+        monthly_data.setdefault(month, {'income': 0, 'expenses': 0})['income'] = cents
+    for month, cents in _expense_month_cents(start, end):
+        monthly_data.setdefault(month, {'income': 0, 'expenses': 0})['expenses'] = cents
+
+    return [
+        {'month': month, 'income': from_cents(data['income']), 'expenses': from_cents(data['expenses']),
+         'net': from_cents(data['income'] - data['expenses'])}
+        for month, data in sorted(monthly_data.items())
+    ]
+
+
+def cash_flow_for_months(months):
+    """monthly_cash_flow rows for the given YYYY-MM keys only, read from the rollups (or the snapshot)"""
+    months = sorted(months)
+    monthly_data = {month: {'income': 0, 'expenses': 0} for month in months}
+    view = snapshot.current()
+    if view is not None:
+        for name, table in (('income', view.incomes), ('expenses', view.expenses)):
+            for month, cents in table.month_cents(months).items():
+                monthly_data[month][name] = cents
+    else:
+        for month, cents in _rollups(
+            IncomeMonthlyRollup,
+            IncomeMonthlyRollup.month, func.sum(IncomeMonthlyRollup.total_cents)
+        ).filter(IncomeMonthlyRollup.month.in_(months)).group_by(IncomeMonthlyRollup.month):
+            monthly_data[month]['income'] = cents
+        for month, cents in _rollups(
+            ExpenseMonthlyRollup,
+            ExpenseMonthlyRollup.month, func.sum(ExpenseMonthlyRollup.total_cents)
+        ).filter(ExpenseMonthlyRollup.month.in_(months)).group_by(ExpenseMonthlyRollup.month):
+            monthly_data[month]['expenses'] = cents
+
+    return [
+        {'month': month, 'income': from_cents(data['income']), 'expenses': from_cents(data['expenses']),
+         'net': from_cents(data['income'] - data['expenses'])}
+        for month, data in monthly_data.items()
+    ]
+
+
+def range_summary(start, end, granularity='day', window=None):
+    """Income/expense totals over [start, end], split into day/week/month buckets.
+
+    Everything comes from the daily prefix sums: per category/source, one lookup
+    per bucket boundary. With ``window`` each bucket also carries the average daily
+    expenses and income over the ``window`` days ending on its last day.
+    """
+    boundaries = bucket_boundaries(start, end, granularity)
+    spans = list(zip(boundaries, boundaries[1:]))
+    rolling_starts = [date.fromordinal(max(1, high.toordinal() - window)) for _, high in spans] if window else []
+
+    buckets = [{'start': low.isoformat(), 'end': (high - timedelta(days=1)).isoformat()} for low, high in spans]
+    totals = {}
+    cents = {}
+    for model, name, count_name, breakdown in ((Expense, 'expenses', 'expense_count', 'by_category'),
+                                               (Income, 'income', 'income_count', 'by_source')):
+        bucket_cents = cents[name] = [0] * len(spans)
+        rolling_cents = [0] * len(spans)
+        by_key = {}
+        count = 0
+        for bucket in buckets:
+            bucket[breakdown] = {}
+        for key, by_day in sorted(_prefix_sums(model, boundaries + rolling_starts).items()):
+            key_count, key_cents = _difference(by_day[boundaries[0]], by_day[boundaries[-1]])[:2]
+            if key_count:
+                count += key_count
+                by_key[key] = from_cents(key_cents)
+            for index, (low, high) in enumerate(spans):
+                span_count, span_cents = _difference(by_day[low], by_day[high])[:2]
+                if span_count:
+                    bucket_cents[index] += span_cents
+                    buckets[index][breakdown][key] = from_cents(span_cents)
+                if window:
+                    rolling_cents[index] += by_day[high][1] - by_day[rolling_starts[index]][1]
+        for index, bucket in enumerate(buckets):
+            bucket[name] = from_cents(bucket_cents[index])
+            if window:
+                bucket[f'rolling_avg_{name}'] = round(from_cents(rolling_cents[index]) / window, 2)
+        totals[name] = from_cents(sum(bucket_cents))
+        totals[count_name] = count
+        totals[breakdown] = by_key
+
+    for index, bucket in enumerate(buckets):
+        bucket['net'] = from_cents(cents['income'][index] - cents['expenses'][index])
+    totals['net'] = from_cents(sum(cents['income']) - sum(cents['expenses']))
+    return {'from': start.isoformat(), 'to': end.isoformat(), 'granularity': granularity, 'window': window,
+            'totals': totals, 'buckets': buckets}
+
+
+def dashboard_delta(months):
+    """Dashboard totals plus the cash flow of the touched months, for live update clients"""
+    total_expenses = expense_stats().total
+    total_income = income_totals()[1]
+    return {
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_balance': total_income - total_expenses,
+        'monthly_data': cash_flow_for_months(months)
+    }
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""Vectorized analytics engine behind /api/insights.
+
+Expenses are loaded into NumPy columns straight from a SQL cursor (no ORM
+instances). A column position is either one transaction or one
+month x category rollup row; both carry (count, total, sum_sq) so the same
+vectorized code serves the rollup store and raw transaction scans.
+
+Totals are int64 cents. Grouped sums go through float64 ``bincount``, which is
+exact for integers below 2**53, and are converted to currency units last.
+"""
+import numpy as np
+from sqlalchemy import Float, Integer, cast, extract, func, literal, select
+from api import db, snapshot
+from api.money import CENTS_PER_UNIT
+from api.models.expense import Expense
+from api.models.rollup import ExpenseMonthlyRollup
+from api.tenancy import scoped
+
+# Coefficient of variation above which a category is reported as high-variance
+HIGH_VARIANCE_CV = 1.0
+
+
+class ExpenseColumns:
+    """Parallel NumPy arrays describing expenses, with dictionary-encoded categories"""
+    __slots__ = ('months', 'category_codes', 'categories', 'counts', 'totals', 'sum_sq', 'per_transaction')
+
+    def __init__(self, months, category_codes, categories, counts, totals, sum_sq, per_transaction):
+        self.months = months                  # int64 month index: year * 12 + month - 1
+        self.category_codes = category_codes  # int64 index into categories
+        self.categories = categories          # category names in first-seen order
+        self.counts = counts
+        self.totals = totals                  # int64 cents
+        self.sum_sq = sum_sq                  # float64 cents^2
+        self.per_transaction = per_transaction
+
+    def __len__(self):
+        return len(self.totals)
+
+    @classmethod
+    def from_rows(cls, months, categories, counts, totals, sum_sq, per_transaction):
+        # Dictionary-encode in one pass; far cheaper than np.unique on strings
+        dictionary = {}
+        codes = np.fromiter(
+            (dictionary.setdefault(name, len(dictionary)) for name in categories),
+            dtype=np.int64, count=len(categories)
+        )
+        return cls(
+            np.asarray(months, dtype=np.int64),
+            codes,
+            np.array(list(dictionary), dtype=object),
+            np.asarray(counts, dtype=np.int64),
+            np.asarray(totals, dtype=np.int64),
+            np.asarray(sum_sq, dtype=np.float64),
+            per_transaction
+        )
+
+    @classmethod
+    def empty(cls, per_transaction=False):
+        return cls.from_rows([], [], [], [], [], per_transaction)
+
+
+def _month_index(year_expr, month_expr):
+    return year_expr * 12 + month_expr - 1
+
+
+def _load(stmt, per_transaction):
+    rows = db.session.execute(stmt).all()
+    if not rows:
+        return ExpenseColumns.empty(per_transaction)
+    return ExpenseColumns.from_rows(*zip(*rows), per_transaction=per_transaction)
+
+
+def load_expense_columns():
+    """Columns from the current user's month x category rollups (a few hundred rows at most)"""
+    view = snapshot.current()
+    if view is not None:
+        return ExpenseColumns(*view.expenses.month_label_rows(), per_transaction=False)
+    month = ExpenseMonthlyRollup.month
+    return _load(scoped(select(
+        _month_index(cast(func.substr(month, 1, 4), Integer), cast(func.substr(month, 6, 2), Integer)),
+        ExpenseMonthlyRollup.category,
+        ExpenseMonthlyRollup.count,
+        ExpenseMonthlyRollup.total_cents,
+        ExpenseMonthlyRollup.sum_sq
+    ), ExpenseMonthlyRollup), per_transaction=False)
+
+
+def load_transaction_columns():
+    """Columns with one position per expense of the current user, read directly from the expenses table"""
+    return _load(scoped(select(
+        _month_index(extract('year', Expense.date), extract('month', Expense.date)),
+        Expense.category,
+        literal(1),
+        Expense.amount_cents,
+        cast(Expense.amount_cents, Float) * Expense.amount_cents
+    ), Expense), per_transaction=True)
+
+
+def _month_label(index):
+    return f"{index // 12}-{index % 12 + 1:02d}"
+
+
+def _sample_stdev(counts, totals, sum_sq):
+    """Element-wise (or scalar) sample standard deviation from count / sum / sum of squares"""
+    counts = np.asarray(counts, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (sum_sq - totals * totals / counts) / (counts - 1)
+    variance = np.where(counts > 1, variance, 0.0)
+    return np.sqrt(np.clip(variance, 0.0, None))
+
+
+def generate_ai_insights(columns, income_totals, count_above=None):
+    """Generate AI-powered financial insights and recommendations.
+
+    ``income_totals`` is a (count, total) pair. ``count_above(threshold)`` must
+    count expenses above a threshold when ``columns`` holds rollups rather
+    than individual transactions.
+    """
+    insights = {
+        'financial_health': {},
+        'spending_patterns': {},
+        'ai_recommendations': [],
+        'behavioral_insights': [],
+        'future_predictions': {}
+    }
+
+    income_count, total_income = income_totals
+    expense_count = int(columns.counts.sum())
+    if not expense_count and not income_count:
+        return insights
+
+    # Calculate basic metrics (integer cents summed exactly, then converted)
+    total_expenses = int(columns.totals.sum()) / CENTS_PER_UNIT
+    net_savings = total_income - total_expenses
+    savings_rate = (net_savings / total_income * 100) if total_income > 0 else 0
+
+    # Financial Health Analysis
+    insights['financial_health'] = {
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_savings': net_savings,
+        'savings_rate': savings_rate,
+        'financial_score': min(100, max(0, savings_rate + 50))  # Score out of 100
+    }
+
+    # Spending Pattern Analysis
+    n_categories = len(columns.categories)
+    category_counts = np.bincount(columns.category_codes, weights=columns.counts, minlength=n_categories)
+    category_totals = np.bincount(columns.category_codes, weights=columns.totals, minlength=n_categories) / CENTS_PER_UNIT
+    category_sum_sq = (np.bincount(columns.category_codes, weights=columns.sum_sq, minlength=n_categories)
+                       / CENTS_PER_UNIT ** 2)
+    category_breakdown = dict(zip(columns.categories.tolist(), category_totals.tolist()))
+
+    monthly_trends = {}
+    if len(columns):
+        first_month = int(columns.months.min())
+        offsets = columns.months - first_month
+        month_totals = np.bincount(offsets, weights=columns.totals) / CENTS_PER_UNIT
+        month_present = np.bincount(offsets, weights=columns.counts) > 0
+        month_indexes = np.flatnonzero(month_present) + first_month
+        monthly_trends = dict(zip(
+            [_month_label(int(index)) for index in month_indexes],
+            month_totals[month_present].tolist()
+        ))
+
+    top = np.argsort(-category_totals, kind='stable')[:3]
+    category_stdev = _sample_stdev(category_counts, category_totals, category_sum_sq)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        category_cv = np.where(category_totals > 0, category_stdev * category_counts / category_totals, 0.0)
+    high_variance = np.flatnonzero(category_cv > HIGH_VARIANCE_CV)
+
+    insights['spending_patterns'] = {
+        'category_breakdown': category_breakdown,
+        'monthly_trends': monthly_trends,
+        'top_categories': [(columns.categories[i], float(category_totals[i])) for i in top],
+        'high_variance_categories': [columns.categories[i] for i in high_variance]
+    }
+
+    # AI Recommendations based on patterns
+    recommendations = []
+
+    # Savings rate recommendations
+    if savings_rate < 10:
+        recommendations.append({
+            'title': 'Emergency: Low Savings Rate',
+            'message': f'Your savings rate is {savings_rate:.1f}%. Aim for at least 20%. Consider cutting non-essential expenses immediately.',
+            'priority': 'critical',
+            'action': 'Reduce discretionary spending by 30%',
+            'potential_savings': total_expenses * 0.3
+        })
+    elif savings_rate < 20:
+        recommendations.append({
+            'title': 'Improve Savings Rate',
+            'message': f'Your savings rate is {savings_rate:.1f}%. Try to reach 20% for better financial security.',
+            'priority': 'high',
+            'action': 'Identify and reduce top 2 expense categories',
+            'potential_savings': total_expenses * 0.1
+        })
+    else:
+        recommendations.append({
+            'title': 'Excellent Savings!',
+            'message': f'Great work! Your savings rate of {savings_rate:.1f}% is healthy. Consider investing surplus.',
+            'priority': 'low',
+            'action': 'Explore investment opportunities',
+            'potential_savings': 0
+        })
+
+    # Category-specific recommendations
+    if category_breakdown.get('Food', 0) > total_income * 0.25:
+        recommendations.append({
+            'title': 'Food Budget Optimization',
+            'message': 'Food expenses are high. Try meal prep, local markets, and home cooking.',
+            'priority': 'medium',
+            'action': 'Reduce food spending by 20%',
+            'potential_savings': category_breakdown.get('Food', 0) * 0.2
+        })
+
+    if category_breakdown.get('Entertainment', 0) > total_income * 0.15:
+        recommendations.append({
+            'title': 'Entertainment Budget Control',
+            'message': 'Consider free activities and set entertainment budget limits.',
+            'priority': 'medium',
+            'action': 'Set monthly entertainment budget',
+            'potential_savings': category_breakdown.get('Entertainment', 0) * 0.3
+        })
+
+    # Behavioral insights using AI-like analysis
+    behavioral_insights = []
+
+    if expense_count > 5:
+        avg_expense = total_expenses / expense_count
+        std_expense = float(_sample_stdev(expense_count, total_expenses, columns.sum_sq.sum() / CENTS_PER_UNIT ** 2))
+        threshold = avg_expense + std_expense
+
+        if columns.per_transaction:
+            high_variance_count = int(np.count_nonzero(columns.totals > threshold * CENTS_PER_UNIT))
+        else:
+            high_variance_count = count_above(threshold)
+
+        if high_variance_count > expense_count * 0.3:
+            behavioral_insights.append({
+                'pattern': 'Impulse Spending Detected',
+                'description': 'You have irregular high-value expenses, suggesting impulse purchases.',
+                'recommendation': 'Implement a 24-hour waiting period for purchases over ₹' + str(int(avg_expense)),
+                'confidence': 85
+            })
+
+    # Check for recurring patterns
+    if np.count_nonzero(category_counts) < 4 and expense_count > 10:
+        behavioral_insights.append({
+            'pattern': 'Limited Spending Categories',
+            'description': 'Your spending is concentrated in few categories, showing good discipline.',
+            'recommendation': 'Maintain this focused approach but ensure you\'re not missing important categories like healthcare.',
+            'confidence': 78
+        })
+
+    insights['ai_recommendations'] = recommendations
+    insights['behavioral_insights'] = behavioral_insights
+
+    # Future predictions (simple trend analysis)
+    if len(monthly_trends) >= 2:
+        trend_values = month_totals[month_present]
+        recent_trend = float(np.diff(trend_values[-2:])[0])
+        insights['future_predictions'] = {
+            'monthly_trend': recent_trend,
+            'predicted_next_month': float(trend_values[-1]) + recent_trend,
+            'trend_direction': 'increasing' if recent_trend > 0 else 'decreasing'
+        }
+
+    return insights
\ No newline at end of file
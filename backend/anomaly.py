@@ -0,0 +1,43 @@
+from api import db
+from datetime import datetime
+
+
+class CategoryRunningStats(db.Model):
+    """Welford running mean/variance of expense amounts per user x category"""
+    __tablename__ = 'category_running_stats'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0.0)
+    m2 = db.Column(db.Float, nullable=False, default=0.0)  # sum of squared deviations from the mean
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def __repr__(self):
+        return f'<CategoryRunningStats {self.category}: n={self.count} mean={self.mean:.2f}>'
+
+
+class ExpenseAnomaly(db.Model):
+    """An expense flagged as unusually large for its category when it was recorded"""
+    __tablename__ = 'expense_anomalies'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    expense_id = db.Column(db.Integer, db.ForeignKey('expenses.id', ondelete='CASCADE'), nullable=False, index=True)
+    category = db.Column(db.String(50), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    category_mean = db.Column(db.Float, nullable=False)
+    detected_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'amount': self.amount,
+            'category': self.category,
+            'reason': f'This expense is {self.amount/self.category_mean:.1f}x higher than your average {self.category.lower()} expense of ₹{self.category_mean:.2f}'
+        }
+
+    def __repr__(self):
+        return f'<ExpenseAnomaly expense={self.expense_id} {self.category}: ${self.amount}>'
\ No newline at end of file
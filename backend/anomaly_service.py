@@ -0,0 +1,139 @@
+from sqlalchemy import select
+from api import db
+from api.money import from_cents
+from api.models.expense import Expense
+from api.models.anomaly import CategoryRunningStats, ExpenseAnomaly
+from api.tenancy import scoped
+
+# An expense is anomalous when it exceeds this multiple of its category's running mean
+ANOMALY_MULTIPLIER = 2
+REBUILD_BATCH_SIZE = 1000
+
+
+def _welford_add(stats, amount):
+    stats.count += 1
+    delta = amount - stats.mean
+    stats.mean += delta / stats.count
+    stats.m2 += delta * (amount - stats.mean)
+
+
+def _welford_remove(stats, amount):
+    if stats.count <= 1:
+        stats.count, stats.mean, stats.m2 = 0, 0.0, 0.0
+        return
+    previous_mean = (stats.count * stats.mean - amount) / (stats.count - 1)
+    stats.m2 = max(stats.m2 - (amount - previous_mean) * (amount - stats.mean), 0.0)
+    stats.mean = previous_mean
+    stats.count -= 1
+
+
+def _is_anomalous(stats, amount):
+    return stats.count > 1 and amount > stats.mean * ANOMALY_MULTIPLIER
+
+
+class AnomalyService:
+    """Streaming anomaly detection: O(1) work per expense, no rescans of history"""
+
+    @staticmethod
+    def observe(expense):
+        """Fold a new or updated expense (model or snapshot) into its category stats and flag it if anomalous"""
+        amount = from_cents(expense.amount_cents)
+        stats = db.session.get(CategoryRunningStats, (expense.user_id, expense.category))
+        if stats is None:
+            stats = CategoryRunningStats(user_id=expense.user_id, category=expense.category, count=0, mean=0.0, m2=0.0)
+            db.session.add(stats)
+        _welford_add(stats, amount)
+
+        if _is_anomalous(stats, amount):
+            if expense.id is None:
+                db.session.flush()
+            db.session.add(ExpenseAnomaly(
+                user_id=expense.user_id,
+                expense_id=expense.id,
+                category=expense.category,
+                amount=amount,
+                category_mean=stats.mean
+            ))
+
+    @staticmethod
+    def forget(snapshot):
+        """Remove an expense (as captured before update/delete) from the stats and drop its anomaly"""
+        stats = db.session.get(CategoryRunningStats, (snapshot.user_id, snapshot.category))
+        if stats is not None:
+            _welford_remove(stats, from_cents(snapshot.amount_cents))
+            if stats.count == 0:
+                db.session.delete(stats)
+                db.session.flush()
+        ExpenseAnomaly.query.filter_by(expense_id=snapshot.id).delete(synchronize_session=False)
+
+    @staticmethod
+    def forget_many(snapshots):
+        """Batch variant of forget: stats updated per row, anomalies dropped with one DELETE"""
+        if not snapshots:
+            return
+        for snapshot in snapshots:
+            stats = db.session.get(CategoryRunningStats, (snapshot.user_id, snapshot.category))
+            if stats is not None:
+                _welford_remove(stats, from_cents(snapshot.amount_cents))
+        keys = {(s.user_id, s.category) for s in snapshots}
+        for stats in {db.session.get(CategoryRunningStats, key) for key in keys} - {None}:
+            if stats.count == 0:
+                db.session.delete(stats)
+        db.session.flush()
+        ExpenseAnomaly.query.filter(
+            ExpenseAnomaly.expense_id.in_([snapshot.id for snapshot in snapshots])
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def rebuild():
+        """Recompute stats and anomalies in a single pass over every user's expenses.
+
+        Expenses are replayed in id order, the order ``observe`` saw them as they
+        were created, so a backdated expense is judged against the same running
+        mean as it was live rather than by its date. An edited expense is judged
+        live against the mean at edit time but here at its original position.
+        """
+        running = {}
+        pending = []
+
+        db.session.query(ExpenseAnomaly).delete()
+        db.session.query(CategoryRunningStats).delete()
+
+        rows = db.session.execute(
+            select(Expense.id, Expense.user_id, Expense.category, Expense.amount_cents)
+            .order_by(Expense.id)
+            .execution_options(yield_per=REBUILD_BATCH_SIZE)
+        )
+        for expense_id, user_id, category, amount_cents in rows:
+            amount = from_cents(amount_cents)
+            stats = running.get((user_id, category))
+            if stats is None:
+                stats = running[(user_id, category)] = CategoryRunningStats(
+                    user_id=user_id, category=category, count=0, mean=0.0, m2=0.0)
+            _welford_add(stats, amount)
+            if _is_anomalous(stats, amount):
+                pending.append({
+                    'user_id': user_id,
+                    'expense_id': expense_id,
+                    'category': category,
+                    'amount': amount,
+                    'category_mean': stats.mean
+                })
+
+        if pending:
+            db.session.bulk_insert_mappings(ExpenseAnomaly, pending)
+        db.session.add_all(running.values())
+        db.session.commit()
+
+    @staticmethod
+    def ensure_built():
+        """Rebuild when the stats table is empty but expenses exist"""
+        if Expense.query.first() and not db.session.query(CategoryRunningStats.category).first():
+            AnomalyService.rebuild()
+            return True
+        return False
+
+    @staticmethod
+    def get_anomalies():
+        """The current user's persisted anomalies, most recently detected first"""
+        return scoped(ExpenseAnomaly.query, ExpenseAnomaly).order_by(ExpenseAnomaly.id.desc()).all()
\ No newline at end of file
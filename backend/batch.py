@@ -0,0 +1,132 @@
+"""Batch create/update/delete for expenses and incomes.
+
+A batch is validated up front, then all valid operations run in a single
+transaction: one executemany INSERT, one bulk UPDATE by primary key and one
+DELETE ... WHERE id IN (...). Invalid operations are reported per index and
+skipped, unless the caller asks for ``atomic`` mode.
+"""
+from sqlalchemy import delete, insert, update
+from api import categorizer, db, mutations
+from api.models.expense import Expense
+from api.models.income import Income
+from api.tenancy import current_user_id, scoped
+from api.validation import (ValidationError, parse_expense, parse_expense_changes,
+                            parse_income, parse_income_changes)
+
+MAX_BATCH_OPERATIONS = 500
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+_KINDS = {
+    'expenses': (Expense, parse_expense, parse_expense_changes, mutations.ExpenseSnapshot, mutations.expenses_applied),
+    'incomes': (Income, parse_income, parse_income_changes, mutations.IncomeSnapshot, mutations.incomes_applied),
+}
+
+
+def _error(index, message, status=400):
+    return {'index': index, 'status': 'error', 'code': status, 'error': message}
+
+
+def _plan(kind, operations):
+    """Validate operations; returns (creates, updates, deletes, results) with results pre-filled for failures"""
+    model, parse_create, parse_changes, snapshot_cls, _ = _KINDS[kind]
+    results = [None] * len(operations)
+    creates, updates, deletes = [], [], []
+    seen_ids = set()
+    if kind == 'expenses':
+        categorizer.fill_missing([operation.get('data') for operation in operations
+                                  if isinstance(operation, dict) and operation.get('op') == 'create'])
+
+    for index, operation in enumerate(operations):
+        try:
+            if not isinstance(operation, dict):
+                raise ValidationError('Each operation must be an object')
+            op = operation.get('op')
+            if op == 'create':
+                creates.append((index, dict(parse_create(operation.get('data') or {}), user_id=current_user_id())))
+                continue
+            if op not in ('update', 'delete'):
+                raise ValidationError("op must be one of 'create', 'update', 'delete'")
+
+            row_id = operation.get('id')
+            if isinstance(row_id, bool) or not isinstance(row_id, int):  # JSON true/false are ints in Python
+                raise ValidationError('id is required for update and delete')
+            if row_id in seen_ids:
+                raise ValidationError(f'id {row_id} appears more than once in this batch')
+            seen_ids.add(row_id)
+
+            if op == 'update':
+                updates.append((index, row_id, parse_changes(operation.get('data') or {})))
+            else:
+                deletes.append((index, row_id))
+        except ValidationError as e:
+            results[index] = _error(index, str(e))
+
+    # One SELECT for the current state of every row being updated or deleted; other users' rows are not found
+    existing = {}
+    if seen_ids:
+        columns = [getattr(model, field) for field in snapshot_cls._fields]
+        for row in scoped(db.session.query(*columns), model).filter(model.id.in_(seen_ids)):
+            existing[row[0]] = snapshot_cls(*row)
+
+    for index, row_id, *_ in updates + deletes:
+        if row_id not in existing:
+            results[index] = _error(index, f'{kind[:-1].capitalize()} {row_id} not found', 404)
+    updates = [(index, existing[row_id], changes) for index, row_id, changes in updates if row_id in existing]
+    deletes = [(index, existing[row_id]) for index, row_id in deletes if row_id in existing]
+    return creates, updates, deletes, results
+
+
+def apply_batch(kind, operations, atomic=False):
+    """Run a batch; returns {'succeeded', 'failed', 'results': [...]} in operation order"""
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise BatchTooLarge(f'A batch may contain at most {MAX_BATCH_OPERATIONS} operations')
+    model, _, _, snapshot_cls, on_applied = _KINDS[kind]
+
+    creates, updates, deletes, results = _plan(kind, operations)
+    failed = sum(1 for result in results if result is not None)
+    if atomic and failed:
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = {'index': index, 'status': 'skipped'}
+        return {'succeeded': 0, 'failed': failed, 'results': results}
+
+    try:
+        created = []
+        if creates:
+            rows = [values for _, values in creates]
+            ids = db.session.execute(
+                insert(model).returning(model.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            for (index, values), row_id in zip(creates, ids):
+                created.append(snapshot_cls(row_id, *(values[field] for field in snapshot_cls._fields[1:])))
+                results[index] = {'index': index, 'status': 'created', 'id': row_id}
+
+        updated = []
+        changed_rows = [dict(changes, id=before.id) for _, before, changes in updates if changes]
+        if changed_rows:
+            db.session.execute(update(model), changed_rows)
+        for index, before, changes in updates:
+            after = before._replace(**{field: value for field, value in changes.items() if field in before._fields})
+            updated.append((before, after))
+            results[index] = {'index': index, 'status': 'updated', 'id': before.id}
+
+        if deletes:
+            db.session.execute(
+                delete(model).where(model.id.in_([before.id for _, before in deletes])),
+                execution_options={'synchronize_session': False}
+            )
+            for index, before in deletes:
+                results[index] = {'index': index, 'status': 'deleted', 'id': before.id}
+
+        on_applied(created=created, updated=updated, deleted=[before for _, before in deletes])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    mutations.after_commit()
+
+    return {'succeeded': len(results) - failed, 'failed': failed, 'results': results}
\ No newline at end of file
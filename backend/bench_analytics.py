@@ -0,0 +1,89 @@
+"""Benchmark the vectorized insights engine against the original per-object loops.
+
+Usage (from the directory containing the ``api`` package):
+
+    python -m api.bench_analytics --sizes 10000 100000 1000000
+
+Synthetic expenses are generated in memory, so no database is needed. The
+legacy implementation below is the pre-NumPy ``generate_ai_insights`` core,
+kept here only as the baseline.
+"""
+import argparse
+import statistics
+import time
+from collections import defaultdict, namedtuple
+from datetime import date
+
+import numpy as np
+
+from api.analytics import ExpenseColumns, generate_ai_insights
+
+CATEGORIES = ['Food', 'Transport', 'Entertainment', 'Utilities', 'Shopping', 'Healthcare', 'Rent', 'Travel']
+LegacyExpense = namedtuple('LegacyExpense', ['category', 'amount', 'date'])
+
+
+def legacy_insights(expenses, total_income):
+    category_breakdown = defaultdict(float)
+    monthly_trends = defaultdict(float)
+    for expense in expenses:
+        category_breakdown[expense.category] += expense.amount
+        monthly_trends[f"{expense.date.year}-{expense.date.month:02d}"] += expense.amount
+
+    total_expenses = sum(exp.amount for exp in expenses)
+    expense_amounts = [exp.amount for exp in expenses]
+    avg_expense = statistics.mean(expense_amounts)
+    std_expense = statistics.stdev(expense_amounts)
+    high_variance = [exp for exp in expenses if exp.amount > avg_expense + std_expense]
+    distinct = len(set(exp.category for exp in expenses))
+    top = sorted(category_breakdown.items(), key=lambda x: x[1], reverse=True)[:3]
+    return total_expenses, top, len(high_variance), distinct, dict(monthly_trends)
+
+
+def synthetic_columns(n, seed=42):
+    rng = np.random.default_rng(seed)
+    months = rng.integers(2020 * 12, 2025 * 12, size=n)
+    codes = rng.integers(0, len(CATEGORIES), size=n)
+    amounts = np.round(rng.lognormal(3.5, 0.9, size=n), 2)
+    return months, codes, amounts
+
+
+def _time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes, repeat):
+    print(f"{'rows':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+    for n in sizes:
+        months, codes, amounts = synthetic_columns(n)
+        categories = np.array(CATEGORIES, dtype=object)[codes]
+        cents = np.round(amounts * 100).astype(np.int64)
+
+        legacy_rows = [
+            LegacyExpense(cat, amt, date(int(m) // 12, int(m) % 12 + 1, 1))
+            for cat, amt, m in zip(categories.tolist(), amounts.tolist(), months.tolist())
+        ]
+        legacy = _time(lambda: legacy_insights(legacy_rows, 1_000_000.0), repeat)
+
+        def vectorized():
+            columns = ExpenseColumns.from_rows(months, categories, np.ones(n), cents, cents.astype(np.float64) ** 2, True)
+            generate_ai_insights(columns, (1, 1_000_000.0))
+
+        fast = _time(vectorized, repeat)
+        print(f"{n:>10} {legacy:>12.4f} {fast:>15.4f} {legacy / fast:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
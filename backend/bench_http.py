@@ -0,0 +1,86 @@
+"""Closed-loop HTTP load test against a running server.
+
+Usage (from the directory containing the ``api`` package), with the server
+started separately:
+
+    python -m api.bench_http http://127.0.0.1:5000 --concurrency 32 --duration 20
+
+Each of ``concurrency`` threads keeps one keep-alive connection open and sends
+requests back to back, cycling through ``--paths`` and rotating the
+``X-User-Id`` header over ``--users`` users. Prints requests/sec, error count
+and latency percentiles for the whole run; only the standard library is used,
+so the same command measures the dev server and gunicorn alike.
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+from api.benchmark import _percentile
+
+DEFAULT_PATHS = ['/api/dashboard', '/api/expenses?limit=50', '/api/insights', '/api/search?q=taxi&limit=20']
+
+
+def _worker(host, port, paths, users, offset, deadline, latencies, errors):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    sent = offset
+    while time.perf_counter() < deadline:
+        path = paths[sent % len(paths)]
+        headers = {'X-User-Id': str(sent % users + 1)}
+        sent += 1
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+            if response.will_close:
+                connection.close()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            connection.close()
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+    connection.close()
+
+
+def run(url, paths, concurrency, duration, users):
+    parts = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], []  # list.append is atomic, so the threads share them
+    threads = [threading.Thread(target=_worker, args=(parts.hostname, parts.port or 80, paths, users, index,
+                                                      deadline, latencies, errors))
+               for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 0.50), 2) if latencies else None,
+        'p95_ms': round(_percentile(latencies, 0.95), 2) if latencies else None,
+        'p99_ms': round(_percentile(latencies, 0.99), 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('url', help='Base URL of the running server, e.g. http://127.0.0.1:5000')
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument('--concurrency', type=int, default=32, help='Simultaneous connections')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to run')
+    parser.add_argument('--users', type=int, default=1, help='Rotate X-User-Id over this many users')
+    args = parser.parse_args()
+
+    result = run(args.url.rstrip('/'), args.paths, args.concurrency, args.duration, args.users)
+    print(f"{result['requests']} requests in {args.duration:.0f}s, {result['errors']} errors: "
+          f"{result['rps']} req/s, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
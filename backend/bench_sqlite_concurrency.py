@@ -0,0 +1,132 @@
+"""Load test: read throughput on SQLite while a writer is committing.
+
+Usage (from the directory containing the ``api`` package):
+
+    python -m api.bench_sqlite_concurrency --readers 8 --seconds 5
+
+Each DB_PROFILE is run against a fresh database file. Reader threads run
+an expense-listing page query in a loop while one writer inserts and
+commits 500-row batches continuously, so reader/writer blocking shows up as
+lower reads/sec and "database is locked" errors.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from api.database import PROFILES, sqlite_pragmas
+
+SCHEMA = """
+CREATE TABLE expenses (
+    id INTEGER PRIMARY KEY,
+    category VARCHAR(50) NOT NULL,
+    amount_cents BIGINT NOT NULL,
+    description VARCHAR(200),
+    date DATE NOT NULL
+);
+CREATE INDEX ix_expenses_date_id ON expenses (date, id);
+"""
+INSERT = 'INSERT INTO expenses (category, amount_cents, description, date) VALUES (?, ?, ?, ?)'
+# One keyset page of the expense listing, the most frequent read
+READ_QUERY = ('SELECT id, category, amount_cents, description, date FROM expenses '
+              'WHERE date <= ? ORDER BY date DESC, id DESC LIMIT 100')
+CATEGORIES = ['Food', 'Transport', 'Entertainment', 'Utilities', 'Shopping', 'Healthcare']
+
+
+def _connect(path, pragmas):
+    connection = sqlite3.connect(path, timeout=pragmas.get('busy_timeout', 5000) / 1000, check_same_thread=False)
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name}={value}')
+    return connection
+
+
+def _random_row(rng):
+    return (rng.choice(CATEGORIES), rng.randint(100, 50000), '',
+            f'202{rng.randint(0, 4)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}')
+
+
+def run_profile(profile, readers, seconds, seed_rows):
+    """Return reads/s, commits/s and error counts for one profile"""
+    pragmas = sqlite_pragmas(profile)
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        setup = _connect(path, pragmas)
+        setup.executescript(SCHEMA)
+        rng = random.Random(1)
+        setup.executemany(INSERT, [_random_row(rng) for _ in range(seed_rows)])
+        setup.commit()
+        setup.close()
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        counts = {'reads': 0, 'read_errors': 0, 'writes': 0, 'write_errors': 0}
+
+        def reader():
+            connection = _connect(path, pragmas)
+            reads = errors = 0
+            while not stop.is_set():
+                try:
+                    connection.execute(READ_QUERY, ('2023-06-30',)).fetchall()
+                    reads += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+            connection.close()
+            with lock:
+                counts['reads'] += reads
+                counts['read_errors'] += errors
+
+        def writer():
+            connection = _connect(path, pragmas)
+            writer_rng = random.Random(2)
+            while not stop.is_set():
+                try:
+                    connection.executemany(INSERT, [_random_row(writer_rng) for _ in range(500)])
+                    connection.commit()
+                    counts['writes'] += 1
+                except sqlite3.OperationalError:
+                    connection.rollback()
+                    counts['write_errors'] += 1
+            connection.close()
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        return {
+            'reads_per_sec': counts['reads'] / seconds,
+            'read_errors': counts['read_errors'],
+            'commits_per_sec': counts['writes'] / seconds,
+            'write_errors': counts['write_errors'],
+        }
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--seed-rows', type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"{'profile':>12} {'reads/s':>10} {'read errors':>12} {'commits/s':>10} {'write errors':>13}")
+    for profile in PROFILES:
+        result = run_profile(profile, args.readers, args.seconds, args.seed_rows)
+        print(f"{profile:>12} {result['reads_per_sec']:>10.1f} {result['read_errors']:>12} "
+              f"{result['commits_per_sec']:>10.1f} {result['write_errors']:>13}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
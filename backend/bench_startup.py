@@ -0,0 +1,81 @@
+"""Benchmark application start-up in fresh interpreter processes.
+
+Usage (from the directory containing the ``api`` package):
+
+    python -m api.bench_startup --runs 5
+
+Each run starts a new Python process that imports ``api``, calls
+``create_app()`` and serves one request through the test client, reporting
+the time spent in each step and whether NumPy got imported along the way.
+Two scenarios are measured: ``initialized`` (a database already at the current
+schema version, i.e. every worker start and test run after ``flask init-db``)
+and ``fresh`` (an empty database initialized on start by ``DB_AUTO_INIT``).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from api import create_app
+imported = time.perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'INSIGHTS_PROVIDER': 'stub'})
+created = time.perf_counter()
+app.test_client().get('/api/expenses?limit=10').get_data()
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'numpy_loaded': 'numpy' in sys.modules,
+}))
+'''
+
+
+def _run_child(uri):
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', _CHILD, uri], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def _database(directory, name):
+    return f"sqlite:///{os.path.join(directory, name)}"
+
+
+def run(runs):
+    """{scenario: [per-run timings]}"""
+    results = {'initialized': [], 'fresh': []}
+    with tempfile.TemporaryDirectory() as directory:
+        initialized = _database(directory, 'initialized.db')
+        _run_child(initialized)  # initializes the schema once
+        for index in range(runs):
+            results['initialized'].append(_run_child(initialized))
+            results['fresh'].append(_run_child(_database(directory, f'fresh-{index}.db')))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Processes started per scenario')
+    args = parser.parse_args()
+
+    fields = ('import_ms', 'create_app_ms', 'first_request_ms', 'process_ms')
+    print(f"{'scenario':<12} " + ' '.join(f'{field:>17}' for field in fields) + '  numpy at start')
+    for scenario, samples in run(args.runs).items():
+        medians = [statistics.median(sample[field] for sample in samples) for field in fields]
+        numpy_loaded = any(sample['numpy_loaded'] for sample in samples)
+        print(f'{scenario:<12} ' + ' '.join(f'{value:>17.1f}' for value in medians) + f'  {numpy_loaded}')
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""Benchmark per-user endpoint latency as the number of tenants grows.
+
+Usage (from the directory containing the ``api`` package):
+
+    python -m api.bench_tenants --tenants 1 100 1000 5000 --rows-per-tenant 200
+
+Each tenant count gets a fresh SQLite database holding ``rows-per-tenant``
+expenses per user (so the tables grow with the tenant count) plus every
+user's income history. A sample of users is then queried through the test
+client with the ``X-User-Id`` header, caching disabled. With the user-leading
+indexes and per-user rollups the per-user latencies should stay flat while the
+tables grow by orders of magnitude.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from api import create_app, datagen
+from api.benchmark import _measure, _print_result
+
+ENDPOINTS = [
+    ('GET /api/dashboard', '/api/dashboard'),
+    ('GET /api/expenses', '/api/expenses?limit=100'),
+    ('GET /api/insights', '/api/insights'),
+    ('GET /api/forecast', '/api/forecast?months=6'),
+]
+
+
+def run_tenants(tenants, rows_per_tenant, sample_users, repeat, warmup):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'CACHE_BACKEND': 'none',
+            'INSIGHTS_PROVIDER': 'stub',
+        })
+        with app.app_context():
+            started = time.perf_counter()
+            datagen.populate(tenants * rows_per_tenant, years=3, users=tenants)
+            populate_seconds = time.perf_counter() - started
+        print(f'{tenants:>6} tenants ({tenants * rows_per_tenant} expenses): populated in {populate_seconds:.1f}s')
+
+        users = random.Random(tenants).sample(range(1, tenants + 1), min(sample_users, tenants))
+        client = app.test_client()
+        results = []
+        for name, url in ENDPOINTS:
+            # Rotate through the sampled users so every timed call is a different tenant
+            rotation = iter(users * (repeat + warmup + 1))
+
+            def call(url=url):
+                response = client.get(url, headers={'X-User-Id': str(next(rotation))})
+                response.get_data()
+                return response.status_code
+            results.append(dict(_measure(call, repeat, warmup), name=name, tenants=tenants))
+            _print_result(results[-1])
+        return results
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--rows-per-tenant', type=int, default=200)
+    parser.add_argument('--sample-users', type=int, default=20, help='Distinct users queried per tenant count')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed calls per endpoint')
+    parser.add_argument('--warmup', type=int, default=2)
+    args = parser.parse_args()
+
+    summary = {}
+    for tenants in args.tenants:
+        for result in run_tenants(tenants, args.rows_per_tenant, args.sample_users, args.repeat, args.warmup):
+            summary.setdefault(result['name'], []).append(result['p95_ms'])
+
+    print(f"\np95 (ms) by tenant count: {' '.join(f'{t:>8}' for t in args.tenants)}")
+    for name, values in summary.items():
+        print(f"  {name:<24} {' '.join(f'{v:>8.2f}' for v in values)}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""Endpoint benchmark suite over synthetic datasets.
+
+Usage (from the directory containing the ``api`` package):
+
+    python -m api.benchmark --sizes 1000 100000 1000000 --output bench.json
+    python -m api.benchmark --sizes 1000 --compare bench.json
+    python -m api.benchmark --sizes 100000 --snapshot --compare bench.json
+
+For every dataset size a fresh SQLite database is populated with
+``api.datagen`` (fixed seed; the history ends today so the current-month
+queries in ExpenseService have data to work on), then each
+endpoint and ExpenseService method is called through the Flask test client
+(or directly, inside an app context). Response caching is disabled and the
+insights provider is stubbed so only our own code is measured. Latency p50/p95
+come from untraced runs; peak memory is measured separately with tracemalloc.
+``--snapshot`` serves the analytics from the in-memory snapshot (see
+``api.snapshot``), so comparing against a run without it shows what it saves.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from api import create_app, datagen
+
+ENDPOINTS = [
+    ('GET /api/expenses', 'GET', '/api/expenses?limit=100'),
+    ('GET /api/expenses (filtered)', 'GET', '/api/expenses?category=Food,Travel&min_amount=50&limit=100'),
+    ('GET /api/incomes', 'GET', '/api/incomes?limit=100'),
+    ('GET /api/dashboard', 'GET', '/api/dashboard'),
+    ('GET /api/insights', 'GET', '/api/insights'),
+    ('GET /api/forecast', 'GET', '/api/forecast?months=12'),
+    ('GET /api/summary (daily, 30d window)', 'GET', '/api/summary?granularity=day&window=30'),
+    ('GET /api/summary (monthly, 3y)', 'GET', '/api/summary?from=2023-01-01&granularity=month'),
+    ('GET /api/search', 'GET', '/api/search?q=taxi&limit=50'),
+    ('GET /api/search (prefix, by date)', 'GET', '/api/search?q=gro&order=date&limit=50'),
+    ('GET /api/expenses/export', 'GET', '/api/expenses/export?from=2025-01-01'),
+    ('GET /api/budgets/alerts', 'GET', '/api/budgets/alerts'),
+]
+
+SERVICE_CALLS = [
+    'get_monthly_summary',
+    'get_category_breakdown',
+    'get_spending_trends',
+    'get_budget_alerts',
+    'get_insight_inputs',
+]
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _measure(call, repeat, warmup):
+    """Time ``call`` ``repeat`` times, then trace one extra call for peak memory"""
+    for _ in range(warmup):
+        call()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        status = call()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': status,
+        'p50_ms': round(_percentile(samples, 0.50), 3),
+        'p95_ms': round(_percentile(samples, 0.95), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_size(rows, repeat, warmup, snapshot=False):
+    """Benchmark every endpoint and service call against a fresh ``rows``-expense database"""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'CACHE_BACKEND': 'none',
+            'INSIGHTS_PROVIDER': 'stub',
+            'SNAPSHOT_ENABLED': snapshot,
+        })
+        with app.app_context():
+            started = time.perf_counter()
+            datagen.populate(rows, years=3)
+            populate_seconds = time.perf_counter() - started
+        print(f'{rows:>9} rows: populated in {populate_seconds:.1f}s')
+
+        results = []
+        client = app.test_client()
+        for name, method, url in ENDPOINTS:
+            def call(method=method, url=url):
+                response = client.open(url, method=method)
+                response.get_data()  # drain streamed bodies
+                return response.status_code
+            results.append(dict(_measure(call, repeat, warmup), name=name, rows=rows))
+            _print_result(results[-1])
+
+        from api.services.expense_service import ExpenseService
+        with app.app_context():
+            for method_name in SERVICE_CALLS:
+                method = getattr(ExpenseService, method_name)
+
+                def call(method=method):
+                    method()
+                    return 'ok'
+                results.append(dict(_measure(call, repeat, warmup), name=f'ExpenseService.{method_name}', rows=rows))
+                _print_result(results[-1])
+        return {'rows': rows, 'populate_seconds': round(populate_seconds, 2), 'results': results}
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+
+def _print_result(result):
+    print(f"  {result['name']:<40} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+          f"peak {result['peak_kib']:>10.1f} KiB  [{result['status']}]")
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path, threshold):
+    """Print p95 changes against a previous results file; returns the number of regressions"""
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)
+    previous = {(result['rows'], result['name']): result
+                for run in baseline['runs'] for result in run['results']}
+
+    regressions = 0
+    print(f'\nCompared with {baseline_path} (revision {baseline.get("revision")}):')
+    for run in current['runs']:
+        for result in run['results']:
+            before = previous.get((result['rows'], result['name']))
+            if not before or not before['p95_ms']:
+                continue
+            ratio = result['p95_ms'] / before['p95_ms']
+            flag = ''
+            if ratio > 1 + threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"  {result['rows']:>9} {result['name']:<40} p95 {before['p95_ms']:>9.2f} -> "
+                  f"{result['p95_ms']:>9.2f} ms ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=20, help='Timed calls per endpoint')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Previous results JSON to compare p95 latencies against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 slowdown counted as a regression')
+    parser.add_argument('--snapshot', action='store_true', help='Serve analytics from the in-memory snapshot')
+    args = parser.parse_args()
+
+    report = {
+        'revision': _git_revision(),
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'snapshot': args.snapshot,
+        'runs': [run_size(rows, args.repeat, args.warmup, args.snapshot) for rows in args.sizes],
+    }
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f'\nResults written to {args.output}')
+    if args.compare and compare(report, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
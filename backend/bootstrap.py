@@ -0,0 +1,128 @@
+"""Schema creation, upgrades and seeding, run out of band from request serving.
+
+``flask init-db`` (or ``init_db()``) upgrades the schema, creates missing
+tables and indexes, seeds an empty database and builds the derived tables,
+then records ``migrations.SCHEMA_VERSION``. ``create_app`` only reads that
+version: when it is current, start-up touches no DDL at all. With
+``DB_AUTO_INIT`` (the default) an outdated database is initialized on start
+so local runs, benchmarks and throwaway test databases keep working; in
+production run ``flask init-db`` when deploying and set ``DB_AUTO_INIT=0``.
+"""
+import logging
+from datetime import datetime
+from flask import jsonify
+from api import db, migrations
+
+logger = logging.getLogger(__name__)
+
+
+def _ensure_indexes():
+    """Create the per-user composite indexes backing keyset pagination, list filters and date ranges"""
+    from api.models.expense import Expense
+    from api.models.income import Income
+    indexes = [
+        db.Index('ix_expenses_user_date_id', Expense.user_id, Expense.date, Expense.id),
+        db.Index('ix_expenses_user_category_date_id', Expense.user_id, Expense.category, Expense.date, Expense.id),
+        db.Index('ix_incomes_user_date_id', Income.user_id, Income.date, Income.id),
+        db.Index('ix_incomes_user_source_date_id', Income.user_id, Income.source, Income.date, Income.id),
+    ]
+    for index in indexes:
+        index.create(bind=db.engine, checkfirst=True)
+
+
+def _seed():
+    """Insert the sample expenses and incomes into empty tables"""
+    from api.models.expense import Expense
+    from api.models.income import Income
+    try:
+        if not Expense.query.first():
+            expenses = [
+                Expense(category='Food', amount=50.0, description='Grocery shopping', date=datetime.strptime('2025-06-01', '%Y-%m-%d').date()),
+                Expense(category='Transport', amount=30.0, description='Bus fare', date=datetime.strptime('2025-06-02', '%Y-%m-%d').date()),
+                Expense(category='Entertainment', amount=120.0, description='Movie tickets', date=datetime.strptime('2025-06-03', '%Y-%m-%d').date()),
+                Expense(category='Food', amount=25.0, description='Lunch', date=datetime.strptime('2025-06-04', '%Y-%m-%d').date()),
+                Expense(category='Utilities', amount=80.0, description='Electricity bill', date=datetime.strptime('2025-06-05', '%Y-%m-%d').date()),
+                Expense(category='Shopping', amount=200.0, description='Clothes', date=datetime.strptime('2025-06-06', '%Y-%m-%d').date()),
+                Expense(category='Food', amount=45.0, description='Dinner out', date=datetime.strptime('2025-06-07', '%Y-%m-%d').date()),
+                Expense(category='Transport', amount=15.0, description='Uber ride', date=datetime.strptime('2025-06-08', '%Y-%m-%d').date()),
+                Expense(category='Healthcare', amount=150.0, description='Doctor visit', date=datetime.strptime('2025-06-09', '%Y-%m-%d').date()),
+                Expense(category='Entertainment', amount=60.0, description='Concert tickets', date=datetime.strptime('2025-06-10', '%Y-%m-%d').date()),
+            ]
+            db.session.bulk_save_objects(expenses)
+            db.session.commit()
+            logger.info("Database seeded with initial expenses")
+        else:
+            logger.info("Database already contains data, skipping seeding")
+
+        # Seed income data if table is empty
+        if not Income.query.first():
+            incomes = [
+                Income(source='Salary', amount=5000.0, description='Monthly salary', date=datetime.strptime('2025-06-01', '%Y-%m-%d').date(), is_recurring=True),
+                Income(source='Freelance', amount=1500.0, description='Web development project', date=datetime.strptime('2025-06-05', '%Y-%m-%d').date(), is_recurring=False),
+                Income(source='Investment', amount=200.0, description='Dividend from stocks', date=datetime.strptime('2025-06-10', '%Y-%m-%d').date(), is_recurring=False),
+            ]
+            db.session.bulk_save_objects(incomes)
+            db.session.commit()
+            logger.info("Database seeded with initial income data")
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to seed database: {str(e)}")
+        raise
+
+
+def init_db(seed=True):
+    """Bring the database to SCHEMA_VERSION; safe to run repeatedly (call inside an app context)"""
+    # Import models here to ensure they're registered before creating tables
+    from api.models.expense import Expense  # noqa: F401
+    from api.models.income import Income  # noqa: F401
+    from api.models.rollup import ExpenseMonthlyRollup, IncomeMonthlyRollup  # noqa: F401
+    from api.models.anomaly import CategoryRunningStats, ExpenseAnomaly  # noqa: F401
+    from api.models.recurrence import RecurrenceRule, ScheduledOccurrence  # noqa: F401
+    from api.models.budget import Budget, BudgetAlert  # noqa: F401
+    try:
+        migrations.upgrade()
+        db.create_all()
+        _ensure_indexes()
+        logger.info("Database tables created successfully")
+        from api import search
+        if search.ensure_index():
+            logger.info("Search index built from transaction data")
+    except Exception as e:
+        logger.error(f"Failed to create database tables: {str(e)}")
+        raise
+
+    if seed:
+        _seed()
+
+    # Seeding bypasses the mutation hooks, so build derived tables if they are missing
+    from api.services.rollup_service import RollupService
+    from api.services.anomaly_service import AnomalyService
+    if RollupService.ensure_built():
+        logger.info("Monthly rollups rebuilt from transaction data")
+        from api.services.budget_service import BudgetService
+        BudgetService.rebuild()
+    if AnomalyService.ensure_built():
+        logger.info("Expense anomalies rebuilt from transaction data")
+    from api.services.recurrence_service import RecurrenceService
+    if RecurrenceService.ensure_rules():
+        logger.info("Recurrence rules derived from recurring incomes")
+    migrations.set_version(migrations.SCHEMA_VERSION)
+
+
+def check_schema(app):
+    """Compare the database's schema version with the code's; initialize or refuse requests when behind"""
+    version = migrations.current_version()
+    if version == migrations.SCHEMA_VERSION:
+        return
+    if version < migrations.SCHEMA_VERSION and app.config['DB_AUTO_INIT']:
+        init_db()
+        return
+
+    message = (f'Database schema is at version {version}, this code expects {migrations.SCHEMA_VERSION}; '
+               f'run `flask init-db`')
+    logger.error(message)
+
+    @app.before_request
+    def _schema_mismatch():
+        return jsonify({'error': message}), 503
\ No newline at end of file
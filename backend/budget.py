@@ -0,0 +1,80 @@
+from api import db
+from api.money import from_cents
+from api.tenancy import DEFAULT_USER_ID
+from datetime import datetime
+
+DEFAULT_THRESHOLDS = (80, 100)  # percent of the limit
+
+
+class Budget(db.Model):
+    """A spending limit for one category (or all, when category is NULL) in one month (or every month, when month is NULL)"""
+    __tablename__ = 'budgets'
+    __table_args__ = (
+        db.Index('ix_budgets_user_category_month', 'user_id', 'category', 'month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=DEFAULT_USER_ID)
+    category = db.Column(db.String(50))
+    month = db.Column(db.String(7))  # YYYY-MM; a month-specific budget overrides the every-month one
+    limit_cents = db.Column(db.BigInteger, nullable=False)
+    thresholds = db.Column(db.String(50), nullable=False, default='80,100')  # comma-separated percents
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def threshold_list(self):
+        return sorted(int(value) for value in self.thresholds.split(',') if value)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'month': self.month,
+            'limit': from_cents(self.limit_cents),
+            'thresholds': self.threshold_list,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<Budget {self.category or "*"} {self.month or "*"}: {self.limit_cents} cents>'
+
+
+class BudgetAlert(db.Model):
+    """A budget threshold the month's spend has crossed; removed again when the spend drops back below it"""
+    __tablename__ = 'budget_alerts'
+    __table_args__ = (
+        db.UniqueConstraint('budget_id', 'month', 'threshold', name='uq_budget_alerts_budget_month_threshold'),
+        db.Index('ix_budget_alerts_user_month', 'user_id', 'month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    budget_id = db.Column(db.Integer, db.ForeignKey('budgets.id', ondelete='CASCADE'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)
+    category = db.Column(db.String(50))
+    threshold = db.Column(db.Integer, nullable=False)
+    spent_cents = db.Column(db.BigInteger, nullable=False)  # kept current while the alert stands
+    limit_cents = db.Column(db.BigInteger, nullable=False)
+    triggered_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        label = self.category or 'Total'
+        spent, limit = from_cents(self.spent_cents), from_cents(self.limit_cents)
+        if self.threshold >= 100:
+            message = f'{label} spending of ${spent:.2f} is over its ${limit:.2f} budget for {self.month}'
+        else:
+            message = f'{label} spending has reached {self.threshold}% of its ${limit:.2f} budget for {self.month}'
+        return {
+            'type': 'warning' if self.threshold >= 100 else 'info',
+            'message': message,
+            'budget_id': self.budget_id,
+            'category': self.category,
+            'month': self.month,
+            'threshold': self.threshold,
+            'spent': spent,
+            'limit': limit,
+            'triggered_at': self.triggered_at.isoformat() if self.triggered_at else None
+        }
+
+    def __repr__(self):
+        return f'<BudgetAlert budget={self.budget_id} {self.month} {self.threshold}%>'
\ No newline at end of file
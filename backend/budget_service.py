@@ -0,0 +1,149 @@
+from datetime import date, datetime
+from sqlalchemy import or_
+from api import db, events
+from api.models.budget import Budget, BudgetAlert
+from api.models.rollup import ExpenseMonthlyRollup
+from api.tenancy import scoped
+
+
+def _month_key(value):
+    return value.strftime('%Y-%m')
+
+
+def _effective(budgets, month, category):
+    """The budget governing (month, category): a month-specific one wins over the every-month one"""
+    fallback = None
+    for budget in budgets:
+        if budget.category != category:
+            continue
+        if budget.month == month:
+            return budget
+        if budget.month is None:
+            fallback = budget
+    return fallback
+
+
+def _same_category(column, category):
+    """``column = category``, matching NULL (all categories) too"""
+    return column.is_(None) if category is None else column == category
+
+
+def _spend(user_id, months):
+    """{(month, category): cents} from the monthly rollups, with (month, None) holding the month's total"""
+    spent = {}
+    rows = db.session.query(ExpenseMonthlyRollup.month, ExpenseMonthlyRollup.category,
+                            ExpenseMonthlyRollup.total_cents).filter(
+        ExpenseMonthlyRollup.user_id == user_id, ExpenseMonthlyRollup.month.in_(months))
+    for month, category, total in rows:
+        spent[(month, category)] = total
+        spent[(month, None)] = spent.get((month, None), 0) + total
+    return spent
+
+
+def _reconcile(user_id, targets):
+    """Bring the alerts of each (month, category) in ``targets`` in line with its budget and current spend.
+
+    ``targets`` maps (month, category) to the effective budget (or None). Thresholds
+    the spend has reached get an alert, created (and streamed) only when the
+    threshold is first crossed; alerts whose threshold is no longer reached, or
+    that belong to a budget no longer in effect, are removed.
+    """
+    if not targets:
+        return
+    months = {month for month, _ in targets}
+    spent = _spend(user_id, months)
+    existing = {}
+    for alert in BudgetAlert.query.filter(BudgetAlert.user_id == user_id, BudgetAlert.month.in_(months)):
+        existing.setdefault((alert.month, alert.category), []).append(alert)
+
+    for (month, category), budget in targets.items():
+        cents = spent.get((month, category), 0)
+        reached = set()
+        if budget is not None:
+            reached = {threshold for threshold in budget.threshold_list if cents * 100 >= threshold * budget.limit_cents}
+        for alert in existing.get((month, category), []):
+            if budget is None or alert.budget_id != budget.id or alert.threshold not in reached:
+                db.session.delete(alert)
+            else:
+                alert.spent_cents, alert.limit_cents = cents, budget.limit_cents
+                reached.discard(alert.threshold)
+        for threshold in sorted(reached):
+            alert = BudgetAlert(user_id=user_id, budget_id=budget.id, month=month, category=category,
+                                threshold=threshold, spent_cents=cents, limit_cents=budget.limit_cents,
+                                triggered_at=datetime.utcnow())
+            db.session.add(alert)
+            events.record('budget.alert', alert.to_dict())
+
+
+class BudgetService:
+    """Budgets and their alerts; alert state is updated on each write, never aggregated on read"""
+
+    @staticmethod
+    def observe(rows):
+        """Re-evaluate the budgets covering the user x month x category of changed expenses (models or snapshots).
+
+        Runs inside the caller's session after the rollups were updated. Users
+        without a matching budget cost one indexed lookup.
+        """
+        keys_by_user = {}
+        for row in rows:
+            keys_by_user.setdefault(row.user_id, set()).add((_month_key(row.date), row.category))
+        for user_id, keys in keys_by_user.items():
+            months = {month for month, _ in keys}
+            categories = {category for _, category in keys}
+            budgets = Budget.query.filter(
+                Budget.user_id == user_id,
+                or_(Budget.category.is_(None), Budget.category.in_(categories)),
+                or_(Budget.month.is_(None), Budget.month.in_(months)),
+            ).all()
+            if not budgets:
+                continue
+            targets = {}
+            for month, category in keys | {(month, None) for month in months}:
+                budget = _effective(budgets, month, category)
+                if budget is not None:
+                    targets[(month, category)] = budget
+            _reconcile(user_id, targets)
+
+    @staticmethod
+    def find(user_id, category, month):
+        """The user's budget for exactly this category and month (None meaning all/every), if any"""
+        return Budget.query.filter(Budget.user_id == user_id, _same_category(Budget.category, category),
+                                   Budget.month.is_(None) if month is None else Budget.month == month).first()
+
+    @staticmethod
+    def refresh(user_id, category, month=None):
+        """Re-evaluate every month a budget for (category, month) may cover; call after budget changes"""
+        budgets = Budget.query.filter(Budget.user_id == user_id, _same_category(Budget.category, category)).all()
+        if month is not None:
+            months = {month}
+        else:
+            months = {row.month for row in db.session.query(ExpenseMonthlyRollup.month).filter(
+                ExpenseMonthlyRollup.user_id == user_id).distinct()}
+            months.update(row.month for row in db.session.query(BudgetAlert.month).filter(
+                BudgetAlert.user_id == user_id, _same_category(BudgetAlert.category, category)).distinct())
+        _reconcile(user_id, {(key, category): _effective(budgets, key, category) for key in months})
+
+    @staticmethod
+    def delete_budget(budget):
+        """Delete a budget and its alerts; the every-month budget takes over any month it overrode"""
+        user_id, category, month = budget.user_id, budget.category, budget.month
+        BudgetAlert.query.filter_by(budget_id=budget.id).delete(synchronize_session=False)
+        db.session.delete(budget)
+        db.session.flush()
+        BudgetService.refresh(user_id, category, month)
+
+    @staticmethod
+    def alerts(month=None):
+        """The current user's standing alerts for ``month`` (default: this month), most severe first"""
+        month = month or _month_key(date.today())
+        query = scoped(BudgetAlert.query, BudgetAlert).filter(BudgetAlert.month == month)
+        return [alert.to_dict() for alert in query.order_by(BudgetAlert.threshold.desc(), BudgetAlert.category)]
+
+    @staticmethod
+    def rebuild():
+        """Recompute every alert from the budgets and rollups (after rollups were rebuilt in bulk)"""
+        BudgetAlert.query.delete()
+        for user_id, category in db.session.query(Budget.user_id, Budget.category).distinct().all():
+            BudgetService.refresh(user_id, category)
+        db.session.commit()
\ No newline at end of file
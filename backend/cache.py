@@ -0,0 +1,315 @@
+"""Response and summary cache invalidated by a data-version counter.
+
+The counter lives in the cache backend (per process for the in-memory LRU,
+shared through a file for the filesystem backend) and is kept per user: every
+create/update/delete bumps the writing user's version (see ``mutations.after_commit``),
+and keys embed the user, so one tenant's writes never evict another's entries.
+Cache keys embed the version, so stale entries are never served and simply
+age out of the LRU; nothing has to be deleted on write. Responses carry an
+ETag derived from the same key, letting clients revalidate with
+If-None-Match and get a 304 from the stored entry without the view running.
+
+Versions restart from 0 when an in-memory backend is created, so keys also
+embed the backend's ``epoch``, a random id drawn per process (per cache
+directory for the filesystem backend); an ETag handed out before a restart
+never matches afterwards.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from flask import current_app, request
+from api.tenancy import current_user_id
+
+try:
+    import fcntl
+except ImportError:  # Windows: the filesystem backend falls back to an unlocked counter
+    fcntl = None
+
+_backend = None
+
+
+def data_version(user_id=None):
+    return get_backend().version(current_user_id() if user_id is None else user_id)
+
+
+def bump_version(user_id=None):
+    """Invalidate a user's cached entries (the current user's by default); call after committing a data change"""
+    return get_backend().bump_version(current_user_id() if user_id is None else user_id)
+
+
+def _version_tag(user_id):
+    """Epoch and data version as embedded in cache keys"""
+    backend = get_backend()
+    return f'{backend.epoch}.{backend.version(user_id)}'
+
+
+# ===== BACKENDS =====
+class CacheBackend(ABC):
+    """Interface for cache storage; values must be picklable for non-memory backends"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.epoch = os.urandom(4).hex()
+        self._versions = {}
+        self._version_lock = threading.Lock()
+
+    def version(self, user_id):
+        return self._versions.get(user_id, 0)
+
+    def bump_version(self, user_id):
+        with self._version_lock:
+            version = self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            return version
+
+    @abstractmethod
+    def get(self, key):
+        """The stored value, or None when missing or expired"""
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        """Store ``value`` for ``ttl`` seconds (the backend's default when None)"""
+
+    @abstractmethod
+    def clear(self):
+        """Drop every entry (data versions are kept)"""
+
+    def _record(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+
+class NullCache(CacheBackend):
+    """Disables caching (CACHE_BACKEND=none)"""
+
+    def get(self, key):
+        return self._record(None)
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process LRU with per-entry TTL"""
+
+    def __init__(self, max_entries=512, default_ttl=60):
+        super().__init__()
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return self._record(None)
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return self._record(None)
+            self._entries.move_to_end(key)
+            return self._record(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileCache(CacheBackend):
+    """Local on-disk cache shared by processes on the same host (CACHE_BACKEND=filesystem)"""
+
+    def __init__(self, directory, default_ttl=60):
+        super().__init__()
+        self.directory = directory
+        self.default_ttl = default_ttl
+        os.makedirs(directory, exist_ok=True)
+        self.epoch = self._shared_epoch()
+
+    def _shared_epoch(self):
+        """The directory's epoch, created by the first process; the version files live and die with it"""
+        path = os.path.join(self.directory, 'epoch.version')
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w') as handle:
+            handle.write(self.epoch)
+        try:
+            os.link(tmp_path, path)  # atomic: fails if another process got there first
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+        with open(path) as handle:
+            return handle.read().strip() or self.epoch
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _version_path(self, user_id):
+        return os.path.join(self.directory, f'data.{user_id}.version')
+
+    def version(self, user_id):
+        try:
+            with open(self._version_path(user_id)) as handle:
+                return int(handle.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump_version(self, user_id):
+        """Increment the shared counter under an exclusive lock so all processes see it"""
+        with open(self._version_path(user_id), 'a+') as handle:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            handle.seek(0)
+            try:
+                version = int(handle.read() or 0) + 1
+            except ValueError:
+                version = 1
+            handle.seek(0)
+            handle.truncate()
+            handle.write(str(version))
+            handle.flush()
+        return version
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as handle:
+                expires_at, value = pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return self._record(None)
+        if expires_at < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return self._record(None)
+        return self._record(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (ttl or self.default_ttl)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as handle:
+            pickle.dump((expires_at, value), handle)
+        os.replace(tmp_path, self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.version'):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+def init_cache(app):
+    """Select the cache backend from app config"""
+    global _backend
+    app.config.setdefault('CACHE_BACKEND', os.environ.get('CACHE_BACKEND', 'memory'))
+    app.config.setdefault('CACHE_TTL', int(os.environ.get('CACHE_TTL', 60)))
+    app.config.setdefault('CACHE_MAX_ENTRIES', int(os.environ.get('CACHE_MAX_ENTRIES', 512)))
+    app.config.setdefault('CACHE_DIR', os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'expense-tracker-cache')))
+
+    kind = app.config['CACHE_BACKEND']
+    if kind == 'none':
+        _backend = NullCache()
+    elif kind == 'filesystem':
+        _backend = FileCache(app.config['CACHE_DIR'], app.config['CACHE_TTL'])
+    elif kind == 'memory':
+        _backend = LRUCache(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_TTL'])
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND '{kind}'")
+    return _backend
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = LRUCache()
+    return _backend
+
+
+# ===== DECORATORS =====
+def _request_key():
+    args = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    return f'{request.endpoint}?{args}'
+
+
+def cached_response(ttl=None, vary=None):
+    """Cache a JSON view's serialized body and answer If-None-Match with 304.
+
+    Only 200 responses are cached. The ETag is computed from the user, endpoint,
+    query string and that user's data version, so a matching If-None-Match is answered
+    from the stored entry without running the view. The 304 needs that entry, so an
+    ETag stops validating once the entry expires (``ttl``, CACHE_TTL by default).
+    A view that also depends on something else, such as today's date, passes ``vary``:
+    a callable whose result becomes part of the key and ETag.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = current_user_id()
+            key = f'response:u{user_id}:{_request_key()}:v{_version_tag(user_id)}'
+            if vary is not None:
+                key = f'{key}:{vary()}'
+            etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+
+            backend = get_backend()
+            cached = backend.get(key)
+            if cached is not None and request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+            if cached is not None:
+                body, mimetype = cached
+                response = current_app.response_class(body, status=200, mimetype=mimetype)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                backend.set(key, (response.get_data(), response.mimetype), ttl)
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def memoize(ttl=None):
+    """Cache a function's return value per (user, arguments, data version)"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            user_id = current_user_id()
+            key = (f'memo:u{user_id}:{fn.__module__}.{fn.__qualname__}:{args!r}:{sorted(kwargs.items())!r}'
+                   f':v{_version_tag(user_id)}')
+            backend = get_backend()
+            cached = backend.get(key)
+            if cached is not None:
+                return cached
+            value = fn(*args, **kwargs)
+            backend.set(key, value, ttl)
+            return value
+        return wrapper
+    return decorator
\ No newline at end of file
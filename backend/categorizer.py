@@ -0,0 +1,398 @@
+"""Expense category suggestions from a model trained on description -> category rows.
+
+Descriptions are normalized (lower-cased, digit runs collapsed, so "UBER *1234"
+and "Uber *5678" are the same merchant) and hashed into character n-gram
+features with a stateless HashingVectorizer, so there is no vocabulary to fit
+or keep in sync. A linear SGDClassifier with logistic loss on top gives class
+probabilities and supports ``partial_fit``. Training reads distinct
+(description, category) pairs with their row counts, so a history of
+repetitive expenses trains in a fraction of the rows it holds.
+
+One model is trained over all users' rows, but a suggestion only ever names a
+standard category or one the requesting user has used, so one tenant's own
+category names never show up for another.
+
+Inference is batched: ``suggest_many`` vectorizes every uncached description in
+one call, and an in-process LRU maps normalized descriptions to class
+probabilities, so repeated merchants cost a dictionary lookup. The fitted model
+is pickled to CATEGORIZER_PATH and loaded on first use. Expense writes are
+counted; every CATEGORIZER_RETRAIN_EVERY rows a background thread continues
+training on the rows added since the model's watermark, or retrains from
+scratch when new categories appeared (and every FULL_RETRAIN_ROUNDS rounds, which
+also picks up re-categorized rows). scikit-learn is optional: without it no
+suggestions are made and categories stay required.
+"""
+import copy
+import importlib.util
+import logging
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import func
+from api import db
+from api.cache import LRUCache
+from api.models.expense import Expense
+from api.models.rollup import ExpenseMonthlyRollup
+from api.tenancy import current_user_id
+
+logger = logging.getLogger(__name__)
+
+# Suggestions may always name these, whatever categories the user has used so far
+STANDARD_CATEGORIES = ('Food', 'Transport', 'Entertainment', 'Utilities', 'Shopping', 'Healthcare', 'Travel', 'Rent')
+N_FEATURES = 2 ** 18
+MIN_TRAINING_ROWS = 20
+FULL_RETRAIN_ROUNDS = 10
+MAX_SUGGEST_BATCH = 1000
+
+_DIGITS = re.compile(r'\d+')
+_SPACE = re.compile(r'\s+')
+
+_settings = {'enabled': True, 'path': None, 'min_confidence': 0.5, 'retrain_every': 500,
+             'max_training_rows': 200_000}
+_model = None
+_loaded = False
+_predictions = LRUCache(10_000, 86400)
+_executor = None
+_training = None
+_rows_written = 0
+_lock = threading.Lock()
+
+
+class CategoryModel:
+    """A fitted classifier plus the bookkeeping needed to continue training it"""
+
+    def __init__(self, classifier, trained_through_id, rounds, database):
+        self.classifier = classifier
+        self.trained_through_id = trained_through_id  # highest expense id the model has seen
+        self.rounds = rounds  # incremental rounds since the last full training
+        self.database = database
+        self.n_features = N_FEATURES
+        self.trained_at = time.time()
+        self.version = uuid.uuid4().hex
+
+    @property
+    def classes(self):
+        return [str(category) for category in self.classifier.classes_]
+
+    def predict_proba(self, texts):
+        return self.classifier.predict_proba(_vectorizer().transform(texts))
+
+
+def init_categorizer(app):
+    """Read the categorizer settings from app config and reset the in-process model"""
+    global _executor, _model, _loaded, _predictions, _rows_written
+    app.config.setdefault('CATEGORIZER_ENABLED', os.environ.get('CATEGORIZER_ENABLED', '1') == '1')
+    app.config.setdefault('CATEGORIZER_PATH', os.environ.get('CATEGORIZER_PATH', os.path.join(app.root_path, 'categorizer.pkl')))
+    app.config.setdefault('CATEGORIZER_MIN_CONFIDENCE', float(os.environ.get('CATEGORIZER_MIN_CONFIDENCE', 0.5)))
+    app.config.setdefault('CATEGORIZER_RETRAIN_EVERY', int(os.environ.get('CATEGORIZER_RETRAIN_EVERY', 500)))
+    app.config.setdefault('CATEGORIZER_MAX_TRAINING_ROWS', int(os.environ.get('CATEGORIZER_MAX_TRAINING_ROWS', 200_000)))
+    app.config.setdefault('CATEGORIZER_CACHE_SIZE', int(os.environ.get('CATEGORIZER_CACHE_SIZE', 10_000)))
+
+    if app.config['CATEGORIZER_ENABLED'] and importlib.util.find_spec('sklearn') is None:
+        logger.warning('scikit-learn is not installed; category suggestions are disabled')
+        app.config['CATEGORIZER_ENABLED'] = False
+    _settings.update(
+        enabled=app.config['CATEGORIZER_ENABLED'],
+        path=app.config['CATEGORIZER_PATH'],
+        min_confidence=app.config['CATEGORIZER_MIN_CONFIDENCE'],
+        retrain_every=app.config['CATEGORIZER_RETRAIN_EVERY'],
+        max_training_rows=app.config['CATEGORIZER_MAX_TRAINING_ROWS'],
+    )
+    with _lock:
+        _model, _loaded, _rows_written = None, False, 0
+        _predictions = LRUCache(app.config['CATEGORIZER_CACHE_SIZE'], 86400)
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='categorizer')
+
+
+def shutdown(wait=True):
+    """Stop the training thread; with ``wait`` a running retrain finishes first"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=not wait)
+        _executor = None
+
+
+def enabled():
+    return _settings['enabled']
+
+
+def normalize(description):
+    """Lower-case, collapse whitespace and replace digit runs, so variants of one merchant share a key"""
+    return _SPACE.sub(' ', _DIGITS.sub('0', (description or '').lower())).strip()
+
+
+_vectorizer_instance = None
+
+
+def _vectorizer():
+    global _vectorizer_instance
+    if _vectorizer_instance is None:
+        from sklearn.feature_extraction.text import HashingVectorizer
+        _vectorizer_instance = HashingVectorizer(analyzer='char_wb', ngram_range=(3, 5), n_features=N_FEATURES,
+                                                 alternate_sign=False)
+    return _vectorizer_instance
+
+
+# ===== PERSISTENCE =====
+def _database():
+    return db.engine.url.render_as_string(hide_password=True)
+
+
+def _read_model():
+    """The model saved at CATEGORIZER_PATH, if it exists and was trained on this database"""
+    path = _settings['path']
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, AttributeError, EOFError, ImportError) as e:
+        logger.warning('Ignoring unreadable categorizer model %s: %s', path, e)
+        return None
+    if not isinstance(model, CategoryModel) or model.n_features != N_FEATURES or model.database != _database():
+        return None
+    return model
+
+
+def _write_model(model):
+    """Pickle to a temporary file and rename it into place, so readers never see a partial file"""
+    path = _settings['path']
+    if not path:
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning('Could not save the categorizer model to %s: %s', path, e)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _install(model):
+    global _model
+    with _lock:
+        _model = model
+        _predictions.clear()
+
+
+def current_model():
+    """The model in use, loading the saved one on first call; None until one has been trained"""
+    global _model, _loaded
+    if not _settings['enabled']:
+        return None
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                _model = _model or _read_model()
+                _loaded = True
+        if _model is None:
+            _schedule_training()
+    return _model
+
+
+# ===== TRAINING =====
+def _training_rows(after_id):
+    """(description, category, count, max_id) for distinct pairs among the most recent rows"""
+    recent = (db.select(Expense.id, Expense.description, Expense.category)
+              .where(Expense.description != '', Expense.id > after_id)
+              .order_by(Expense.id.desc()).limit(_settings['max_training_rows']).subquery())
+    statement = (db.select(recent.c.description, recent.c.category, func.count(), func.max(recent.c.id))
+                 .group_by(recent.c.description, recent.c.category))
+    return db.session.execute(statement).all()
+
+
+def _fit_arrays(rows):
+    """Merge rows whose descriptions normalize alike; returns (texts, categories, weights, max_id)"""
+    import numpy as np
+    counts = {}
+    max_id = 0
+    for description, category, count, row_max_id in rows:
+        key = (normalize(description), category)
+        if key[0]:
+            counts[key] = counts.get(key, 0) + count
+        max_id = max(max_id, row_max_id)
+    texts = [text for text, _ in counts]
+    categories = [category for _, category in counts]
+    # log-damped counts: frequent pairs still dominate without swamping SGD's step sizes
+    weights = np.log1p(np.fromiter(counts.values(), dtype=float, count=len(counts)))
+    return texts, categories, weights, max_id
+
+
+def train(full=False):
+    """Train the model now (inside an app context) and install and save it.
+
+    Continues training the current model on rows added since its watermark,
+    unless ``full`` is set, there is no model yet, or new categories appeared.
+    Returns the model in use afterwards (None when there is too little data).
+    """
+    from sklearn.exceptions import ConvergenceWarning
+    from sklearn.linear_model import SGDClassifier
+
+    base = None if full else _model
+    saved = None if full else _read_model()
+    if saved is not None and (base is None or saved.trained_through_id > base.trained_through_id):
+        base = saved  # another process trained further
+    if base is not None and base.rounds + 1 >= FULL_RETRAIN_ROUNDS:
+        base = None
+
+    rows = _training_rows(base.trained_through_id if base is not None else 0)
+    if base is not None and not rows:
+        if base is not _model:
+            _install(base)
+        return base
+    if base is not None and not {category for _, category, *_ in rows} <= set(base.classes):
+        base, rows = None, _training_rows(0)
+    texts, categories, weights, max_id = _fit_arrays(rows)
+
+    if base is None:
+        if sum(count for _, _, count, _ in rows) < MIN_TRAINING_ROWS or len(set(categories)) < 2:
+            return _model
+        classifier = SGDClassifier(loss='log_loss', alpha=1e-4, max_iter=200, tol=1e-4, random_state=0)
+        with warnings.catch_warnings():
+            # max_iter caps training time; stopping short of tol on large histories is expected
+            warnings.simplefilter('ignore', ConvergenceWarning)
+            classifier.fit(_vectorizer().transform(texts), categories, sample_weight=weights)
+        model = CategoryModel(classifier, max_id, 0, _database())
+    else:
+        # Predictions keep using the old classifier while the copy is updated
+        classifier = copy.deepcopy(base.classifier)
+        classifier.partial_fit(_vectorizer().transform(texts), categories, sample_weight=weights)
+        model = CategoryModel(classifier, max(max_id, base.trained_through_id), base.rounds + 1, _database())
+
+    _install(model)
+    _write_model(model)
+    logger.info('Categorizer trained on %d description/category pairs (%s, %d categories)',
+                len(texts), 'incremental' if model.rounds else 'full', len(model.classes))
+    return model
+
+
+def _schedule_training(full=False):
+    """Queue a background retrain unless one is already queued or running"""
+    global _training
+    if _executor is None or not _settings['enabled']:
+        return None
+    app = current_app._get_current_object()
+
+    def work():
+        with app.app_context():
+            try:
+                train(full=full)
+            except Exception:
+                logger.exception('Background categorizer training failed')
+
+    with _lock:
+        if _training is not None and not _training.done():
+            return _training
+        _training = _executor.submit(work)
+        return _training
+
+
+def rows_written(count):
+    """Count new or changed expense rows; every CATEGORIZER_RETRAIN_EVERY of them triggers a background retrain"""
+    global _rows_written
+    if not _settings['enabled'] or count <= 0:
+        return
+    with _lock:
+        _rows_written += count
+        due = _rows_written >= _settings['retrain_every']
+        if due:
+            _rows_written = 0
+    if due:
+        _schedule_training()
+
+
+# ===== SUGGESTIONS =====
+def _allowed_categories(user_id):
+    used = db.session.query(ExpenseMonthlyRollup.category).filter(ExpenseMonthlyRollup.user_id == user_id).distinct()
+    return set(STANDARD_CATEGORIES).union(category for category, in used)
+
+
+def _probabilities(model, texts):
+    """{text: class probabilities} for the distinct texts, predicting all cache misses in one batch"""
+    found, missing = {}, []
+    for text in set(texts):
+        cached = _predictions.get((model.version, text))
+        if cached is None:
+            missing.append(text)
+        else:
+            found[text] = cached
+    if missing:
+        for text, row in zip(missing, model.predict_proba(missing)):
+            _predictions.set((model.version, text), row)
+            found[text] = row
+    return found
+
+
+def suggest_many(descriptions, user_id=None, top=1):
+    """Ranked [(category, confidence), ...] (at most ``top``) per description; empty lists when unknown.
+
+    Only categories the user may be offered are ranked. Their confidences are
+    not renormalized, so a description that looks like another tenant's own
+    category stays low-confidence instead of being pushed onto the runner-up.
+    """
+    model = current_model()
+    texts = [normalize(description) for description in descriptions]
+    if model is None or not any(texts):
+        return [[] for _ in texts]
+    allowed = _allowed_categories(current_user_id() if user_id is None else user_id)
+    classes = model.classes
+    columns = [index for index, category in enumerate(classes) if category in allowed]
+    probabilities = _probabilities(model, [text for text in texts if text])
+
+    suggestions = []
+    for text in texts:
+        if not text or not columns:
+            suggestions.append([])
+            continue
+        row = probabilities[text][columns]
+        ranked = sorted(zip(columns, row), key=lambda pair: -pair[1])[:top]
+        suggestions.append([(classes[index], round(float(p), 4)) for index, p in ranked])
+    return suggestions
+
+
+def fill_missing(records, user_id=None):
+    """Set 'category' on expense payloads that have a description but no category.
+
+    Uses one batched prediction for all of them and only fills suggestions at or
+    above CATEGORIZER_MIN_CONFIDENCE. Returns the confidence used per record
+    (None where nothing was filled).
+    """
+    filled = [None] * len(records)
+    if not _settings['enabled']:
+        return filled
+    targets = [index for index, record in enumerate(records)
+               if isinstance(record, dict) and not record.get('category') and record.get('description')]
+    if not targets:
+        return filled
+    suggestions = suggest_many([str(records[index]['description']) for index in targets], user_id)
+    for index, ranked in zip(targets, suggestions):
+        if ranked and ranked[0][1] >= _settings['min_confidence']:
+            records[index]['category'], filled[index] = ranked[0]
+    return filled
+
+
+def status():
+    """Model and prediction cache statistics for the metrics endpoint"""
+    model = _model
+    return {
+        'enabled': _settings['enabled'],
+        'trained': model is not None,
+        'categories': len(model.classes) if model is not None else 0,
+        'cache_hits': _predictions.hits,
+        'cache_misses': _predictions.misses,
+    }
\ No newline at end of file
@@ -0,0 +1,83 @@
+import click
+
+
+def register_commands(app):
+    """Attach the maintenance commands to ``flask <command>``"""
+
+    @app.cli.command('init-db')
+    @click.option('--seed/--no-seed', default=True, show_default=True, help='Insert sample data into empty tables.')
+    def init_db(seed):
+        """Create or upgrade the schema, seed it and build derived tables, then record the schema version."""
+        from api import bootstrap, migrations
+        before = migrations.current_version()
+        bootstrap.init_db(seed=seed)
+        click.echo(f'Database schema at version {migrations.SCHEMA_VERSION} (was {before})')
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups():
+        """Recompute the monthly expense/income rollup tables from the transaction rows, then the budget alerts."""
+        from api.services.budget_service import BudgetService
+        from api.services.rollup_service import RollupService
+        RollupService.rebuild()
+        BudgetService.rebuild()
+        click.echo('Monthly rollups and budget alerts rebuilt')
+
+    @app.cli.command('rebuild-anomalies')
+    def rebuild_anomalies():
+        """Recompute category running stats and flagged anomalies in one pass over the expenses."""
+        from api.services.anomaly_service import AnomalyService
+        AnomalyService.rebuild()
+        click.echo('Expense anomalies rebuilt')
+
+    @app.cli.command('rebuild-search')
+    def rebuild_search():
+        """Refill the full-text search index from the expense and income rows."""
+        from api import search
+        if not search.available():
+            raise click.ClickException('Full-text search needs SQLite with FTS5; LIKE matching is in use')
+        search.rebuild()
+        click.echo('Search index rebuilt')
+
+    @app.cli.command('train-categorizer')
+    @click.option('--full', is_flag=True, help='Retrain from scratch instead of continuing from the saved model.')
+    def train_categorizer(full):
+        """Train the expense category model on the description/category rows and save it."""
+        from api import categorizer
+        if not categorizer.enabled():
+            raise click.ClickException('Category suggestions are disabled (CATEGORIZER_ENABLED=0 or no scikit-learn)')
+        model = categorizer.train(full=full)
+        if model is None:
+            raise click.ClickException(f'Not enough labelled expenses to train on (need {categorizer.MIN_TRAINING_ROWS})')
+        click.echo(f'Categorizer trained through expense {model.trained_through_id} ({len(model.classes)} categories)')
+
+    @app.cli.command('import-data')
+    @click.argument('kind', type=click.Choice(['expenses', 'incomes']))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), help='Defaults to the file extension.')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT/commit.')
+    @click.option('--user-id', default=1, show_default=True, help='User the rows belong to.')
+    def import_data(kind, path, fmt, batch_size, user_id):
+        """Bulk import expenses or incomes from an NDJSON or CSV file."""
+        from api import importer
+        fmt = fmt or importer.detect_format(filename=path)
+        if not fmt:
+            raise click.UsageError('Cannot infer the format from the file name; pass --format')
+
+        with open(path, encoding='utf-8', newline='') as stream:
+            report = importer.import_records(kind, importer.iter_records(stream, fmt), batch_size=batch_size,
+                                             user_id=user_id)
+
+        click.echo(f"Imported {report['imported']} {kind}, {report['failed']} failed")
+        for error in report['errors']:
+            click.echo(f"  line {error['line']}: {error['error']}", err=True)
+
+    @app.cli.command('generate-data')
+    @click.option('--rows', default=100_000, show_default=True, help='Number of expenses to generate.')
+    @click.option('--years', default=3.0, show_default=True, help='Span of the generated history, ending today.')
+    @click.option('--seed', default=42, show_default=True)
+    @click.option('--users', default=1, show_default=True, help='Spread the expenses over this many users.')
+    def generate_data(rows, years, seed, users):
+        """Add a synthetic multi-year dataset (seasonal expenses, recurring incomes) to the database."""
+        from api import datagen
+        expenses, incomes = datagen.populate(rows, years=years, seed=seed, users=users)
+        click.echo(f'Inserted {expenses} expenses and {incomes} incomes')
\ No newline at end of file
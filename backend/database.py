@@ -0,0 +1,89 @@
+"""Database URI, engine options and SQLite connection tuning.
+
+Profiles (``DB_PROFILE``):
+
+* ``production`` (default) - WAL journal so readers never block on the writer,
+  synchronous=NORMAL, larger page cache, mmap I/O and a busy timeout.
+* ``development`` - SQLite defaults (rollback journal), handy for debugging.
+
+Set ``DATABASE_URL`` to use a server database instead of the local SQLite file;
+the SQLite PRAGMAs are then skipped and the pool settings apply as-is.
+"""
+import os
+from sqlalchemy import event, func
+from api import db
+
+PROFILES = ('production', 'development')
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def sqlite_pragmas(profile):
+    """PRAGMAs applied to every new SQLite connection for ``profile``"""
+    if profile == 'development':
+        return {'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)}
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'cache_size': -_env_int('SQLITE_CACHE_SIZE_KB', 64000),  # negative = KiB
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'temp_store': 'MEMORY',
+    }
+
+
+def configure_database(app, base_dir):
+    """Fill in SQLALCHEMY_DATABASE_URI / SQLALCHEMY_ENGINE_OPTIONS unless already configured"""
+    profile = app.config.setdefault('DB_PROFILE', os.environ.get('DB_PROFILE', 'production'))
+    # Initialize an outdated schema on start instead of only via ``flask init-db`` (see bootstrap)
+    app.config.setdefault('DB_AUTO_INIT', os.environ.get('DB_AUTO_INIT', '1') == '1')
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}'. Use one of: {', '.join(PROFILES)}")
+
+    default_path = os.environ.get('SQLITE_PATH', os.path.join(base_dir, 'expenses.db'))
+    uri = app.config.setdefault(
+        'SQLALCHEMY_DATABASE_URI', os.environ.get('DATABASE_URL') or f'sqlite:///{default_path}'
+    )
+
+    options = {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+    }
+    if uri.startswith('sqlite'):
+        if ':memory:' in uri or uri in ('sqlite://', 'sqlite:///'):
+            options = {}  # in-memory databases use a single shared connection pool
+    else:
+        options['pool_recycle'] = _env_int('DB_POOL_RECYCLE', 1800)
+        options['pool_pre_ping'] = True
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', options)
+
+
+def install_connection_hooks(app):
+    """Apply the profile's PRAGMAs on every new SQLite connection (call after db.init_app)"""
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+    pragmas = sqlite_pragmas(app.config['DB_PROFILE'])
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', set_pragmas)
+
+
+def month_key(column):
+    """SQL expression formatting a date column as 'YYYY-MM' on the active dialect"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    if dialect in ('mysql', 'mariadb'):
+        return func.date_format(column, '%Y-%m')
+    return func.strftime('%Y-%m', column)
\ No newline at end of file
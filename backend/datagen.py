@@ -0,0 +1,164 @@
+"""Synthetic multi-year expense/income data for benchmarks and local testing.
+
+Expenses follow per-category frequency weights and log-normal amounts, with a
+monthly seasonality curve (December shopping, summer travel, winter
+utilities) applied to both how many expenses fall in a month and how large
+they are. Incomes are a recurring monthly salary with a yearly raise, plus
+irregular freelance payments and quarterly dividends. With ``users > 1``
+expenses are spread uniformly over user ids 1..users and every user gets their
+own income history. The same seed always produces the same rows.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+from api import cache, db
+from api.models.expense import Expense
+from api.models.income import Income
+
+INSERT_BATCH_SIZE = 10_000
+
+# category: (relative frequency, median amount, log-normal sigma, descriptions)
+CATEGORY_PROFILES = {
+    'Food': (0.34, 25.0, 0.6, ['Groceries', 'Lunch', 'Dinner out', 'Coffee', 'Takeaway']),
+    'Transport': (0.18, 15.0, 0.7, ['Bus fare', 'Fuel', 'Taxi', 'Train ticket', 'Parking']),
+    'Entertainment': (0.11, 40.0, 0.8, ['Movie tickets', 'Concert', 'Streaming', 'Games']),
+    'Utilities': (0.07, 90.0, 0.4, ['Electricity bill', 'Water bill', 'Internet', 'Phone']),
+    'Shopping': (0.14, 60.0, 0.9, ['Clothes', 'Electronics', 'Home goods', 'Gifts']),
+    'Healthcare': (0.05, 80.0, 0.9, ['Pharmacy', 'Doctor visit', 'Dentist']),
+    'Travel': (0.04, 250.0, 1.0, ['Flights', 'Hotel', 'Car rental']),
+    'Rent': (0.07, 1200.0, 0.1, ['Monthly rent']),
+}
+
+# Multiplier per calendar month (index 0 = January)
+SEASONALITY = np.array([0.95, 0.85, 0.95, 1.0, 1.0, 1.1, 1.2, 1.2, 1.0, 1.0, 1.1, 1.45])
+CATEGORY_SEASONALITY = {
+    'Travel': np.array([0.6, 0.6, 0.8, 1.0, 1.1, 1.6, 2.0, 2.0, 1.1, 0.8, 0.6, 1.2]),
+    'Utilities': np.array([1.4, 1.3, 1.1, 0.9, 0.8, 0.9, 1.0, 1.0, 0.8, 0.9, 1.1, 1.4]),
+    'Shopping': np.array([0.8, 0.8, 0.9, 0.9, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.3, 2.0]),
+}
+
+
+def _date_range(years, end):
+    end = end or date.today()
+    return end - timedelta(days=int(round(365.25 * years))), end
+
+
+def iter_expense_batches(rows, years=3, seed=42, end=None, batch_size=INSERT_BATCH_SIZE, users=1):
+    """Yield lists of expense dicts (user_id, category, amount_cents, description, date).
+
+    Values are generated as NumPy columns and only turned into dicts one batch
+    at a time, so a million-row dataset does not sit in memory as Python objects.
+    """
+    rng = np.random.default_rng(seed)
+    start, end = _date_range(years, end)
+    days = (end - start).days + 1
+
+    # Seasonal density: oversample uniform days, keep each with probability factor / max factor
+    offsets = np.empty(0, dtype=np.int64)
+    month_of_day = np.array([(start + timedelta(days=int(d))).month - 1 for d in range(days)])
+    keep_probability = SEASONALITY[month_of_day] / SEASONALITY.max()
+    while offsets.size < rows:
+        candidates = rng.integers(0, days, size=max(rows, 1024) * 2)
+        kept = candidates[rng.random(candidates.size) < keep_probability[candidates]]
+        offsets = np.concatenate([offsets, kept])
+    offsets = offsets[:rows]
+    months = month_of_day[offsets]
+
+    names = list(CATEGORY_PROFILES)
+    weights = np.array([CATEGORY_PROFILES[name][0] for name in names])
+    codes = rng.choice(len(names), size=rows, p=weights / weights.sum())
+
+    amounts = np.empty(rows)
+    descriptions = np.empty(rows, dtype=object)
+    for code, name in enumerate(names):
+        mask = codes == code
+        count = int(mask.sum())
+        if not count:
+            continue
+        _, median, sigma, labels = CATEGORY_PROFILES[name]
+        factor = CATEGORY_SEASONALITY.get(name, SEASONALITY)[months[mask]]
+        amounts[mask] = rng.lognormal(np.log(median), sigma, size=count) * factor
+        descriptions[mask] = np.array(labels, dtype=object)[rng.integers(0, len(labels), size=count)]
+    amounts = np.round(np.maximum(amounts, 0.5) * 100).astype(np.int64)  # cents
+    if users > 1:
+        user_ids = rng.integers(1, users + 1, size=rows)
+    else:
+        user_ids = np.ones(rows, dtype=np.int64)
+
+    for first in range(0, rows, batch_size):
+        window = slice(first, first + batch_size)
+        yield [
+            {'user_id': user_id, 'category': names[code], 'amount_cents': amount, 'description': description,
+             'date': start + timedelta(days=offset)}
+            for user_id, code, amount, description, offset in zip(
+                user_ids[window].tolist(), codes[window].tolist(), amounts[window].tolist(), descriptions[window],
+                offsets[window].tolist())
+        ]
+
+
+def generate_expenses(rows, years=3, seed=42, end=None):
+    """Return all generated expenses as one list"""
+    return [expense for batch in iter_expense_batches(rows, years, seed, end) for expense in batch]
+
+
+def generate_incomes(years=3, seed=42, end=None, salary=5000.0, user_id=1):
+    """Return a list of income dicts: monthly salary, occasional freelance work, quarterly dividends"""
+    rng = np.random.default_rng(seed + 1)
+    start, end = _date_range(years, end)
+    incomes = []
+    month = start.replace(day=1)
+    while month <= end:
+        payday = month.replace(day=25)
+        if start <= payday <= end:
+            raises = (payday - start).days // 365  # 3% every year
+            incomes.append({'user_id': user_id, 'source': 'Salary', 'amount_cents': round(salary * 1.03 ** raises * 100),
+                            'description': 'Monthly salary', 'date': payday, 'is_recurring': True})
+        if rng.random() < 0.35:
+            day = month.replace(day=int(rng.integers(1, 29)))
+            if start <= day <= end:
+                incomes.append({'user_id': user_id, 'source': 'Freelance', 'amount_cents': round(float(rng.lognormal(np.log(900), 0.5)) * 100),
+                                'description': 'Freelance project', 'date': day, 'is_recurring': False})
+        if month.month in (3, 6, 9, 12):
+            day = month.replace(day=15)
+            if start <= day <= end:
+                incomes.append({'user_id': user_id, 'source': 'Investment', 'amount_cents': round(float(rng.normal(200, 40)) * 100),
+                                'description': 'Dividend from stocks', 'date': day, 'is_recurring': False})
+        month = (month + timedelta(days=32)).replace(day=1)
+    return incomes
+
+
+def populate(rows, years=3, seed=42, end=None, batch_size=INSERT_BATCH_SIZE, users=1):
+    """Insert generated data into the current app's database and rebuild derived tables.
+
+    Rows are written with executemany INSERTs, bypassing the per-row mutation
+    hooks, so rollups and anomaly stats are rebuilt once at the end.
+    ``rows`` expenses are shared among ``users`` users.
+    Pass a fixed ``end`` date for datasets that are identical across days.
+    Returns (expenses_inserted, incomes_inserted).
+    """
+    from api.services.anomaly_service import AnomalyService
+    from api.services.budget_service import BudgetService
+    from api.services.recurrence_service import RecurrenceService
+    from api.services.rollup_service import RollupService
+
+    expense_count = 0
+    for batch in iter_expense_batches(rows, years=years, seed=seed, end=end, batch_size=batch_size, users=users):
+        db.session.execute(insert(Expense), batch)
+        expense_count += len(batch)
+    incomes = []
+    for user_id in range(1, users + 1):
+        incomes.extend(generate_incomes(years=years, seed=seed + user_id - 1, end=end, user_id=user_id))
+    for first in range(0, len(incomes), batch_size):
+        db.session.execute(insert(Income), incomes[first:first + batch_size])
+    db.session.commit()
+
+    RollupService.rebuild()
+    AnomalyService.rebuild()
+    BudgetService.rebuild()
+    RecurrenceService.sync_income_sources({(row['user_id'], row['source']) for row in incomes if row['is_recurring']})
+    db.session.commit()
+    for user_id in range(1, users + 1):
+        cache.bump_version(user_id)
+    return expense_count, len(incomes)
\ No newline at end of file
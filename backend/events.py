@@ -0,0 +1,200 @@
+"""Live change feed for dashboard clients over Server-Sent Events.
+
+The mutation hooks record small deltas (the changed rows, then the updated
+aggregates) while a request runs; ``mutations.after_commit`` publishes them
+once the change is durable, so a rolled-back request never emits anything.
+
+``Broker`` fans each event out to at most ``STREAM_MAX_CLIENTS`` subscribers,
+each with a queue of ``STREAM_QUEUE_SIZE`` frames. Publishing never blocks: a
+client whose queue is full is sent a ``resync`` event and disconnected, and
+refetches once its EventSource reconnects. Frames are encoded once per event,
+idle streams get a comment line every ``STREAM_HEARTBEAT_SECONDS`` to keep
+proxies from closing them, and the last ``STREAM_HISTORY`` events are kept so
+a reconnecting client (``Last-Event-ID``) receives what it missed.
+
+Clients only receive their own user's events (see ``tenancy``). The broker is
+per process: under a multi-worker server a client only sees changes written
+through the worker it is connected to.
+"""
+import os
+import queue
+import threading
+from collections import deque
+from flask import g, has_app_context
+from api import serializers
+from api.tenancy import current_user_id
+
+RECONNECT_MS = 3000  # sent as ``retry:`` so EventSource reconnects quickly after a drop
+
+_broker = None
+
+
+class BrokerFull(Exception):
+    """Raised when STREAM_MAX_CLIENTS subscribers are already connected"""
+
+
+class Subscriber:
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+        self.closed = False
+
+
+def encode(event_id, event_type, data):
+    """One SSE frame (bytes)"""
+    head = f'event: {event_type}\n' if event_id is None else f'id: {event_id}\nevent: {event_type}\n'
+    return head.encode() + b'data: ' + serializers.dumps(data) + b'\n\n'
+
+
+class Broker:
+    """Bounded in-process fan-out of encoded SSE frames"""
+
+    def __init__(self, max_subscribers=100, queue_size=256, history=500):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._subscribers = set()
+        self._user_counts = {}
+        self._history = deque(maxlen=history)
+        self._last_id = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def active(self, user_id):
+        """Whether any client of ``user_id`` is connected"""
+        return self._user_counts.get(user_id, 0) > 0
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, user_id):
+        with self._lock:
+            if self._closed:
+                raise BrokerFull('Server is shutting down')
+            if len(self._subscribers) >= self.max_subscribers:
+                raise BrokerFull('Too many live update clients')
+            subscriber = Subscriber(user_id, self.queue_size)
+            self._subscribers.add(subscriber)
+            self._user_counts[user_id] = self._user_counts.get(user_id, 0) + 1
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+                remaining = self._user_counts[subscriber.user_id] - 1
+                if remaining:
+                    self._user_counts[subscriber.user_id] = remaining
+                else:
+                    del self._user_counts[subscriber.user_id]
+
+    def publish(self, user_id, event_type, data):
+        """Send an event to every subscriber of ``user_id`` without blocking; returns its id"""
+        with self._lock:
+            self._last_id += 1
+            event_id = self._last_id
+            frame = encode(event_id, event_type, data)
+            self._history.append((event_id, user_id, frame))
+            self.published += 1
+            for subscriber in self._subscribers:
+                if subscriber.user_id != user_id or subscriber.overflowed:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(frame)
+                except queue.Full:
+                    subscriber.overflowed = True
+                    self.dropped += 1
+        return event_id
+
+    def close(self):
+        """End every open stream and refuse new ones (graceful shutdown); clients reconnect elsewhere"""
+        with self._lock:
+            self._closed = True
+            for subscriber in self._subscribers:
+                subscriber.closed = True
+                try:
+                    subscriber.queue.put_nowait(b'')  # wake the stream so it sees the flag
+                except queue.Full:
+                    pass  # a full queue means the stream is not waiting; it sees the flag next
+
+    def replay(self, user_id, last_event_id):
+        """``user_id``'s frames published after ``last_event_id``, or None when they are no longer all retained"""
+        with self._lock:
+            if last_event_id >= self._last_id:
+                return []
+            oldest = self._history[0][0] if self._history else self._last_id + 1
+            if last_event_id + 1 < oldest:
+                return None
+            return [frame for event_id, owner, frame in self._history
+                    if event_id > last_event_id and owner == user_id]
+
+
+def init_events(app):
+    """Create the broker from app config"""
+    global _broker
+    app.config.setdefault('STREAM_MAX_CLIENTS', int(os.environ.get('STREAM_MAX_CLIENTS', 100)))
+    app.config.setdefault('STREAM_QUEUE_SIZE', int(os.environ.get('STREAM_QUEUE_SIZE', 256)))
+    app.config.setdefault('STREAM_HISTORY', int(os.environ.get('STREAM_HISTORY', 500)))
+    app.config.setdefault('STREAM_HEARTBEAT_SECONDS', float(os.environ.get('STREAM_HEARTBEAT_SECONDS', 15)))
+    _broker = Broker(app.config['STREAM_MAX_CLIENTS'], app.config['STREAM_QUEUE_SIZE'],
+                     app.config['STREAM_HISTORY'])
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = Broker()
+    return _broker
+
+
+# ===== PENDING EVENTS =====
+def record(event_type, data, months=()):
+    """Queue a delta for publication after the current transaction commits.
+
+    ``months`` (YYYY-MM keys) are the months whose aggregates the change touched.
+    Nothing is recorded while no client is connected.
+    """
+    if not has_app_context() or not get_broker().active(current_user_id()):
+        return
+    pending = g.setdefault('_stream_pending', {'events': [], 'months': set()})
+    pending['events'].append((event_type, data))
+    pending['months'].update(months)
+
+
+def publish_pending():
+    """Publish the current user's deltas recorded since the last commit; returns the touched months"""
+    if not has_app_context():
+        return set()
+    pending = g.pop('_stream_pending', None)
+    if pending is None:
+        return set()
+    broker = get_broker()
+    user_id = current_user_id()
+    for event_type, data in pending['events']:
+        broker.publish(user_id, event_type, data)
+    return pending['months']
+
+
+# ===== STREAM =====
+def stream(subscriber, heartbeat, first_frames=()):
+    """Generator of SSE bytes for one client; unsubscribes when the client goes away"""
+    broker = get_broker()
+    try:
+        yield f'retry: {RECONNECT_MS}\n\n'.encode()
+        for frame in first_frames:
+            yield frame
+        while not subscriber.closed:
+            if subscriber.overflowed:
+                yield encode(None, 'resync', {'reason': 'client fell behind'})
+                return
+            try:
+                frame = subscriber.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield b': heartbeat\n\n'
+                continue
+            yield frame
+    finally:
+        broker.unsubscribe(subscriber)
\ No newline at end of file
@@ -0,0 +1,43 @@
+from api import db
+from api.money import amount_expr, from_cents, to_cents
+from api.tenancy import DEFAULT_USER_ID
+from sqlalchemy.ext.hybrid import hybrid_property
+from datetime import datetime
+
+class Expense(db.Model):
+    __tablename__ = 'expenses'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=DEFAULT_USER_ID)
+    category = db.Column(db.String(50), nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    description = db.Column(db.String(200), default='')
+    date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @hybrid_property
+    def amount(self):
+        """Decimal amount; stored as integer ``amount_cents``"""
+        return from_cents(self.amount_cents)
+    
+    @amount.inplace.setter
+    def _amount_setter(self, value):
+        self.amount_cents = to_cents(value)
+    
+    @amount.inplace.expression
+    @classmethod
+    def _amount_expression(cls):
+        return amount_expr(cls.amount_cents)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'amount': self.amount,
+            'description': self.description,
+            'date': self.date.isoformat() if self.date else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Expense {self.category}: ${self.amount}>'
\ No newline at end of file
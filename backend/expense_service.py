@@ -1,77 +1,58 @@
-import os
-import openai
-from datetime import datetime, timedelta
-from sqlalchemy import func
-from ..models import db, Expense, Income
-
-# Set OpenAI API key
-openai.api_key = os.getenv('OPENAI_API_KEY')
+from datetime import date, datetime, timedelta
+from .. import aggregates, insight_jobs
+from ..cache import memoize
+from .budget_service import BudgetService
 
 class ExpenseService:
     @staticmethod
+    @memoize()
     def get_monthly_summary():
         """Get monthly expense and income summary"""
-        current_month = datetime.now().replace(day=1)
-        
-        # Get current month expenses
-        monthly_expenses = db.session.query(
-            func.sum(Expense.amount).label('total')
-        ).filter(
-            Expense.date >= current_month
-        ).first()
+        current_month = date.today().replace(day=1)
         
-        # Get current month income
-        monthly_income = db.session.query(
-            func.sum(Income.amount).label('total')
-        ).filter(
-            Income.date >= current_month
-        ).first()
+        monthly_expenses = aggregates.expense_stats(start=current_month).total
+        monthly_income = aggregates.income_totals(start=current_month)[1]
         
         return {
-            'expenses': monthly_expenses.total or 0,
-            'income': monthly_income.total or 0,
-            'balance': (monthly_income.total or 0) - (monthly_expenses.total or 0)
+            'expenses': monthly_expenses,
+            'income': monthly_income,
+            'balance': monthly_income - monthly_expenses
         }
     
     @staticmethod
+    @memoize()
     def get_category_breakdown():
         """Get expense breakdown by category"""
-        current_month = datetime.now().replace(day=1)
+        current_month = date.today().replace(day=1)
         
-        category_data = db.session.query(
-            Expense.category,
-            func.sum(Expense.amount).label('total')
-        ).filter(
-            Expense.date >= current_month
-        ).group_by(Expense.category).all()
+        category_data = aggregates.expense_category_stats(start=current_month)
         
-        return [{'category': cat, 'amount': float(total)} for cat, total in category_data]
+        return [{'category': row.category, 'amount': float(row.total)} for row in category_data]
     
     @staticmethod
+    @memoize()
     def get_spending_trends():
         """Get last 6 months spending trends"""
-        six_months_ago = datetime.now() - timedelta(days=180)
+        six_months_ago = date.today() - timedelta(days=180)
         
-        trends = db.session.query(
-            func.strftime('%Y-%m', Expense.date).label('month'),
-            func.sum(Expense.amount).label('total')
-        ).filter(
-            Expense.date >= six_months_ago
-        ).group_by(func.strftime('%Y-%m', Expense.date)).all()
+        trends = aggregates.expense_month_totals(start=six_months_ago)
         
         return [{'month': month, 'amount': float(total)} for month, total in trends]
     
     @staticmethod
-    def generate_ai_insights():
-        """Generate AI-powered financial insights"""
-        try:
-            # Get data for analysis
-            summary = ExpenseService.get_monthly_summary()
-            categories = ExpenseService.get_category_breakdown()
-            trends = ExpenseService.get_spending_trends()
-            
-            # Prepare data for AI
-            prompt = f"""
+    def get_insight_inputs():
+        """Collect the numbers the AI prompt is built from"""
+        return {
+            'summary': ExpenseService.get_monthly_summary(),
+            'categories': ExpenseService.get_category_breakdown(),
+            'trends': ExpenseService.get_spending_trends()
+        }
+    
+    @staticmethod
+    def build_insight_prompt(inputs):
+        """Render the advisor prompt for a set of insight inputs"""
+        summary = inputs['summary']
+        return f"""
             Analyze this financial data and provide actionable insights:
             
             Monthly Summary:
@@ -79,9 +60,9 @@ class ExpenseService:
             - Expenses: ${summary['expenses']}
             - Balance: ${summary['balance']}
             
-            Category Breakdown: {categories}
+            Category Breakdown: {inputs['categories']}
             
-            6-Month Trends: {trends}
+            6-Month Trends: {inputs['trends']}
             
             Please provide:
             1. 3 key insights about spending patterns
@@ -90,38 +71,45 @@ class ExpenseService:
             
             Keep response concise and practical.
             """
-            
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a personal finance advisor. Provide clear, actionable advice."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300,
-                temperature=0.7
-            )
-            
-            return {
-                'insights': response.choices[0].message.content,
-                'summary': summary,
-                'last_updated': datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            return {
-                'insights': 'AI insights temporarily unavailable. Here are your key numbers: ' + 
-                           f"Monthly balance: ${summary['balance']}, " +
-                           f"Total expenses: ${summary['expenses']}",
-                'summary': summary,
-                'last_updated': datetime.now().isoformat(),
-                'error': str(e)
-            }
     
     @staticmethod
+    def _run_insights(provider, inputs, timeout):
+        """Worker-side half of generate_ai_insights: call the provider (no app context needed)"""
+        return {
+            'insights': provider.complete(ExpenseService.build_insight_prompt(inputs), timeout),
+            'summary': inputs['summary'],
+            'last_updated': datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def _fallback_insights(inputs, error):
+        summary = inputs['summary']
+        return {
+            'insights': 'AI insights temporarily unavailable. Here are your key numbers: ' + 
+                       f"Monthly balance: ${summary['balance']}, " +
+                       f"Total expenses: ${summary['expenses']}",
+            'summary': summary,
+            'last_updated': datetime.now().isoformat(),
+            'error': str(error)
+        }
+    
+    @staticmethod
+    def generate_ai_insights():
+        """Queue AI-powered financial insights; returns the job (result is filled in when done)"""
+        inputs = ExpenseService.get_insight_inputs()
+        return insight_jobs.submit(inputs, ExpenseService._run_insights,
+                                   fallback=ExpenseService._fallback_insights)
+    
+    @staticmethod
+    def get_ai_insights_job(job_id):
+        """Status/result of a queued insight job, or None if unknown"""
+        return insight_jobs.get_job(job_id)
+    
+    @staticmethod
+    @memoize()
     def get_budget_alerts():
         """Check for budget alerts and recommendations"""
         summary = ExpenseService.get_monthly_summary()
-        categories = ExpenseService.get_category_breakdown()
         
         alerts = []
         
@@ -132,15 +120,7 @@ class ExpenseService:
                 'message': f"You're overspending by ${abs(summary['balance']):.2f} this month"
             })
         
-        # Check for high category spending
-        total_expenses = summary['expenses']
-        if total_expenses > 0:
-            for cat in categories:
-                percentage = (cat['amount'] / total_expenses) * 100
-                if percentage > 40:
-                    alerts.append({
-                        'type': 'info',
-                        'message': f"{cat['category']} represents {percentage:.1f}% of your spending"
-                    })
+        # Thresholds crossed by this month's spend, kept up to date by the expense mutation hooks
+        alerts.extend({'type': alert['type'], 'message': alert['message']} for alert in BudgetService.alerts())
         
         return alerts
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""Gunicorn settings for serving the API in production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment (the names below) or on
+the command line. Workers are forked from a preloaded app, so start-up work
+runs once; each worker then drops the database connections it inherited and
+opens its own. Threaded workers (``gthread``) keep slow clients and
+Server-Sent Events streams from tying up whole processes; every open stream
+holds one thread, so size ``GUNICORN_THREADS`` above the expected number of
+live dashboard clients per worker.
+
+On SIGTERM each worker stops accepting connections, closes its event streams
+(clients reconnect to another worker) and gives in-flight requests up to
+``GUNICORN_GRACEFUL_TIMEOUT`` seconds to finish.
+
+Workers must share data versions (cache invalidation, snapshot reloads) and
+insight job status, so with more than one worker CACHE_BACKEND defaults to
+``filesystem``, and an explicit per-process backend refuses to start.
+"""
+import multiprocessing
+import os
+import signal
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('GUNICORN_WORKERS', os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)))
+worker_class = 'gthread'
+if workers > 1:
+    os.environ.setdefault('CACHE_BACKEND', 'filesystem')  # read by create_app when the app is preloaded
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 20))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Recycle workers now and then to bound memory growth; jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Refuse several workers on a per-process cache backend (also catches -w given on the command line)"""
+    from wsgi import app
+    backend = app.config['CACHE_BACKEND']
+    if server.cfg.workers > 1 and backend != 'filesystem':
+        raise RuntimeError(f'CACHE_BACKEND={backend} keeps data versions and insight jobs per process; '
+                           f'run {server.cfg.workers} workers with CACHE_BACKEND=filesystem or use one worker')
+
+
+def post_fork(server, worker):
+    """Never share the master's pooled connections (SQLite handles must not cross a fork)"""
+    from api import db
+    from wsgi import app
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """Close the event streams as soon as graceful shutdown starts, not after the timeout"""
+    from api import events
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        events.get_broker().close()
+        if callable(previous):
+            previous(signum, frame)
+    signal.signal(signal.SIGTERM, handle_term)
+
+
+def worker_exit(server, worker):
+    from api import categorizer, insight_jobs
+    insight_jobs.shutdown(wait=False)
+    categorizer.shutdown(wait=False)
\ No newline at end of file
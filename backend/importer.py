@@ -0,0 +1,131 @@
+"""Streaming bulk import of expenses and incomes from NDJSON or CSV.
+
+Records are parsed one at a time from a text stream, validated with the same
+rules as the create routes, and inserted in batches with a single executemany
+INSERT per batch. Only one batch is held in memory, so memory use does not
+depend on the file size. Expense records without a category get the
+categorizer's suggestion, predicted for a whole batch at a time.
+"""
+import csv
+import json
+from sqlalchemy import insert
+from api import categorizer, db, mutations
+from api.models.expense import Expense
+from api.models.income import Income
+from api.tenancy import current_user_id
+from api.validation import ValidationError, parse_expense, parse_income
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+FORMATS = ('ndjson', 'csv')
+
+_KINDS = {
+    'expenses': (Expense, parse_expense, mutations.ExpenseSnapshot, mutations.expenses_applied),
+    'incomes': (Income, parse_income, mutations.IncomeSnapshot, mutations.incomes_applied),
+}
+
+
+class ImportRequestError(ValueError):
+    """Raised for problems with the import request itself (unknown kind or format)"""
+
+
+def detect_format(content_type=None, filename=None):
+    """Guess 'ndjson' or 'csv' from a MIME type or file extension"""
+    content_type = (content_type or '').lower()
+    filename = (filename or '').lower()
+    if 'csv' in content_type or filename.endswith('.csv'):
+        return 'csv'
+    if 'ndjson' in content_type or 'jsonl' in content_type or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def iter_records(stream, fmt):
+    """Yield (line_number, record_or_error) from a text stream without reading it whole"""
+    if fmt == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValidationError(f'Invalid JSON: {e}')
+                continue
+            if not isinstance(record, dict):
+                yield line_number, ValidationError('Each line must be a JSON object')
+                continue
+            yield line_number, record
+    elif fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            # line_num is the physical line of the row's end; the header is line 1
+            yield reader.line_num, record
+    else:
+        raise ImportRequestError(f"Unsupported format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+
+
+def _flush(model, snapshot_cls, on_inserted, batch):
+    ids = db.session.execute(
+        insert(model).returning(model.id, sort_by_parameter_order=True), batch
+    ).scalars().all()
+    snapshots = [snapshot_cls(row_id, *(row[field] for field in snapshot_cls._fields[1:]))
+                 for row_id, row in zip(ids, batch)]
+    on_inserted(created=snapshots)
+    db.session.commit()
+    mutations.after_commit()
+
+
+def _with_suggestions(records, chunk_size, user_id):
+    """Pass records through, filling missing expense categories with one batched prediction per chunk"""
+    chunk = []
+    for item in records:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            categorizer.fill_missing([record for _, record in chunk], user_id)
+            yield from chunk
+            chunk = []
+    if chunk:
+        categorizer.fill_missing([record for _, record in chunk], user_id)
+        yield from chunk
+
+
+def import_records(kind, records, batch_size=DEFAULT_BATCH_SIZE, user_id=None):
+    """Validate and insert ``records`` (from iter_records) for ``user_id`` (default: the current user),
+    committing every ``batch_size`` rows.
+
+    Returns a report: {'imported', 'failed', 'errors': [{'line', 'error'}]}. Invalid
+    rows are skipped and reported; at most MAX_REPORTED_ERRORS are listed.
+    """
+    if kind not in _KINDS:
+        raise ImportRequestError(f"Unknown import kind '{kind}'")
+    model, parse, snapshot_cls, on_inserted = _KINDS[kind]
+    user_id = current_user_id() if user_id is None else user_id
+    if kind == 'expenses' and categorizer.enabled():
+        records = _with_suggestions(records, batch_size, user_id)
+
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+    batch = []
+    try:
+        for line_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                batch.append(dict(parse(record), user_id=user_id))
+            except ValidationError as e:
+                report['failed'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append({'line': line_number, 'error': str(e)})
+                continue
+
+            if len(batch) >= batch_size:
+                _flush(model, snapshot_cls, on_inserted, batch)
+                report['imported'] += len(batch)
+                batch = []
+
+        if batch:
+            _flush(model, snapshot_cls, on_inserted, batch)
+            report['imported'] += len(batch)
+    except Exception:
+        db.session.rollback()
+        raise
+    return report
\ No newline at end of file
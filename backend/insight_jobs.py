@@ -0,0 +1,200 @@
+"""Background job queue for AI insight generation.
+
+Requests submit the insight inputs and get a job id back immediately; a small
+thread pool calls the provider outside the request. Results are stored in the
+cache backend under a content address - the SHA-256 of the canonical JSON of
+the inputs - so identical inputs are answered from the cache without calling
+(or paying for) the provider again, and concurrent submissions of the same
+inputs share one job.
+
+A job runs in the process that accepted it, but every state change is also
+written to the cache backend, so a poll that reaches another gunicorn worker
+still finds it. That needs a shared backend (CACHE_BACKEND=filesystem), just
+like cache invalidation.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from api import cache, llm
+
+MAX_TRACKED_JOBS = 1000
+DEADLINE_GRACE = 5.0  # seconds past INSIGHTS_TIMEOUT before a running job is reported as timed out
+
+_executor = None
+_provider = None
+_settings = {'timeout': 20.0, 'cache_ttl': 86400}
+_jobs = OrderedDict()
+_jobs_by_key = {}
+_lock = threading.Lock()
+
+
+def init_insights(app):
+    """Create the provider and worker pool from app config"""
+    global _executor, _provider
+    app.config.setdefault('INSIGHTS_PROVIDER', os.environ.get('INSIGHTS_PROVIDER', 'openai'))
+    app.config.setdefault('INSIGHTS_MODEL', os.environ.get('INSIGHTS_MODEL', 'gpt-3.5-turbo'))
+    app.config.setdefault('INSIGHTS_STUB_DELAY', float(os.environ.get('INSIGHTS_STUB_DELAY', 0)))
+    app.config.setdefault('INSIGHTS_TIMEOUT', float(os.environ.get('INSIGHTS_TIMEOUT', 20)))
+    app.config.setdefault('INSIGHTS_WORKERS', int(os.environ.get('INSIGHTS_WORKERS', 2)))
+    app.config.setdefault('INSIGHTS_CACHE_TTL', int(os.environ.get('INSIGHTS_CACHE_TTL', 86400)))
+
+    _provider = llm.create_provider(app.config)
+    _settings['timeout'] = app.config['INSIGHTS_TIMEOUT']
+    _settings['cache_ttl'] = app.config['INSIGHTS_CACHE_TTL']
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = ThreadPoolExecutor(max_workers=app.config['INSIGHTS_WORKERS'],
+                                   thread_name_prefix='insights')
+
+
+def shutdown(wait=True):
+    """Stop the worker pool; with ``wait`` running jobs finish first"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=not wait)
+        _executor = None
+
+
+def content_key(inputs):
+    """Content address of the insight inputs (stable across processes)"""
+    canonical = json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _public(job):
+    return {key: value for key, value in job.items() if not key.startswith('_')}
+
+
+def _remember(job):
+    """Track a job, evicting the oldest finished jobs beyond MAX_TRACKED_JOBS"""
+    _jobs[job['id']] = job
+    while len(_jobs) > MAX_TRACKED_JOBS:
+        oldest_id = next((job_id for job_id, old in _jobs.items() if old['status'] in ('done', 'failed')), None)
+        if oldest_id is None:
+            break
+        old = _jobs.pop(oldest_id)
+        if _jobs_by_key.get(old['_key']) == oldest_id:
+            del _jobs_by_key[old['_key']]
+
+
+def _new_job(key, status, result=None):
+    now = datetime.now().isoformat()
+    return {'id': uuid.uuid4().hex, 'status': status, 'cached': False,
+            'submitted_at': now, 'finished_at': now if result is not None else None,
+            'result': result, 'error': None, '_key': key, '_deadline': None, '_fallback': None}
+
+
+def _finish(job, status, result, error):
+    job.update(status=status, result=result, error=error, finished_at=datetime.now().isoformat())
+
+
+def _job_cache_key(job_id):
+    return f'insight-job:{job_id}'
+
+
+def _publish(job):
+    """Store a copy of the job's state for other processes, with its deadline as wall-clock time"""
+    with _lock:
+        state = _public(job)
+        deadline = job['_deadline'] and time.time() + job['_deadline'] - time.monotonic()
+    cache.get_backend().set(_job_cache_key(state['id']), (state, deadline), _settings['cache_ttl'])
+
+
+def _shared_job(job_id):
+    """A job accepted by another process, from the cache backend (None if unknown)"""
+    stored = cache.get_backend().get(_job_cache_key(job_id))
+    if stored is None:
+        return None
+    state, deadline = stored
+    if state['status'] == 'running' and deadline and time.time() > deadline:
+        # The owning process died or its provider hung; its fallback is not available here
+        error = f"Insight generation timed out after {_settings['timeout']}s"
+        state = dict(state, status='failed', error=error, finished_at=datetime.now().isoformat())
+    return state
+
+
+def submit(inputs, run, fallback=None):
+    """Queue ``run(provider, inputs, timeout) -> result`` unless the result is cached or already in flight.
+
+    Returns the job as a dict; its status is 'queued', 'running', 'done' or 'failed'.
+    Failed jobs are not cached; their result is ``fallback(inputs, error)`` if given.
+    """
+    if _executor is None:
+        raise RuntimeError('Insight jobs are not initialized; call init_insights(app)')
+    key = content_key(inputs)
+    cache_key = f'insight:{key}'
+
+    cached = cache.get_backend().get(cache_key)
+    with _lock:
+        if cached is not None:
+            job = _new_job(key, 'done', cached)
+            job['cached'] = True
+            _remember(job)
+        else:
+            in_flight = _jobs.get(_jobs_by_key.get(key))
+            if in_flight and in_flight['status'] in ('queued', 'running'):
+                return _public(in_flight)
+            job = _new_job(key, 'queued')
+            job['_fallback'] = (lambda error: fallback(inputs, error)) if fallback else None
+            _remember(job)
+            _jobs_by_key[key] = job['id']
+    _publish(job)
+    if cached is not None:
+        return _public(job)
+
+    def work():
+        timeout = _settings['timeout']
+        with _lock:
+            job['status'] = 'running'
+            job['_deadline'] = time.monotonic() + timeout + DEADLINE_GRACE
+        _publish(job)
+        try:
+            result = run(_provider, inputs, timeout)
+            cache.get_backend().set(cache_key, result, _settings['cache_ttl'])
+            status, error = 'done', None
+        except Exception as e:
+            result = fallback(inputs, e) if fallback else None
+            status, error = 'failed', str(e)
+        with _lock:
+            finished = job['status'] == 'running'  # not already expired by get_job
+            if finished:
+                _finish(job, status, result, error)
+        if finished:
+            _publish(job)
+
+    _executor.submit(work)
+    return _public(job)
+
+
+def get_job(job_id):
+    """Current state of a job, or None if it is unknown (or was evicted)"""
+    with _lock:
+        job = _jobs.get(job_id)
+        expired = False
+        if job is not None:
+            # A provider that ignores its timeout must not leave the job running forever
+            expired = job['status'] == 'running' and time.monotonic() > job['_deadline']
+            if expired:
+                error = TimeoutError(f"Insight generation timed out after {_settings['timeout']}s")
+                _finish(job, 'failed', job['_fallback'](error) if job['_fallback'] else None, str(error))
+    if job is None:
+        return _shared_job(job_id)
+    if expired:
+        _publish(job)
+    return _public(job)
+
+
+def wait(job_id, timeout):
+    """Poll until the job finishes or ``timeout`` elapses; returns the job dict (used by benchmarks)"""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = get_job(job_id)
+        if job is None or job['status'] in ('done', 'failed') or time.monotonic() >= deadline:
+            return job
+        time.sleep(0.01)
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""Pluggable text-generation providers for AI insights.
+
+``INSIGHTS_PROVIDER`` selects the implementation:
+
+* ``openai`` (default) - the OpenAI chat API; the SDK is imported lazily so the
+  app starts without it installed.
+* ``stub`` - a local, deterministic provider for tests and benchmarks. It never
+  touches the network; ``INSIGHTS_STUB_DELAY`` simulates provider latency.
+"""
+import os
+import time
+from abc import ABC, abstractmethod
+
+SYSTEM_PROMPT = 'You are a personal finance advisor. Provide clear, actionable advice.'
+
+
+class ProviderError(RuntimeError):
+    """Raised when a provider cannot produce a completion"""
+
+
+class InsightProvider(ABC):
+    """Interface: turn a prompt into advice text within ``timeout`` seconds"""
+    name = None
+
+    @abstractmethod
+    def complete(self, prompt, timeout):
+        """Advice text for ``prompt``; raise ProviderError when none can be produced"""
+
+
+class OpenAIProvider(InsightProvider):
+    name = 'openai'
+
+    def __init__(self, model='gpt-3.5-turbo', max_tokens=300, temperature=0.7):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+    def complete(self, prompt, timeout):
+        try:
+            import openai
+        except ImportError as e:
+            raise ProviderError('The openai package is not installed') from e
+        openai.api_key = os.getenv('OPENAI_API_KEY')
+
+        response = openai.ChatCompletion.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            request_timeout=timeout
+        )
+        return response.choices[0].message.content
+
+
+class StubProvider(InsightProvider):
+    """Canned advice derived from the prompt length; optional fixed latency"""
+    name = 'stub'
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def complete(self, prompt, timeout):
+        if self.delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f'Stub provider did not answer within {timeout}s')
+        if self.delay:
+            time.sleep(self.delay)
+        return ('1. Review your largest spending category.\n'
+                '2. Set a monthly budget for discretionary spending.\n'
+                '3. Move part of each paycheck into savings automatically.\n'
+                f'(stub response for a {len(prompt)}-character prompt)')
+
+
+PROVIDERS = {
+    'openai': OpenAIProvider,
+    'stub': StubProvider,
+}
+
+
+def create_provider(config):
+    """Build the provider named by ``config['INSIGHTS_PROVIDER']``"""
+    name = config.get('INSIGHTS_PROVIDER', 'openai')
+    if name == 'openai':
+        return OpenAIProvider(model=config.get('INSIGHTS_MODEL', 'gpt-3.5-turbo'))
+    if name == 'stub':
+        return StubProvider(delay=float(config.get('INSIGHTS_STUB_DELAY', 0)))
+    raise ValueError(f"Unknown INSIGHTS_PROVIDER '{name}'. Use one of: {', '.join(PROVIDERS)}")
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""Per-request performance metrics in Prometheus text format.
+
+``init_metrics(app)`` installs request hooks and SQLAlchemy engine events that
+record, per endpoint:
+
+* request latency (histogram) and request count by method/status
+* SQL statements and time spent in the database per request (histograms)
+* response size in bytes (histogram; streamed bodies are not measured)
+* cache hits and misses seen while handling the request (taken from the
+  backend's counters, so approximate when threads serve requests concurrently)
+
+``/api/metrics`` renders them with ``render()``. Values are per process: under
+a multi-worker server each worker reports its own registry.
+
+Optional diagnostics:
+
+* ``SLOW_QUERY_MS`` - log every statement slower than this (0 disables)
+* ``PROFILE_REQUESTS`` - profile a ``PROFILE_SAMPLE_RATE`` fraction of requests
+  with cProfile and write the profile of any request slower than
+  ``PROFILE_THRESHOLD_MS`` to ``PROFILE_DIR``
+"""
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from api import cache, categorizer, db, events, snapshot
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+# ===== REGISTRY =====
+class Histogram:
+    """Cumulative-bucket histogram per label tuple"""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, label_values, value):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_values, (counts, total) in sorted(self._series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._series = {}
+
+    def inc(self, label_values, amount=1):
+        self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self._series.items()):
+            lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+
+def _labels(names, values):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in values)
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+_lock = threading.Lock()
+REQUESTS = Counter('http_requests_total', 'Requests handled', ('endpoint', 'method', 'status'))
+LATENCY = Histogram('http_request_duration_seconds', 'Request latency', ('endpoint',), LATENCY_BUCKETS)
+DB_QUERIES = Histogram('http_request_db_queries', 'SQL statements per request', ('endpoint',), QUERY_COUNT_BUCKETS)
+DB_TIME = Histogram('http_request_db_seconds', 'Time spent in SQL per request', ('endpoint',), LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size', ('endpoint',), SIZE_BUCKETS)
+CACHE_LOOKUPS = Counter('http_request_cache_lookups_total', 'Cache lookups made while handling requests',
+                        ('endpoint', 'result'))
+SLOW_QUERIES = Counter('db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS', ())
+_METRICS = (REQUESTS, LATENCY, DB_QUERIES, DB_TIME, RESPONSE_SIZE, CACHE_LOOKUPS, SLOW_QUERIES)
+
+
+def render():
+    """All metrics in Prometheus text exposition format"""
+    backend = cache.get_backend()
+    broker = events.get_broker()
+    categorizer_status = categorizer.status()
+    snapshot_status = snapshot.status()
+    with _lock:
+        lines = []
+        for metric in _METRICS:
+            lines.extend(metric.render())
+    lines += [
+        '# HELP cache_hits_total Cache hits since process start', '# TYPE cache_hits_total counter',
+        f'cache_hits_total {backend.hits}',
+        '# HELP cache_misses_total Cache misses since process start', '# TYPE cache_misses_total counter',
+        f'cache_misses_total {backend.misses}',
+        '# HELP stream_clients Connected live update clients', '# TYPE stream_clients gauge',
+        f'stream_clients {broker.subscriber_count}',
+        '# HELP stream_events_published_total Live update events published',
+        '# TYPE stream_events_published_total counter',
+        f'stream_events_published_total {broker.published}',
+        '# HELP stream_clients_dropped_total Clients disconnected for falling behind',
+        '# TYPE stream_clients_dropped_total counter',
+        f'stream_clients_dropped_total {broker.dropped}',
+        '# HELP categorizer_cache_hits_total Category predictions answered from the LRU',
+        '# TYPE categorizer_cache_hits_total counter',
+        f"categorizer_cache_hits_total {categorizer_status['cache_hits']}",
+        '# HELP categorizer_cache_misses_total Category predictions run through the model',
+        '# TYPE categorizer_cache_misses_total counter',
+        f"categorizer_cache_misses_total {categorizer_status['cache_misses']}",
+        '# HELP snapshot_users Users whose rows are held in the in-memory snapshot', '# TYPE snapshot_users gauge',
+        f"snapshot_users {snapshot_status['users']}",
+        '# HELP snapshot_bytes Memory held by snapshot arrays', '# TYPE snapshot_bytes gauge',
+        f"snapshot_bytes {snapshot_status['bytes']}",
+        '# HELP snapshot_loads_total Snapshot slices loaded from the database', '# TYPE snapshot_loads_total counter',
+        f"snapshot_loads_total {snapshot_status['loads']}",
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+# ===== HOOKS =====
+def init_metrics(app):
+    """Install request hooks and engine events (call after db.init_app)"""
+    app.config.setdefault('SLOW_QUERY_MS', float(os.environ.get('SLOW_QUERY_MS', 0)))
+    app.config.setdefault('PROFILE_REQUESTS', os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes'))
+    app.config.setdefault('PROFILE_SAMPLE_RATE', float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1)))
+    app.config.setdefault('PROFILE_THRESHOLD_MS', float(os.environ.get('PROFILE_THRESHOLD_MS', 500)))
+    app.config.setdefault('PROFILE_DIR', os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles')))
+
+    slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if has_request_context() and 'metrics_start' in g:
+            g.metrics_queries += 1
+            g.metrics_db_time += elapsed
+        if slow_query_seconds and elapsed >= slow_query_seconds:
+            with _lock:
+                SLOW_QUERIES.inc(())
+            logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, ' '.join(statement.split())[:500])
+
+    def handle_error(context):
+        # after_cursor_execute does not fire for failed statements; keep the timer stack balanced
+        if context.connection is not None and context.connection.info.get('query_start'):
+            context.connection.info['query_start'].pop()
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(db.engine, 'handle_error', handle_error)
+
+    @app.before_request
+    def start_request_metrics():
+        backend = cache.get_backend()
+        g.metrics_queries = 0
+        g.metrics_db_time = 0.0
+        g.metrics_cache = (backend.hits, backend.misses)
+        g.metrics_profiler = None
+        if app.config['PROFILE_REQUESTS'] and random.random() < app.config['PROFILE_SAMPLE_RATE']:
+            g.metrics_profiler = cProfile.Profile()
+            g.metrics_profiler.enable()
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'metrics_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_start
+        endpoint = request.endpoint or 'unmatched'
+        backend = cache.get_backend()
+        hits, misses = backend.hits - g.metrics_cache[0], backend.misses - g.metrics_cache[1]
+
+        with _lock:
+            REQUESTS.inc((endpoint, request.method, response.status_code))
+            LATENCY.observe((endpoint,), elapsed)
+            DB_QUERIES.observe((endpoint,), g.metrics_queries)
+            DB_TIME.observe((endpoint,), g.metrics_db_time)
+            if not response.is_streamed and response.content_length is not None:
+                RESPONSE_SIZE.observe((endpoint,), response.content_length)
+            if hits:
+                CACHE_LOOKUPS.inc((endpoint, 'hit'), hits)
+            if misses:
+                CACHE_LOOKUPS.inc((endpoint, 'miss'), misses)
+
+        if g.metrics_profiler is not None:
+            g.metrics_profiler.disable()
+            if elapsed * 1000 >= app.config['PROFILE_THRESHOLD_MS']:
+                _save_profile(app.config['PROFILE_DIR'], endpoint, elapsed, g.metrics_profiler)
+            g.metrics_profiler = None
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # after_request does not run when a view raises; never leave a profiler enabled
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+
+
+def _save_profile(directory, endpoint, elapsed, profiler):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{endpoint}-{int(time.time() * 1000)}-{elapsed * 1000:.0f}ms.prof')
+    profiler.dump_stats(path)
+    logger.warning('Slow request %s took %.1f ms; profile written to %s', endpoint, elapsed * 1000, path)
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""In-place upgrades for databases created by earlier versions of the app.
+
+``upgrade()`` runs from ``bootstrap.init_db`` before ``db.create_all()`` and is
+idempotent: each step inspects the live schema and does nothing when it is
+current. The one-row ``schema_version`` table records the SCHEMA_VERSION the
+database was last initialized for, so app start-up can tell with one query
+whether any of this needs to run. Bump SCHEMA_VERSION with every schema change.
+"""
+import logging
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from api import db
+from api.tenancy import DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 4  # 2: budgets and budget_alerts; 3: float expense sums of squares; 4: tenant in the search index
+
+schema_version = db.Table('schema_version', db.Column('version', db.Integer, nullable=False))
+
+# Derived tables that are dropped when they lack the marker column; create_all
+# recreates them and the ensure_built() / materialize() paths refill them.
+_DERIVED_TABLES = {
+    'expense_monthly_rollups': 'sum_sq',
+    'expense_daily_totals': 'sum_sq',
+    'income_monthly_rollups': 'user_id',
+    'category_running_stats': 'user_id',
+    'expense_anomalies': 'user_id',
+    'scheduled_occurrences': 'user_id',
+}
+
+# Pre-tenancy indexes, superseded by the user_id-leading ones in _ensure_indexes()
+_OBSOLETE_INDEXES = ('ix_expenses_date_id', 'ix_expenses_category_date_id',
+                     'ix_incomes_date_id', 'ix_incomes_source_date_id')
+
+
+def _columns(inspector, table):
+    if not inspector.has_table(table):
+        return None
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def _amounts_to_cents(inspector, table):
+    """Replace a float ``amount`` column with integer ``amount_cents`` (rounded half away from zero)"""
+    columns = _columns(inspector, table)
+    if columns is None or 'amount_cents' in columns or 'amount' not in columns:
+        return False
+    with db.engine.begin() as connection:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN amount_cents BIGINT'))
+        connection.execute(text(f'UPDATE {table} SET amount_cents = CAST(ROUND(amount * 100) AS BIGINT)'))
+        # SQLite needs 3.35+ for DROP COLUMN
+        connection.execute(text(f'ALTER TABLE {table} DROP COLUMN amount'))
+    logger.info('Migrated %s.amount to integer amount_cents', table)
+    return True
+
+
+def _add_user_id(inspector, table):
+    """Assign rows written before tenancy to the default user"""
+    columns = _columns(inspector, table)
+    if columns is None or 'user_id' in columns:
+        return False
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            f'ALTER TABLE {table} ADD COLUMN user_id INTEGER NOT NULL DEFAULT {DEFAULT_USER_ID}'
+        ))
+    logger.info('Added %s.user_id', table)
+    return True
+
+
+def _drop_outdated_derived(inspector):
+    for table, marker in _DERIVED_TABLES.items():
+        columns = _columns(inspector, table)
+        if columns is not None and marker not in columns:
+            with db.engine.begin() as connection:
+                connection.execute(text(f'DROP TABLE {table}'))
+                if table == 'scheduled_occurrences':
+                    # Watermarks refer to the dropped rows; the next forecast rematerializes
+                    connection.execute(text('UPDATE recurrence_rules SET materialized_through = NULL'))
+            logger.info('Dropped outdated %s; it is rebuilt from the transactions', table)
+
+
+def _drop_obsolete_indexes():
+    with db.engine.begin() as connection:
+        for name in _OBSOLETE_INDEXES:
+            connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+
+
+def upgrade():
+    """Apply every pending schema upgrade (call inside an app context)"""
+    inspector = inspect(db.engine)
+    _amounts_to_cents(inspector, 'expenses')
+    _amounts_to_cents(inspector, 'incomes')
+    for table in ('expenses', 'incomes', 'recurrence_rules'):
+        _add_user_id(inspector, table)
+    _drop_outdated_derived(inspector)
+    _drop_obsolete_indexes()
+
+
+def current_version():
+    """The SCHEMA_VERSION the database was initialized for; 0 for new or unversioned databases"""
+    try:
+        with db.engine.connect() as connection:
+            return connection.execute(select(schema_version.c.version)).scalar() or 0
+    except (OperationalError, ProgrammingError):  # no schema_version table yet
+        return 0
+
+
+def set_version(version):
+    schema_version.create(bind=db.engine, checkfirst=True)
+    with db.engine.begin() as connection:
+        connection.execute(schema_version.delete())
+        connection.execute(schema_version.insert().values(version=version))
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""Money is stored as integer minor units (cents).
+
+The API still accepts and returns decimal amounts; conversion happens only at
+the edges, so SQL sums, rollups and NumPy aggregations are exact integer
+arithmetic and can be maintained incrementally without drift.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENTS_PER_UNIT = 100
+# Largest accepted amount, a sanity limit against typos and garbage input.
+# Totals stay exact int64 cents for over 90 million maximal amounts; sums of
+# squared cents (for variance) are kept as floats and cannot overflow.
+MAX_AMOUNT = 1_000_000_000
+MAX_AMOUNT_CENTS = MAX_AMOUNT * CENTS_PER_UNIT
+_CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """Parse a decimal amount (number or numeric string) into integer cents, rounding half up"""
+    if isinstance(value, bool):
+        raise ValueError('Amount must be a number')
+    try:
+        # str() first so a float like 0.1 means 0.10, not its binary expansion
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError('Amount must be a number')
+    if not amount.is_finite():
+        raise ValueError('Amount must be a number')
+    return int(amount.quantize(_CENT, rounding=ROUND_HALF_UP) * CENTS_PER_UNIT)
+
+
+def from_cents(cents):
+    """Integer cents to a float amount for output (prints exactly, e.g. 1234 -> 12.34)"""
+    if cents is None:
+        return None
+    return cents / CENTS_PER_UNIT
+
+
+def amount_expr(column):
+    """SQL expression turning a cents column back into a decimal amount"""
+    return column / float(CENTS_PER_UNIT)
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""Hooks run by every route that creates, updates or deletes a transaction.
+
+Handlers call these after staging their change and before ``db.session.commit()``
+so derived state (rollups, anomaly stats, ...) is committed in the same transaction as the row,
+then call ``after_commit()`` once the commit succeeded. The hooks also record the
+row deltas streamed to live update clients (see ``events``) and applied to the
+in-memory analytics snapshot (see ``snapshot``).
+"""
+from collections import namedtuple
+from api import aggregates, cache, categorizer, db, events, snapshot
+from api.money import from_cents
+from api.services.anomaly_service import AnomalyService
+from api.services.budget_service import BudgetService
+from api.services.recurrence_service import RecurrenceService
+from api.services.rollup_service import RollupService
+from api.tenancy import current_user_id
+
+ExpenseSnapshot = namedtuple('ExpenseSnapshot', ['id', 'date', 'category', 'amount_cents', 'user_id'])
+IncomeSnapshot = namedtuple('IncomeSnapshot', ['id', 'date', 'source', 'amount_cents', 'is_recurring', 'user_id'])
+
+# Bulk writes touching more rows than this stream one summary event instead of per-row deltas
+STREAM_ROW_LIMIT = 50
+
+
+def after_commit():
+    """Run side effects that must only happen once the change is durable"""
+    snapshot.apply_pending(current_user_id(), cache.bump_version())
+    months = events.publish_pending()
+    if months:
+        events.get_broker().publish(current_user_id(), 'aggregates', aggregates.dashboard_delta(months))
+
+
+def snapshot_expense(expense):
+    """Capture the fields derived state depends on, before an update mutates them"""
+    return ExpenseSnapshot(expense.id, expense.date, expense.category, expense.amount_cents, expense.user_id)
+
+
+def snapshot_income(income):
+    return IncomeSnapshot(income.id, income.date, income.source, income.amount_cents, bool(income.is_recurring),
+                          income.user_id)
+
+
+# ===== LIVE UPDATES =====
+def _month(row):
+    return row.date.strftime('%Y-%m')
+
+
+def _delta(row):
+    """Wire form of a snapshot: its fields with the amount in currency units"""
+    data = {field: value for field, value in zip(row._fields, row) if field not in ('amount_cents', 'user_id')}
+    data['date'] = row.date.isoformat()
+    data['amount'] = from_cents(row.amount_cents)
+    return data
+
+
+def _record_row(kind, op, obj, snapshot, before=None):
+    """Record a single-row delta; ``before`` adds the month an update moved the row out of"""
+    if not events.get_broker().active(current_user_id()):
+        return
+    if op == 'created' and obj.id is None:
+        db.session.flush()  # assigns the id the client needs; commit would flush anyway
+    row = snapshot(obj)
+    months = [_month(row)] if before is None else [_month(row), _month(before)]
+    events.record(f'{kind}.{op}', {'id': row.id} if op == 'deleted' else _delta(row), months)
+
+
+def _record_bulk(kind, created, updated, deleted):
+    """Per-row deltas for small bulk writes, one ``<kind>s.bulk`` summary for large ones"""
+    if not events.get_broker().active(current_user_id()):
+        return
+    months = {_month(row) for row in created}
+    months.update(_month(row) for pair in updated for row in pair)
+    months.update(_month(row) for row in deleted)
+    if len(created) + len(updated) + len(deleted) > STREAM_ROW_LIMIT:
+        counts = {'created': len(created), 'updated': len(updated), 'deleted': len(deleted)}
+        events.record(f'{kind}s.bulk', counts, months)
+        return
+    deltas = ([(f'{kind}.created', _delta(row)) for row in created] +
+              [(f'{kind}.updated', _delta(after)) for _, after in updated] +
+              [(f'{kind}.deleted', {'id': row.id}) for row in deleted])
+    for event_type, data in deltas:
+        events.record(event_type, data, months)
+        months = ()
+
+
+# ===== EXPENSES =====
+def expense_created(expense):
+    RollupService.apply_expense(expense.user_id, expense.date, expense.category, expense.amount_cents, 1)
+    AnomalyService.observe(expense)
+    BudgetService.observe([expense])
+    categorizer.rows_written(1)
+    snapshot.record('expenses', upserted=[expense])
+    _record_row('expense', 'created', expense, snapshot_expense)
+
+
+def expense_updated(before, expense):
+    RollupService.apply_expense(before.user_id, before.date, before.category, before.amount_cents, -1)
+    RollupService.apply_expense(expense.user_id, expense.date, expense.category, expense.amount_cents, 1)
+    AnomalyService.forget(before)
+    AnomalyService.observe(expense)
+    BudgetService.observe([before, expense])
+    categorizer.rows_written(1)
+    snapshot.record('expenses', upserted=[expense])
+    _record_row('expense', 'updated', expense, snapshot_expense, before)
+
+
+def expense_deleted(expense):
+    RollupService.apply_expense(expense.user_id, expense.date, expense.category, expense.amount_cents, -1)
+    AnomalyService.forget(snapshot_expense(expense))
+    BudgetService.observe([expense])
+    snapshot.record('expenses', deleted=[expense])
+    _record_row('expense', 'deleted', expense, snapshot_expense)
+
+
+def expenses_applied(created=(), updated=(), deleted=()):
+    """Bulk variant for rows written with executemany / bulk UPDATE / bulk DELETE.
+
+    ``created`` and ``deleted`` are snapshots, ``updated`` is a list of (before, after) pairs.
+    """
+    removed = [before for before, _ in updated] + list(deleted)
+    added = list(created) + [after for _, after in updated]
+    RollupService.apply_expense_batch(added, removed)
+    AnomalyService.forget_many(removed)
+    for row in added:
+        AnomalyService.observe(row)
+    BudgetService.observe(added + removed)
+    categorizer.rows_written(len(added))
+    snapshot.record('expenses', upserted=added, deleted=deleted)
+    _record_bulk('expense', created, updated, deleted)
+
+
+# ===== INCOMES =====
+def _recurring_sources(snapshots):
+    """(user_id, source) pairs whose derived recurrence rule may change: those of rows flagged is_recurring"""
+    return {(row.user_id, row.source) for row in snapshots if row.is_recurring}
+
+
+def income_created(income):
+    RollupService.apply_income(income.user_id, income.date, income.source, income.amount_cents, 1)
+    if income.is_recurring:
+        RecurrenceService.sync_income_sources([(income.user_id, income.source)])
+    snapshot.record('incomes', upserted=[income])
+    _record_row('income', 'created', income, snapshot_income)
+
+
+def income_updated(before, income):
+    RollupService.apply_income(before.user_id, before.date, before.source, before.amount_cents, -1)
+    RollupService.apply_income(income.user_id, income.date, income.source, income.amount_cents, 1)
+    RecurrenceService.sync_income_sources(_recurring_sources([before, snapshot_income(income)]))
+    snapshot.record('incomes', upserted=[income])
+    _record_row('income', 'updated', income, snapshot_income, before)
+
+
+def income_deleted(income):
+    RollupService.apply_income(income.user_id, income.date, income.source, income.amount_cents, -1)
+    if income.is_recurring:
+        RecurrenceService.sync_income_sources([(income.user_id, income.source)])
+    snapshot.record('incomes', deleted=[income])
+    _record_row('income', 'deleted', income, snapshot_income)
+
+
+def incomes_applied(created=(), updated=(), deleted=()):
+    """Bulk variant of the income hooks; see expenses_applied"""
+    removed = [before for before, _ in updated] + list(deleted)
+    added = list(created) + [after for _, after in updated]
+    RollupService.apply_income_batch(added, removed)
+    RecurrenceService.sync_income_sources(_recurring_sources(added + removed))
+    snapshot.record('incomes', upserted=added, deleted=deleted)
+    _record_bulk('income', created, updated, deleted)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+from api.money import to_cents
+from api.tenancy import scoped
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class PaginationError(ValueError):
+    """Raised when listing query parameters are invalid"""
+
+
+def encode_cursor(row_date, row_id):
+    """Encode the (date, id) of the last row on a page as an opaque cursor"""
+    raw = f"{row_date.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back into (date, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw_date, raw_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(raw_date).date(), int(raw_id)
+    except Exception:
+        raise PaginationError('Invalid cursor')
+
+
+def parse_date(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        raise PaginationError(f'Invalid {name} date. Use YYYY-MM-DD')
+
+
+def _parse_amount(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return to_cents(value)
+    except ValueError:
+        raise PaginationError(f'Invalid {name}. Must be a number')
+
+
+def parse_limit(args):
+    """Read the page size from the query string, clamped to MAX_PAGE_SIZE"""
+    value = args.get('limit')
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('Invalid limit. Must be an integer')
+    if limit < 1:
+        raise PaginationError('Invalid limit. Must be at least 1')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def apply_filters(query, model, group_column, group_param, args):
+    """Restrict to the current user and push date-range, group (category/source) and amount-range filters into SQL.
+
+    ``group_param`` accepts a comma separated list, e.g. ``?category=Food,Transport``.
+    """
+    date_from = parse_date(args, 'from')
+    date_to = parse_date(args, 'to')
+    min_amount = _parse_amount(args, 'min_amount')
+    max_amount = _parse_amount(args, 'max_amount')
+
+    query = scoped(query, model)
+
+    if date_from:
+        query = query.filter(model.date >= date_from)
+    if date_to:
+        query = query.filter(model.date <= date_to)
+
+    groups = [g.strip() for g in args.get(group_param, '').split(',') if g.strip()]
+    if len(groups) == 1:
+        query = query.filter(group_column == groups[0])
+    elif groups:
+        query = query.filter(group_column.in_(groups))
+
+    if min_amount is not None:
+        query = query.filter(model.amount_cents >= min_amount)
+    if max_amount is not None:
+        query = query.filter(model.amount_cents <= max_amount)
+    return query
+
+
+def paginate(query, model, args):
+    """Return one keyset page of ``query`` ordered by (date, id) descending.
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    One extra row is fetched to know whether another page exists, so a page
+    costs O(limit) regardless of table size. Requests without ``limit`` or
+    ``cursor`` get every row, as before pagination existed, so clients that
+    never follow X-Next-Cursor still see all their transactions.
+    """
+    cursor = args.get('cursor')
+    if not cursor and not args.get('limit'):
+        return query.order_by(model.date.desc(), model.id.desc()).all(), None
+    limit = parse_limit(args)
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.date, model.id) < tuple_(cursor_date, cursor_id))
+
+    rows = query.order_by(model.date.desc(), model.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
+    return rows, next_cursor
\ No newline at end of file
@@ -0,0 +1,74 @@
+from api import db
+from api.money import from_cents
+from api.tenancy import DEFAULT_USER_ID
+from datetime import datetime
+
+FREQUENCIES = ('monthly', 'weekly', 'custom')  # custom repeats every ``interval`` days
+KINDS = ('income', 'expense')
+
+
+class RecurrenceRule(db.Model):
+    """A repeating income or expense; upcoming occurrences are materialized lazily into the schedule"""
+    __tablename__ = 'recurrence_rules'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=DEFAULT_USER_ID, index=True)
+    kind = db.Column(db.String(10), nullable=False)  # income | expense
+    label = db.Column(db.String(50), nullable=False)  # income source or expense category
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    description = db.Column(db.String(200), default='')
+    frequency = db.Column(db.String(10), nullable=False, default='monthly')
+    interval = db.Column(db.Integer, nullable=False, default=1)  # months, weeks or days between occurrences
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date)
+    # Derived from the incomes flagged is_recurring (one rule per source), kept in sync by the mutation hooks
+    derived = db.Column(db.Boolean, nullable=False, default=False)
+    materialized_through = db.Column(db.Date)  # schedule rows exist for every occurrence up to this date
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'label': self.label,
+            'amount': from_cents(self.amount_cents),
+            'description': self.description,
+            'frequency': self.frequency,
+            'interval': self.interval,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'derived': self.derived,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<RecurrenceRule {self.kind} {self.label}: {self.amount_cents} cents {self.frequency}/{self.interval}>'
+
+
+class ScheduledOccurrence(db.Model):
+    """One upcoming occurrence of a recurrence rule inside the rolling forecast window"""
+    __tablename__ = 'scheduled_occurrences'
+    __table_args__ = (
+        db.UniqueConstraint('rule_id', 'date', name='uq_scheduled_occurrences_rule_date'),
+        db.Index('ix_scheduled_occurrences_user_date_kind', 'user_id', 'date', 'kind'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    rule_id = db.Column(db.Integer, db.ForeignKey('recurrence_rules.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    label = db.Column(db.String(50), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+
+    def to_dict(self):
+        return {
+            'rule_id': self.rule_id,
+            'kind': self.kind,
+            'label': self.label,
+            'date': self.date.isoformat(),
+            'amount': from_cents(self.amount_cents)
+        }
+
+    def __repr__(self):
+        return f'<ScheduledOccurrence rule={self.rule_id} {self.date}: {self.amount_cents} cents>'
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""Recurrence rules, the materialized schedule and the balance forecast built on it.
+
+Upcoming occurrences are written to ``scheduled_occurrences`` lazily: each rule
+records how far it has been materialized, so a forecast only generates the
+occurrences between that watermark and its horizon and then aggregates the
+schedule in SQL. Changing a rule clears its rows and watermark; occurrences
+that fall behind today are pruned, keeping the table a rolling window.
+"""
+import calendar
+from datetime import date, timedelta
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from api import db
+from api.database import month_key
+from api.money import from_cents
+from api.models.income import Income
+from api.models.recurrence import RecurrenceRule, ScheduledOccurrence
+from api.models.rollup import ExpenseMonthlyRollup, IncomeMonthlyRollup
+from api.tenancy import scoped
+
+MAX_FORECAST_MONTHS = 24
+TREND_MONTHS = 6  # complete months of history the non-recurring trend is fitted on
+
+
+def add_months(day, months, anchor_day=None):
+    """Shift a date by whole months, clamping the day (Jan 31 + 1 month -> Feb 28/29)"""
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return date(year, month, min(anchor_day or day.day, calendar.monthrange(year, month)[1]))
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def iter_occurrences(rule, start, end):
+    """Dates of ``rule`` within [start, end], each computed from the anchor so clamped days do not drift"""
+    if rule.end_date is not None:
+        end = min(end, rule.end_date)
+    anchor = rule.start_date
+    start = max(start, anchor)
+    if start > end:
+        return
+    interval = max(rule.interval or 1, 1)
+
+    if rule.frequency == 'monthly':
+        elapsed = (start.year - anchor.year) * 12 + start.month - anchor.month
+        n = max(elapsed // interval - 1, 0)
+        while True:
+            current = add_months(anchor, n * interval, anchor.day)
+            if current > end:
+                return
+            if current >= start:
+                yield current
+            n += 1
+    else:
+        step = 7 * interval if rule.frequency == 'weekly' else interval
+        n = -(-(start - anchor).days // step)  # ceil: first occurrence on or after start
+        current = anchor + timedelta(days=n * step)
+        while current <= end:
+            yield current
+            current += timedelta(days=step)
+
+
+def _window_start(rule, today):
+    """First date a rule may be materialized from: tomorrow, and for derived rules after their source income"""
+    start = today + timedelta(days=1)
+    if rule.derived:
+        # The anchor occurrence is the income row itself and already counts in the balance
+        start = max(start, rule.start_date + timedelta(days=1))
+    return start
+
+
+class RecurrenceService:
+    # ===== RULES =====
+    @staticmethod
+    def reset(rule):
+        """Drop a rule's materialized occurrences so the next forecast regenerates them"""
+        if rule.id is not None:
+            ScheduledOccurrence.query.filter_by(rule_id=rule.id).delete(synchronize_session=False)
+        rule.materialized_through = None
+
+    @staticmethod
+    def delete_rule(rule):
+        RecurrenceService.reset(rule)
+        db.session.delete(rule)
+
+    @staticmethod
+    def sync_income_sources(sources):
+        """Keep one derived monthly rule per user x income source, modelled on its latest recurring income.
+
+        ``sources`` are (user_id, source) pairs. Every paycheck row may carry ``is_recurring``;
+        they are occurrences of the same series, so the rule follows the most recent one
+        (amount and day of month) and is removed once a source has no recurring incomes
+        left. Runs in the caller's session.
+        """
+        for user_id, source in set(sources):
+            latest = Income.query.filter(
+                Income.user_id == user_id, Income.source == source, Income.is_recurring.is_(True)
+            ).order_by(Income.date.desc(), Income.id.desc()).first()
+            rule = RecurrenceRule.query.filter_by(user_id=user_id, kind='income', label=source, derived=True).first()
+
+            if latest is None:
+                if rule is not None:
+                    RecurrenceService.delete_rule(rule)
+                continue
+            if rule is None:
+                rule = RecurrenceRule(user_id=user_id, kind='income', label=source, derived=True,
+                                      frequency='monthly', interval=1)
+                db.session.add(rule)
+            elif (rule.amount_cents, rule.start_date, rule.description) == (
+                    latest.amount_cents, latest.date, latest.description):
+                continue
+
+            rule.amount_cents = latest.amount_cents
+            rule.start_date = latest.date
+            rule.description = latest.description
+            RecurrenceService.reset(rule)
+
+    @staticmethod
+    def ensure_rules():
+        """Derive income rules for recurring incomes written without the hooks (seeding, generated data)"""
+        sources = set(db.session.query(Income.user_id, Income.source).filter(
+            Income.is_recurring.is_(True)).distinct())
+        derived = set(db.session.query(RecurrenceRule.user_id, RecurrenceRule.label).filter_by(
+            kind='income', derived=True))
+        missing = sources - derived
+        if missing:
+            RecurrenceService.sync_income_sources(missing)
+            db.session.commit()
+        return bool(missing)
+
+    # ===== SCHEDULE =====
+    @staticmethod
+    def materialize(through, today=None):
+        """Extend the schedule so the current user's rules have their occurrences up to ``through``.
+
+        Only the dates past each rule's watermark are generated. Rows dated today or
+        earlier are pruned first, so the table stays a rolling window. Returns rows added.
+        """
+        today = today or date.today()
+        scoped(ScheduledOccurrence.query, ScheduledOccurrence).filter(
+            ScheduledOccurrence.date <= today).delete(synchronize_session=False)
+
+        rules = scoped(RecurrenceRule.query, RecurrenceRule).filter(db.or_(
+            RecurrenceRule.materialized_through.is_(None),
+            RecurrenceRule.materialized_through < through
+        )).all()
+        rows = []
+        for rule in rules:
+            start = _window_start(rule, today)
+            if rule.materialized_through is not None:
+                start = max(start, rule.materialized_through + timedelta(days=1))
+            rows.extend(
+                {'rule_id': rule.id, 'user_id': rule.user_id, 'kind': rule.kind, 'label': rule.label,
+                 'date': day, 'amount_cents': rule.amount_cents}
+                for day in iter_occurrences(rule, start, through)
+            )
+            rule.materialized_through = through
+
+        try:
+            if rows:
+                db.session.execute(insert(ScheduledOccurrence), rows)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request materialized the same window first
+            db.session.rollback()
+            return 0
+        return len(rows)
+
+    @staticmethod
+    def scheduled_month_totals(start, end):
+        """{(month, kind): cents} from the current user's materialized schedule"""
+        month = month_key(ScheduledOccurrence.date)
+        rows = scoped(db.session.query(
+            month, ScheduledOccurrence.kind, func.sum(ScheduledOccurrence.amount_cents)
+        ), ScheduledOccurrence).filter(
+            ScheduledOccurrence.date >= start, ScheduledOccurrence.date <= end
+        ).group_by(month, ScheduledOccurrence.kind).all()
+        return {(month, kind): cents or 0 for month, kind, cents in rows}
+
+    # ===== FORECAST =====
+    @staticmethod
+    def _trend(model, label_column, covered, last_month, months_ahead):
+        """Project non-recurring monthly totals (cents) with a least-squares line over recent rollups.
+
+        Labels covered by a recurrence rule are excluded so scheduled amounts are not counted twice.
+        """
+        import numpy as np  # deferred so app start-up does not pay for it
+        first_month = add_months(last_month, -(TREND_MONTHS - 1))
+        keys = [add_months(first_month, i).strftime('%Y-%m') for i in range(TREND_MONTHS)]
+        query = scoped(db.session.query(model.month, func.sum(model.total_cents)), model).filter(
+            model.month >= keys[0], model.month <= keys[-1])
+        if covered:
+            query = query.filter(label_column.notin_(covered))
+        totals = dict(query.group_by(model.month).all())
+
+        history = np.array([totals.get(key, 0) for key in keys], dtype=float)
+        if not history.any():
+            return [0] * len(months_ahead)
+        if np.count_nonzero(history) < 3:
+            slope, intercept = 0.0, history.mean()
+        else:
+            slope, intercept = np.polyfit(np.arange(TREND_MONTHS), history, 1)
+        return [max(int(round(intercept + slope * (TREND_MONTHS - 1 + ahead))), 0) for ahead in months_ahead]
+
+    @staticmethod
+    def _last_history_month(today):
+        """Last complete month with data, so a stale dataset still yields a trend"""
+        latest = max(filter(None, (
+            scoped(db.session.query(func.max(ExpenseMonthlyRollup.month)), ExpenseMonthlyRollup).scalar(),
+            scoped(db.session.query(func.max(IncomeMonthlyRollup.month)), IncomeMonthlyRollup).scalar(),
+        )), default=None)
+        last_complete = add_months(_month_start(today), -1)
+        if latest is None:
+            return last_complete
+        return min(date(int(latest[:4]), int(latest[5:7]), 1), last_complete)
+
+    @staticmethod
+    def forecast(months, today=None):
+        """Projected income, expenses and balance for the next ``months`` calendar months.
+
+        Each month combines the materialized schedule with a trend of the non-recurring
+        history. Scheduled items due during the rest of the current month are folded
+        into the opening balance.
+        """
+        today = today or date.today()
+        first = add_months(_month_start(today), 1)
+        horizon = _month_end(add_months(first, months - 1))
+        RecurrenceService.materialize(horizon, today)
+
+        income_cents = scoped(db.session.query(func.sum(IncomeMonthlyRollup.total_cents)),
+                              IncomeMonthlyRollup).scalar() or 0
+        expense_cents = scoped(db.session.query(func.sum(ExpenseMonthlyRollup.total_cents)),
+                               ExpenseMonthlyRollup).scalar() or 0
+        balance = income_cents - expense_cents
+
+        scheduled = RecurrenceService.scheduled_month_totals(today, horizon)
+        current = today.strftime('%Y-%m')
+        balance += scheduled.get((current, 'income'), 0) - scheduled.get((current, 'expense'), 0)
+        opening_balance = balance
+
+        covered = {kind: [label for label, in scoped(db.session.query(RecurrenceRule.label), RecurrenceRule)
+                          .filter_by(kind=kind).distinct()]
+                   for kind in ('income', 'expense')}
+        last_month = RecurrenceService._last_history_month(today)
+        # Months between the end of the history window and each forecast month
+        offset = (first.year - last_month.year) * 12 + first.month - last_month.month
+        ahead = [offset + i for i in range(months)]
+        trend_income = RecurrenceService._trend(
+            IncomeMonthlyRollup, IncomeMonthlyRollup.source, covered['income'], last_month, ahead)
+        trend_expenses = RecurrenceService._trend(
+            ExpenseMonthlyRollup, ExpenseMonthlyRollup.category, covered['expense'], last_month, ahead)
+
+        projection = []
+        for i in range(months):
+            month = add_months(first, i).strftime('%Y-%m')
+            income = scheduled.get((month, 'income'), 0) + trend_income[i]
+            expenses = scheduled.get((month, 'expense'), 0) + trend_expenses[i]
+            balance += income - expenses
+            projection.append({
+                'month': month,
+                'scheduled_income': from_cents(scheduled.get((month, 'income'), 0)),
+                'scheduled_expenses': from_cents(scheduled.get((month, 'expense'), 0)),
+                'trend_income': from_cents(trend_income[i]),
+                'trend_expenses': from_cents(trend_expenses[i]),
+                'income': from_cents(income),
+                'expenses': from_cents(expenses),
+                'net': from_cents(income - expenses),
+                'balance': from_cents(balance)
+            })
+
+        return {
+            'as_of': today.isoformat(),
+            'opening_balance': from_cents(opening_balance),
+            'trend_window': [add_months(last_month, -(TREND_MONTHS - 1)).strftime('%Y-%m'),
+                             last_month.strftime('%Y-%m')],
+            'months': projection
+        }
\ No newline at end of file
@@ -0,0 +1,67 @@
+from api import db
+
+
+class ExpenseMonthlyRollup(db.Model):
+    """Running expense totals per user x month x category, maintained by the mutation routes"""
+    __tablename__ = 'expense_monthly_rollups'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    category = db.Column(db.String(50), primary_key=True)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    sum_sq = db.Column(db.Float, nullable=False, default=0.0)  # sum of amount_cents^2 as a float, for variance
+
+    def __repr__(self):
+        return f'<ExpenseMonthlyRollup {self.user_id} {self.month} {self.category}: {self.total_cents} cents>'
+
+
+class IncomeMonthlyRollup(db.Model):
+    """Running income totals per user x month x source, maintained by the mutation routes"""
+    __tablename__ = 'income_monthly_rollups'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    source = db.Column(db.String(50), primary_key=True)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<IncomeMonthlyRollup {self.user_id} {self.month} {self.source}: {self.total_cents} cents>'
+
+class ExpenseDailyTotal(db.Model):
+    """Expense totals per user x category x day plus running sums through that day.
+
+    Any range total is the difference of two ``cumulative_*`` lookups. Only days
+    with expenses have a row; maintained by RollupService alongside the monthly rollups.
+    """
+    __tablename__ = 'expense_daily_totals'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    sum_sq = db.Column(db.Float, nullable=False, default=0.0)
+    cumulative_count = db.Column(db.Integer, nullable=False, default=0)
+    cumulative_total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    cumulative_sum_sq = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f'<ExpenseDailyTotal {self.user_id} {self.category} {self.day}: {self.total_cents} cents>'
+
+
+class IncomeDailyTotal(db.Model):
+    """Income totals per user x source x day plus running sums through that day"""
+    __tablename__ = 'income_daily_totals'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    cumulative_count = db.Column(db.Integer, nullable=False, default=0)
+    cumulative_total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<IncomeDailyTotal {self.user_id} {self.source} {self.day}: {self.total_cents} cents>'
\ No newline at end of file
@@ -0,0 +1,262 @@
+from sqlalchemy import Float, cast, func, insert, select, update
+from api import db
+from api.database import month_key
+from api.models.expense import Expense
+from api.models.income import Income
+from api.models.rollup import ExpenseDailyTotal, ExpenseMonthlyRollup, IncomeDailyTotal, IncomeMonthlyRollup
+
+# Daily series: (model, key attribute, summed fields); each field has a cumulative_<field> running sum
+_EXPENSE_DAYS = (ExpenseDailyTotal, 'category', ('count', 'total_cents', 'sum_sq'))
+_INCOME_DAYS = (IncomeDailyTotal, 'source', ('count', 'total_cents'))
+
+
+def _month_key(value):
+    return value.strftime('%Y-%m')
+
+
+def _square(cents):
+    """cents^2 as a float: squares of large amounts outgrow int64 columns, and variance needs no exact sum"""
+    return float(cents) * cents
+
+
+def _sql_square(cents):
+    return cast(cents, Float) * cents
+
+
+def _discard(rollup):
+    """Remove a rollup row whose count dropped to zero.
+
+    The delete is flushed right away so a following apply for the same key
+    (an update that keeps month and category) starts from a fresh row.
+    """
+    if rollup in db.session.new:
+        db.session.expunge(rollup)
+    else:
+        db.session.delete(rollup)
+        db.session.flush()
+
+
+def _series_filter(model, key_name, user_id, key):
+    return (model.user_id == user_id, getattr(model, key_name) == key)
+
+
+def _cumulative_before(series, user_id, key, day):
+    """Running sums of one user x key series through the day before ``day`` (zeros if none)"""
+    model, key_name, fields = series
+    row = db.session.query(*[getattr(model, f'cumulative_{field}') for field in fields]).filter(
+        *_series_filter(model, key_name, user_id, key), model.day < day
+    ).order_by(model.day.desc()).first()
+    return tuple(row) if row else (0,) * len(fields)
+
+
+def _apply_day(series, user_id, key, day, deltas, shift=True):
+    """Add ``deltas`` (one per field) to a day row; with ``shift`` also move the running sums of every later day"""
+    model, key_name, fields = series
+    row = db.session.get(model, (user_id, key, day))
+    if row is None:
+        row = model(user_id=user_id, day=day, **{key_name: key})
+        # Without ``shift`` the caller recomputes the running sums afterwards
+        initial = _cumulative_before(series, user_id, key, day) if shift else (0,) * len(fields)
+        for field, cumulative in zip(fields, initial):
+            setattr(row, field, 0)
+            setattr(row, f'cumulative_{field}', cumulative)
+        db.session.add(row)
+
+    for field, delta in zip(fields, deltas):
+        setattr(row, field, getattr(row, field) + delta)
+        setattr(row, f'cumulative_{field}', getattr(row, f'cumulative_{field}') + delta)
+    if shift and any(deltas):
+        # One range UPDATE over the series' later days; recent dates touch few rows
+        db.session.execute(
+            update(model).where(*_series_filter(model, key_name, user_id, key), model.day > day).values({
+                f'cumulative_{field}': getattr(model, f'cumulative_{field}') + delta
+                for field, delta in zip(fields, deltas)
+            })
+        )
+    if row.count <= 0:
+        _discard(row)
+
+
+def _recompute_from(series, user_id, key, day):
+    """Recompute a series' running sums from ``day`` on (after a batch touched several of its days)"""
+    model, key_name, fields = series
+    running = list(_cumulative_before(series, user_id, key, day))
+    rows = model.query.filter(*_series_filter(model, key_name, user_id, key), model.day >= day).order_by(model.day)
+    for row in rows:
+        for index, field in enumerate(fields):
+            running[index] += getattr(row, field)
+            setattr(row, f'cumulative_{field}', running[index])
+
+
+def _apply_days_batch(series, deltas):
+    """Fold {(user_id, key, day): deltas} into the daily series.
+
+    A series touched on a single day gets the range UPDATE; one touched on many
+    days is recomputed once from its earliest touched day instead of once per day.
+    """
+    touched = {}
+    for (user_id, key, day) in deltas:
+        touched.setdefault((user_id, key), []).append(day)
+    for (user_id, key), days in touched.items():
+        shift = len(days) == 1
+        for day in days:
+            if any(deltas[(user_id, key, day)]):
+                _apply_day(series, user_id, key, day, deltas[(user_id, key, day)], shift=shift)
+        if not shift:
+            _recompute_from(series, user_id, key, min(days))
+
+
+def _rebuild_days(series, transaction, key_column, value_columns):
+    """INSERT ... SELECT the daily totals with window-function running sums"""
+    model, key_name, fields = series
+    partition = (transaction.user_id, key_column)
+    db.session.execute(
+        insert(model).from_select(
+            ['user_id', key_name, 'day', *fields, *[f'cumulative_{field}' for field in fields]],
+            select(
+                transaction.user_id,
+                key_column,
+                transaction.date,
+                *value_columns,
+                *[func.sum(value).over(partition_by=partition, order_by=transaction.date) for value in value_columns]
+            ).group_by(transaction.user_id, key_column, transaction.date)
+        )
+    )
+
+
+class RollupService:
+    @staticmethod
+    def apply_expense(user_id, expense_date, category, amount_cents, sign=1):
+        """Add (sign=1) or remove (sign=-1) one expense from its user x month x category rollup.
+
+        Runs inside the caller's session so the rollup commits atomically with the row.
+        Amounts are integer cents, so adding and removing the same row cancels the count
+        and total exactly; the float sum of squares only feeds the standard deviation.
+        """
+        RollupService.apply_expense_delta(
+            user_id, _month_key(expense_date), category, sign, sign * amount_cents, sign * _square(amount_cents)
+        )
+        _apply_day(_EXPENSE_DAYS, user_id, category, expense_date,
+                   (sign, sign * amount_cents, sign * _square(amount_cents)))
+
+    @staticmethod
+    def apply_expense_delta(user_id, month, category, count, total, sum_sq):
+        """Apply pre-summed deltas to one user x month x category rollup (used for batches)"""
+        rollup = db.session.get(ExpenseMonthlyRollup, (user_id, month, category))
+        if rollup is None:
+            rollup = ExpenseMonthlyRollup(user_id=user_id, month=month, category=category,
+                                          total_cents=0, count=0, sum_sq=0.0)
+            db.session.add(rollup)
+
+        rollup.total_cents += total
+        rollup.count += count
+        rollup.sum_sq += sum_sq
+        if rollup.count <= 0:
+            _discard(rollup)
+
+    @staticmethod
+    def apply_income(user_id, income_date, source, amount_cents, sign=1):
+        """Add (sign=1) or remove (sign=-1) one income from its user x month x source rollup"""
+        RollupService.apply_income_delta(user_id, _month_key(income_date), source, sign, sign * amount_cents)
+        _apply_day(_INCOME_DAYS, user_id, source, income_date, (sign, sign * amount_cents))
+
+    @staticmethod
+    def apply_income_delta(user_id, month, source, count, total):
+        """Apply pre-summed deltas to one user x month x source rollup (used for batches)"""
+        rollup = db.session.get(IncomeMonthlyRollup, (user_id, month, source))
+        if rollup is None:
+            rollup = IncomeMonthlyRollup(user_id=user_id, month=month, source=source, total_cents=0, count=0)
+            db.session.add(rollup)
+
+        rollup.total_cents += total
+        rollup.count += count
+        if rollup.count <= 0:
+            _discard(rollup)
+
+    @staticmethod
+    def apply_expense_batch(added, removed=()):
+        """Fold many expenses in/out of the rollups with one row update per touched user x month x category"""
+        deltas = {}
+        day_deltas = {}
+        for sign, snapshots in ((1, added), (-1, removed)):
+            for row in snapshots:
+                amount = row.amount_cents
+                for table, key in ((deltas, (row.user_id, _month_key(row.date), row.category)),
+                                   (day_deltas, (row.user_id, row.category, row.date))):
+                    count, total, sum_sq = table.get(key, (0, 0, 0))
+                    table[key] = (count + sign, total + sign * amount, sum_sq + sign * _square(amount))
+        for (user_id, month, category), (count, total, sum_sq) in deltas.items():
+            if count or total or sum_sq:
+                RollupService.apply_expense_delta(user_id, month, category, count, total, sum_sq)
+        _apply_days_batch(_EXPENSE_DAYS, day_deltas)
+
+    @staticmethod
+    def apply_income_batch(added, removed=()):
+        """Fold many incomes in/out of the rollups with one row update per touched user x month x source"""
+        deltas = {}
+        day_deltas = {}
+        for sign, snapshots in ((1, added), (-1, removed)):
+            for row in snapshots:
+                for table, key in ((deltas, (row.user_id, _month_key(row.date), row.source)),
+                                   (day_deltas, (row.user_id, row.source, row.date))):
+                    count, total = table.get(key, (0, 0))
+                    table[key] = (count + sign, total + sign * row.amount_cents)
+        for (user_id, month, source), (count, total) in deltas.items():
+            if count or total:
+                RollupService.apply_income_delta(user_id, month, source, count, total)
+        _apply_days_batch(_INCOME_DAYS, day_deltas)
+
+    @staticmethod
+    def rebuild():
+        """Recompute the monthly rollups and daily running sums from scratch with INSERT ... SELECT statements"""
+        expense_month = month_key(Expense.date)
+        income_month = month_key(Income.date)
+
+        db.session.query(ExpenseMonthlyRollup).delete()
+        db.session.query(IncomeMonthlyRollup).delete()
+        db.session.query(ExpenseDailyTotal).delete()
+        db.session.query(IncomeDailyTotal).delete()
+        db.session.execute(
+            insert(ExpenseMonthlyRollup).from_select(
+                ['user_id', 'month', 'category', 'total_cents', 'count', 'sum_sq'],
+                select(
+                    Expense.user_id,
+                    expense_month,
+                    Expense.category,
+                    func.sum(Expense.amount_cents),
+                    func.count(Expense.id),
+                    func.sum(_sql_square(Expense.amount_cents))
+                ).group_by(Expense.user_id, expense_month, Expense.category)
+            )
+        )
+        db.session.execute(
+            insert(IncomeMonthlyRollup).from_select(
+                ['user_id', 'month', 'source', 'total_cents', 'count'],
+                select(
+                    Income.user_id,
+                    income_month,
+                    Income.source,
+                    func.sum(Income.amount_cents),
+                    func.count(Income.id)
+                ).group_by(Income.user_id, income_month, Income.source)
+            )
+        )
+        _rebuild_days(_EXPENSE_DAYS, Expense, Expense.category, [
+            func.count(Expense.id),
+            func.sum(Expense.amount_cents),
+            func.sum(_sql_square(Expense.amount_cents))
+        ])
+        _rebuild_days(_INCOME_DAYS, Income, Income.source, [func.count(Income.id), func.sum(Income.amount_cents)])
+        db.session.commit()
+
+    @staticmethod
+    def ensure_built():
+        """Rebuild the rollups when any of them is empty but transactions exist (new table or seeded data)"""
+        expenses_missing = Expense.query.first() and not (
+            db.session.query(ExpenseMonthlyRollup.month).first() and db.session.query(ExpenseDailyTotal.day).first())
+        incomes_missing = Income.query.first() and not (
+            db.session.query(IncomeMonthlyRollup.month).first() and db.session.query(IncomeDailyTotal.day).first())
+        if expenses_missing or incomes_missing:
+            RollupService.rebuild()
+            return True
+        return False
\ No newline at end of file
@@ -1,20 +1,66 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
-from collections import defaultdict
-import statistics
-from api import db
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context, url_for
+import io
+from datetime import date
+from urllib.parse import urlencode
+from api import db, aggregates, batch, categorizer, events, exporter, importer, metrics, search, serializers
+from api.cache import cached_response
 from api.models.expense import Expense
 from api.models.income import Income  # Fixed import
+from api.models.budget import Budget
+from api.models.recurrence import RecurrenceRule
+from api.money import from_cents
+from api.pagination import PaginationError, apply_filters, paginate, parse_date
+from api.validation import (ValidationError, parse_budget, parse_budget_changes, parse_expense,
+                            parse_expense_changes, parse_income, parse_income_changes, parse_month, parse_recurrence)
+from api import mutations
+from api.services.anomaly_service import AnomalyService
+from api.services.budget_service import BudgetService
+from api.services.expense_service import ExpenseService
+from api.services.recurrence_service import MAX_FORECAST_MONTHS, RecurrenceService
+from api.tenancy import current_user_id, scoped
 
 # Blueprint setup
 expense_bp = Blueprint('expense_routes', __name__, url_prefix='/api')
 
+def _listing_query(model, group_column, group_param):
+    """Filtered column-tuple query for a listing (no ORM objects are built)"""
+    names, columns = serializers.columns_for(model)
+    return names, apply_filters(db.session.query(*columns), model, group_column, group_param, request.args)
+
+def _get_owned_or_404(model, row_id):
+    """The current user's row with this id; other users' rows are reported as not found"""
+    return scoped(model.query, model).filter(model.id == row_id).first_or_404()
+
+def _today():
+    """Cache key part for views whose output depends on the current date"""
+    return date.today().isoformat()
+
+def _alerts_month():
+    """The month /budgets/alerts reports on: ?month or the current one"""
+    return request.args.get('month') or date.today().strftime('%Y-%m')
+
+def _page_response(names, rows, next_cursor):
+    """Serialize one page, advertising the next page via X-Next-Cursor/Link headers"""
+    shape = request.args.get('format', 'records')
+    if shape not in serializers.SHAPES:
+        raise PaginationError(f"Unsupported format '{shape}'. Use records or columnar")
+    response = serializers.json_response(serializers.shape(names, rows, shape))
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
+
 # ===== EXPENSE ROUTES =====
 @expense_bp.route('/expenses', methods=['GET'])
 def get_expenses():
     try:
-        expenses = Expense.query.order_by(Expense.date.desc()).all()
-        return jsonify([expense.to_dict() for expense in expenses])
+        names, query = _listing_query(Expense, Expense.category, 'category')
+        expenses, next_cursor = paginate(query, Expense, request.args)
+        return _page_response(names, expenses, next_cursor)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -22,26 +68,21 @@ def get_expenses():
 def create_expense():
     try:
         data = request.get_json()
-        if not data.get('category') or not data.get('amount'):
-            return jsonify({'error': 'Category and amount are required'}), 400
-
-        expense_date = datetime.utcnow().date()
-        if data.get('date'):
-            try:
-                expense_date = datetime.fromisoformat(data['date']).date()
-            except ValueError:
-                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-
-        expense = Expense(
-            category=data['category'],
-            amount=float(data['amount']),
-            description=data.get('description', ''),
-            date=expense_date
-        )
+        # A missing category is filled from the description when the model is confident enough
+        confidence = categorizer.fill_missing([data])[0]
+        try:
+            expense = Expense(**parse_expense(data), user_id=current_user_id())
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
 
         db.session.add(expense)
+        mutations.expense_created(expense)
         db.session.commit()
-        return jsonify(expense.to_dict()), 201
+        mutations.after_commit()
+        result = expense.to_dict()
+        if confidence is not None:
+            result['category_confidence'] = confidence
+        return jsonify(result), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -49,7 +90,7 @@ def create_expense():
 @expense_bp.route('/expenses/<int:expense_id>', methods=['GET'])
 def get_expense(expense_id):
     try:
-        expense = Expense.query.get_or_404(expense_id)
+        expense = _get_owned_or_404(Expense, expense_id)
         return jsonify(expense.to_dict())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -57,22 +98,20 @@ def get_expense(expense_id):
 @expense_bp.route('/expenses/<int:expense_id>', methods=['PUT'])
 def update_expense(expense_id):
     try:
-        expense = Expense.query.get_or_404(expense_id)
+        expense = _get_owned_or_404(Expense, expense_id)
+        before = mutations.snapshot_expense(expense)
         data = request.get_json()
 
-        if data.get('category'):
-            expense.category = data['category']
-        if data.get('amount'):
-            expense.amount = float(data['amount'])
-        if 'description' in data:
-            expense.description = data['description']
-        if data.get('date'):
-            try:
-                expense.date = datetime.fromisoformat(data['date']).date()
-            except ValueError:
-                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        try:
+            changes = parse_expense_changes(data)
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+        for field, value in changes.items():
+            setattr(expense, field, value)
 
+        mutations.expense_updated(before, expense)
         db.session.commit()
+        mutations.after_commit()
         return jsonify(expense.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -81,9 +120,11 @@ def update_expense(expense_id):
 @expense_bp.route('/expenses/<int:expense_id>', methods=['DELETE'])
 def delete_expense(expense_id):
     try:
-        expense = Expense.query.get_or_404(expense_id)
+        expense = _get_owned_or_404(Expense, expense_id)
         db.session.delete(expense)
+        mutations.expense_deleted(expense)
         db.session.commit()
+        mutations.after_commit()
         return jsonify({'message': 'Expense deleted successfully'})
     except Exception as e:
         db.session.rollback()
@@ -93,8 +134,11 @@ def delete_expense(expense_id):
 @expense_bp.route('/incomes', methods=['GET'])
 def get_incomes():
     try:
-        incomes = Income.query.order_by(Income.date.desc()).all()
-        return jsonify([income.to_dict() for income in incomes])
+        names, query = _listing_query(Income, Income.source, 'source')
+        incomes, next_cursor = paginate(query, Income, request.args)
+        return _page_response(names, incomes, next_cursor)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -102,26 +146,15 @@ def get_incomes():
 def create_income():
     try:
         data = request.get_json()
-        if not data.get('source') or not data.get('amount'):
-            return jsonify({'error': 'Source and amount are required'}), 400
-
-        income_date = datetime.utcnow().date()
-        if data.get('date'):
-            try:
-                income_date = datetime.fromisoformat(data['date']).date()
-            except ValueError:
-                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-
-        income = Income(
-            source=data['source'],
-            amount=float(data['amount']),
-            description=data.get('description', ''),
-            date=income_date,
-            is_recurring=data.get('is_recurring', False)
-        )
+        try:
+            income = Income(**parse_income(data), user_id=current_user_id())
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
 
         db.session.add(income)
+        mutations.income_created(income)
         db.session.commit()
+        mutations.after_commit()
         return jsonify(income.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -130,7 +163,7 @@ def create_income():
 @expense_bp.route('/incomes/<int:income_id>', methods=['GET'])
 def get_income(income_id):
     try:
-        income = Income.query.get_or_404(income_id)
+        income = _get_owned_or_404(Income, income_id)
         return jsonify(income.to_dict())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -138,24 +171,20 @@ def get_income(income_id):
 @expense_bp.route('/incomes/<int:income_id>', methods=['PUT'])
 def update_income(income_id):
     try:
-        income = Income.query.get_or_404(income_id)
+        income = _get_owned_or_404(Income, income_id)
+        before = mutations.snapshot_income(income)
         data = request.get_json()
 
-        if data.get('source'):
-            income.source = data['source']
-        if data.get('amount'):
-            income.amount = float(data['amount'])
-        if 'description' in data:
-            income.description = data['description']
-        if 'is_recurring' in data:
-            income.is_recurring = data['is_recurring']
-        if data.get('date'):
-            try:
-                income.date = datetime.fromisoformat(data['date']).date()
-            except ValueError:
-                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        try:
+            changes = parse_income_changes(data)
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+        for field, value in changes.items():
+            setattr(income, field, value)
 
+        mutations.income_updated(before, income)
         db.session.commit()
+        mutations.after_commit()
         return jsonify(income.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -164,196 +193,132 @@ def update_income(income_id):
 @expense_bp.route('/incomes/<int:income_id>', methods=['DELETE'])
 def delete_income(income_id):
     try:
-        income = Income.query.get_or_404(income_id)
+        income = _get_owned_or_404(Income, income_id)
         db.session.delete(income)
+        mutations.income_deleted(income)
         db.session.commit()
+        mutations.after_commit()
         return jsonify({'message': 'Income deleted successfully'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-# ===== AI-POWERED INSIGHTS =====
-def generate_ai_insights(expenses, incomes):
-    """Generate AI-powered financial insights and recommendations"""
-    insights = {
-        'financial_health': {},
-        'spending_patterns': {},
-        'ai_recommendations': [],
-        'behavioral_insights': [],
-        'future_predictions': {}
-    }
-    
-    if not expenses and not incomes:
-        return insights
-    
-    # Calculate basic metrics
-    total_expenses = sum(exp.amount for exp in expenses)
-    total_income = sum(inc.amount for inc in incomes)
-    net_savings = total_income - total_expenses
-    savings_rate = (net_savings / total_income * 100) if total_income > 0 else 0
-    
-    # Financial Health Analysis
-    insights['financial_health'] = {
-        'total_income': total_income,
-        'total_expenses': total_expenses,
-        'net_savings': net_savings,
-        'savings_rate': savings_rate,
-        'financial_score': min(100, max(0, savings_rate + 50))  # Score out of 100
-    }
-    
-    # Spending Pattern Analysis
-    category_breakdown = defaultdict(float)
-    monthly_trends = defaultdict(float)
-    
-    for expense in expenses:
-        category_breakdown[expense.category] += expense.amount
-        month_key = f"{expense.date.year}-{expense.date.month:02d}"
-        monthly_trends[month_key] += expense.amount
-    
-    insights['spending_patterns'] = {
-        'category_breakdown': dict(category_breakdown),
-        'monthly_trends': dict(monthly_trends),
-        'top_categories': sorted(category_breakdown.items(), key=lambda x: x[1], reverse=True)[:3]
-    }
-    
-    # AI Recommendations based on patterns
-    recommendations = []
-    
-    # Savings rate recommendations
-    if savings_rate < 10:
-        recommendations.append({
-            'title': 'Emergency: Low Savings Rate',
-            'message': f'Your savings rate is {savings_rate:.1f}%. Aim for at least 20%. Consider cutting non-essential expenses immediately.',
-            'priority': 'critical',
-            'action': 'Reduce discretionary spending by 30%',
-            'potential_savings': total_expenses * 0.3
-        })
-    elif savings_rate < 20:
-        recommendations.append({
-            'title': 'Improve Savings Rate',
-            'message': f'Your savings rate is {savings_rate:.1f}%. Try to reach 20% for better financial security.',
-            'priority': 'high',
-            'action': 'Identify and reduce top 2 expense categories',
-            'potential_savings': total_expenses * 0.1
-        })
+# ===== BATCH OPERATIONS =====
+def _batch_response(kind):
+    data = request.get_json() or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    try:
+        outcome = batch.apply_batch(kind, operations, atomic=bool(data.get('atomic')))
+    except batch.BatchTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+
+    if not outcome['failed']:
+        status = 200
+    elif outcome['succeeded']:
+        status = 207
     else:
-        recommendations.append({
-            'title': 'Excellent Savings!',
-            'message': f'Great work! Your savings rate of {savings_rate:.1f}% is healthy. Consider investing surplus.',
-            'priority': 'low',
-            'action': 'Explore investment opportunities',
-            'potential_savings': 0
-        })
-    
-    # Category-specific recommendations
-    category_dict = dict(category_breakdown)
-    
-    if category_dict.get('Food', 0) > total_income * 0.25:
-        recommendations.append({
-            'title': 'Food Budget Optimization',
-            'message': 'Food expenses are high. Try meal prep, local markets, and home cooking.',
-            'priority': 'medium',
-            'action': 'Reduce food spending by 20%',
-            'potential_savings': category_dict.get('Food', 0) * 0.2
-        })
-    
-    if category_dict.get('Entertainment', 0) > total_income * 0.15:
-        recommendations.append({
-            'title': 'Entertainment Budget Control',
-            'message': 'Consider free activities and set entertainment budget limits.',
-            'priority': 'medium',
-            'action': 'Set monthly entertainment budget',
-            'potential_savings': category_dict.get('Entertainment', 0) * 0.3
-        })
-    
-    # Behavioral insights using AI-like analysis
-    behavioral_insights = []
-    
-    if len(expenses) > 5:
-        expense_amounts = [exp.amount for exp in expenses]
-        avg_expense = statistics.mean(expense_amounts)
-        std_expense = statistics.stdev(expense_amounts) if len(expense_amounts) > 1 else 0
-        
-        high_variance_expenses = [exp for exp in expenses if exp.amount > avg_expense + std_expense]
-        
-        if len(high_variance_expenses) > len(expenses) * 0.3:
-            behavioral_insights.append({
-                'pattern': 'Impulse Spending Detected',
-                'description': 'You have irregular high-value expenses, suggesting impulse purchases.',
-                'recommendation': 'Implement a 24-hour waiting period for purchases over ₹' + str(int(avg_expense)),
-                'confidence': 85
-            })
-    
-    # Check for recurring patterns
-    if len(set(exp.category for exp in expenses)) < 4 and len(expenses) > 10:
-        behavioral_insights.append({
-            'pattern': 'Limited Spending Categories',
-            'description': 'Your spending is concentrated in few categories, showing good discipline.',
-            'recommendation': 'Maintain this focused approach but ensure you\'re not missing important categories like healthcare.',
-            'confidence': 78
-        })
-    
-    insights['ai_recommendations'] = recommendations
-    insights['behavioral_insights'] = behavioral_insights
-    
-    # Future predictions (simple trend analysis)
-    if len(monthly_trends) >= 2:
-        trend_values = list(monthly_trends.values())
-        if len(trend_values) >= 2:
-            recent_trend = trend_values[-1] - trend_values[-2]
-            insights['future_predictions'] = {
-                'monthly_trend': recent_trend,
-                'predicted_next_month': trend_values[-1] + recent_trend,
-                'trend_direction': 'increasing' if recent_trend > 0 else 'decreasing'
-            }
-    
-    return insights
+        status = 400
+    return jsonify(outcome), status
+
+@expense_bp.route('/expenses/batch', methods=['POST'])
+def batch_expenses():
+    try:
+        return _batch_response('expenses')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/incomes/batch', methods=['POST'])
+def batch_incomes():
+    try:
+        return _batch_response('incomes')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+# ===== BULK IMPORT =====
+@expense_bp.route('/import/<kind>', methods=['POST'])
+def bulk_import(kind):
+    """Stream NDJSON or CSV rows into expenses/incomes; ?format= overrides the Content-Type"""
+    try:
+        fmt = request.args.get('format') or importer.detect_format(request.content_type)
+        if not fmt:
+            return jsonify({'error': 'Unknown format. Send text/csv or application/x-ndjson, or pass ?format='}), 400
+        batch_size = int(request.args.get('batch_size', importer.DEFAULT_BATCH_SIZE))
+
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        report = importer.import_records(kind, importer.iter_records(stream, fmt), batch_size=max(batch_size, 1))
+        return jsonify(report)
+    except (importer.ImportRequestError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ===== STREAMING EXPORT =====
+def _export_response(model, group_column, group_param, filename):
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exporter.FORMATS:
+        return jsonify({'error': f"Unsupported format '{fmt}'. Use csv or ndjson"}), 400
+    # Parse filters eagerly so bad parameters fail with a 400 instead of mid-stream
+    apply_filters(model.query, model, group_column, group_param, request.args)
+
+    mimetype, chunks = exporter.export(model, group_column, group_param, request.args, fmt)
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{fmt}'
+    return response
+
+@expense_bp.route('/expenses/export', methods=['GET'])
+def export_expenses():
+    try:
+        return _export_response(Expense, Expense.category, 'category', 'expenses')
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/incomes/export', methods=['GET'])
+def export_incomes():
+    try:
+        return _export_response(Income, Income.source, 'source', 'incomes')
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ===== AI-POWERED INSIGHTS =====
 @expense_bp.route('/insights', methods=['GET'])
+@cached_response()
 def get_insights():
+    from api import analytics  # imports NumPy, so it is loaded on the first insights request
     try:
-        expenses = Expense.query.all()
-        incomes = Income.query.all()
+        # Rollup rows are loaded as NumPy columns; no ORM rows are loaded
+        columns = analytics.load_expense_columns()
+        income_totals = aggregates.income_totals()
         
         # Generate AI insights
-        ai_insights = generate_ai_insights(expenses, incomes)
+        ai_insights = analytics.generate_ai_insights(
+            columns, income_totals, count_above=aggregates.count_expenses_above
+        )
         
         # Legacy insights for compatibility
-        total_expenses = sum(exp.amount for exp in expenses)
-        total_income = sum(inc.amount for inc in incomes)  # Fixed: calculate total income
+        total_expenses = from_cents(int(columns.totals.sum()))
+        total_income = income_totals[1]
+        category_breakdown = ai_insights['spending_patterns'].get('category_breakdown', {})
         net_balance = total_income - total_expenses  # Fixed: calculate net balance
         
-        category_breakdown = defaultdict(float)
-        for expense in expenses:
-            category_breakdown[expense.category] += expense.amount
-        
         # Income breakdown for frontend
-        income_breakdown = defaultdict(float)
-        for income in incomes:
-            income_breakdown[income.source] += income.amount
+        income_breakdown = aggregates.income_source_totals()
         
-        # Detect anomalies
-        anomalies = []
-        for category, total in category_breakdown.items():
-            category_expenses = [exp for exp in expenses if exp.category == category]
-            if len(category_expenses) > 1:
-                amounts = [exp.amount for exp in category_expenses]
-                avg_amount = sum(amounts) / len(amounts)
-                for expense in category_expenses:
-                    if expense.amount > avg_amount * 2:
-                        anomalies.append({
-                            'amount': expense.amount,
-                            'category': expense.category,
-                            'reason': f'This expense is {expense.amount/avg_amount:.1f}x higher than your average {category.lower()} expense of ₹{avg_amount:.2f}'
-                        })
+        # Anomalies are detected incrementally on each write and persisted
+        anomalies = [anomaly.to_dict() for anomaly in AnomalyService.get_anomalies()]
 
         return jsonify({
             'total_expenses': total_expenses,
             'total_income': total_income,  # Added missing field
             'net_balance': net_balance,  # Added missing field
             'savings_rate': (net_balance / total_income * 100) if total_income > 0 else 0,  # Added missing field
-            'category_breakdown': dict(category_breakdown),
-            'income_breakdown': dict(income_breakdown),  # Added income breakdown
+            'category_breakdown': category_breakdown,
+            'income_breakdown': income_breakdown,  # Added income breakdown
             'anomalies': anomalies,
             'ai_insights': ai_insights,  # New AI-powered insights
             # Legacy recommendations for compatibility
@@ -362,37 +327,95 @@ def get_insights():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@expense_bp.route('/insights/ai', methods=['POST'])
+def request_ai_insights():
+    """Queue LLM advice; 200 with the result if cached, else 202 with a job to poll"""
+    try:
+        job = ExpenseService.generate_ai_insights()
+        job['status_url'] = url_for('expense_routes.get_ai_insights_job', job_id=job['id'])
+        status = 200 if job['status'] in ('done', 'failed') else 202
+        response = jsonify(job)
+        if status == 202:
+            response.headers['Location'] = job['status_url']
+        return response, status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/insights/ai/<job_id>', methods=['GET'])
+def get_ai_insights_job(job_id):
+    job = ExpenseService.get_ai_insights_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Insight job not found'}), 404
+    return jsonify(job)
+
+# ===== SEARCH =====
+@expense_bp.route('/search', methods=['GET'])
+@cached_response()
+def search_transactions():
+    """Prefix-matched, ranked search over expense and income descriptions and categories/sources"""
+    try:
+        rows, next_cursor = search.search(**search.parse_args(request.args))
+        return _page_response(search.FIELDS, rows, next_cursor)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ===== CATEGORY SUGGESTIONS =====
+def _parse_top(value):
+    try:
+        top = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError('top must be an integer')
+    if not 1 <= top <= 10:
+        raise ValidationError('top must be between 1 and 10')
+    return top
+
+def _suggestion_results(descriptions, top):
+    ranked = categorizer.suggest_many(descriptions, top=top)
+    return [{'description': description,
+             'suggestions': [{'category': category, 'confidence': confidence} for category, confidence in suggestions]}
+            for description, suggestions in zip(descriptions, ranked)]
+
+@expense_bp.route('/categories/suggest', methods=['GET'])
+def suggest_category():
+    """Ranked category suggestions for ?description=; empty until a model has been trained"""
+    try:
+        description = request.args.get('description', '')
+        if not description.strip():
+            return jsonify({'error': 'Missing description. Use ?description=<text>'}), 400
+        return jsonify(_suggestion_results([description], _parse_top(request.args.get('top', 3)))[0])
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/categories/suggest', methods=['POST'])
+def suggest_categories():
+    """Batched suggestions: {"descriptions": [...], "top": n} -> {"results": [...]} in input order"""
+    try:
+        data = request.get_json(silent=True) or {}
+        descriptions = data.get('descriptions')
+        if not isinstance(descriptions, list) or not all(isinstance(item, str) for item in descriptions):
+            return jsonify({'error': 'descriptions must be a list of strings'}), 400
+        if len(descriptions) > categorizer.MAX_SUGGEST_BATCH:
+            return jsonify({'error': f'At most {categorizer.MAX_SUGGEST_BATCH} descriptions per request'}), 400
+        return jsonify({'results': _suggestion_results(descriptions, _parse_top(data.get('top', 1)))})
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ===== FINANCIAL DASHBOARD =====
 @expense_bp.route('/dashboard', methods=['GET'])
+@cached_response()
 def get_dashboard():
     try:
-        expenses = Expense.query.all()
-        incomes = Income.query.all()
-        
-        total_income = sum(inc.amount for inc in incomes)
-        total_expenses = sum(exp.amount for exp in expenses)
+        # Totals and the monthly breakdown come from the rollups, not a table scan
+        total_expenses = aggregates.expense_stats().total
+        total_income = aggregates.income_totals()[1]
         net_balance = total_income - total_expenses
-        
-        # Monthly breakdown
-        monthly_data = defaultdict(lambda: {'income': 0, 'expenses': 0})
-        
-        for income in incomes:
-            month_key = f"{income.date.year}-{income.date.month:02d}"
-            monthly_data[month_key]['income'] += income.amount
-            
-        for expense in expenses:
-            month_key = f"{expense.date.year}-{expense.date.month:02d}"
-            monthly_data[month_key]['expenses'] += expense.amount
-        
-        # Convert to list for frontend
-        monthly_chart_data = []
-        for month, data in sorted(monthly_data.items()):
-            monthly_chart_data.append({
-                'month': month,
-                'income': data['income'],
-                'expenses': data['expenses'],
-                'net': data['income'] - data['expenses']
-            })
+        monthly_chart_data = aggregates.monthly_cash_flow()
         
         return jsonify({
             'total_income': total_income,
@@ -402,4 +425,195 @@ def get_dashboard():
             'savings_rate': (net_balance / total_income * 100) if total_income > 0 else 0
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+# ===== RANGE SUMMARY =====
+@expense_bp.route('/summary', methods=['GET'])
+@cached_response(vary=_today)
+def get_summary():
+    """Totals per day/week/month bucket over any date range, from the daily prefix sums"""
+    try:
+        try:
+            end = parse_date(request.args, 'to') or date.today()
+            start = parse_date(request.args, 'from') or date.fromordinal(max(1, end.toordinal() - 29))
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
+        if end >= date.max:
+            return jsonify({'error': f'to must be before {date.max.isoformat()}'}), 400
+        if start > end:
+            return jsonify({'error': 'from must not be after to'}), 400
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in aggregates.GRANULARITIES:
+            return jsonify({'error': f"Invalid granularity '{granularity}'. Use day, week or month"}), 400
+        window = request.args.get('window')
+        if window is not None:
+            if not window.isdigit() or not 1 <= int(window) <= aggregates.MAX_ROLLING_WINDOW:
+                return jsonify({'error': f'window must be between 1 and {aggregates.MAX_ROLLING_WINDOW} days'}), 400
+            window = int(window)
+        if aggregates.bucket_count(start, end, granularity) > aggregates.MAX_SUMMARY_BUCKETS:
+            return jsonify({'error': f'Too many buckets (max {aggregates.MAX_SUMMARY_BUCKETS}); use a coarser granularity'}), 400
+        return jsonify(aggregates.range_summary(start, end, granularity, window))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ===== RECURRENCES & FORECAST =====
+@expense_bp.route('/recurrences', methods=['GET'])
+def get_recurrences():
+    try:
+        rules = scoped(RecurrenceRule.query, RecurrenceRule).order_by(RecurrenceRule.kind, RecurrenceRule.label, RecurrenceRule.id).all()
+        return jsonify([rule.to_dict() for rule in rules])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/recurrences', methods=['POST'])
+def create_recurrence():
+    try:
+        data = request.get_json()
+        try:
+            rule = RecurrenceRule(**parse_recurrence(data), user_id=current_user_id())
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+
+        db.session.add(rule)
+        db.session.commit()
+        mutations.after_commit()
+        return jsonify(rule.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/recurrences/<int:rule_id>', methods=['DELETE'])
+def delete_recurrence(rule_id):
+    try:
+        rule = _get_owned_or_404(RecurrenceRule, rule_id)
+        if rule.derived:
+            return jsonify({'error': 'This rule follows recurring incomes; clear their is_recurring flag instead'}), 400
+        RecurrenceService.delete_rule(rule)
+        db.session.commit()
+        mutations.after_commit()
+        return jsonify({'message': 'Recurrence deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# ===== BUDGETS =====
+@expense_bp.route('/budgets', methods=['GET'])
+def get_budgets():
+    try:
+        budgets = scoped(Budget.query, Budget).order_by(Budget.category, Budget.month, Budget.id).all()
+        return jsonify([budget.to_dict() for budget in budgets])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/budgets', methods=['POST'])
+def create_budget():
+    try:
+        data = request.get_json()
+        try:
+            budget = Budget(**parse_budget(data), user_id=current_user_id())
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+        duplicate = BudgetService.find(budget.user_id, budget.category, budget.month)
+        if duplicate is not None:
+            return jsonify({'error': f'Budget {duplicate.id} already covers this category and month; update it instead'}), 409
+
+        db.session.add(budget)
+        db.session.flush()
+        BudgetService.refresh(budget.user_id, budget.category, budget.month)
+        db.session.commit()
+        mutations.after_commit()
+        return jsonify(budget.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/budgets/<int:budget_id>', methods=['PUT'])
+def update_budget(budget_id):
+    try:
+        budget = _get_owned_or_404(Budget, budget_id)
+        try:
+            changes = parse_budget_changes(request.get_json())
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+
+        for field, value in changes.items():
+            setattr(budget, field, value)
+        BudgetService.refresh(budget.user_id, budget.category, budget.month)
+        db.session.commit()
+        mutations.after_commit()
+        return jsonify(budget.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/budgets/<int:budget_id>', methods=['DELETE'])
+def delete_budget(budget_id):
+    try:
+        budget = _get_owned_or_404(Budget, budget_id)
+        BudgetService.delete_budget(budget)
+        db.session.commit()
+        mutations.after_commit()
+        return jsonify({'message': 'Budget deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/budgets/alerts', methods=['GET'])
+@cached_response(vary=_alerts_month)
+def get_budget_alerts():
+    """Standing alerts for ?month=YYYY-MM (default: this month), read from the precomputed alert table"""
+    try:
+        return jsonify(BudgetService.alerts(parse_month(request.args.get('month'))))
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@expense_bp.route('/forecast', methods=['GET'])
+@cached_response(vary=_today)
+def get_forecast():
+    """Projected balance per month from the materialized schedule plus the non-recurring trend"""
+    try:
+        try:
+            months = int(request.args.get('months', 6))
+        except ValueError:
+            return jsonify({'error': 'months must be an integer'}), 400
+        if not 1 <= months <= MAX_FORECAST_MONTHS:
+            return jsonify({'error': f'months must be between 1 and {MAX_FORECAST_MONTHS}'}), 400
+        return jsonify(RecurrenceService.forecast(months))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# ===== LIVE UPDATES =====
+@expense_bp.route('/stream', methods=['GET'])
+def stream_updates():
+    """Server-Sent Events feed of row deltas and updated dashboard aggregates"""
+    broker = events.get_broker()
+    try:
+        subscriber = broker.subscribe(current_user_id())
+    except events.BrokerFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+
+    try:
+        first_frames = None
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        if last_event_id.isdigit():
+            first_frames = broker.replay(subscriber.user_id, int(last_event_id))
+        if first_frames is None:
+            # New client, or one that missed more than the history holds: start from a full snapshot
+            snapshot = dict(aggregates.dashboard_delta([]), monthly_data=aggregates.monthly_cash_flow())
+            first_frames = [events.encode(None, 'snapshot', snapshot)]
+    except Exception as e:
+        broker.unsubscribe(subscriber)
+        return jsonify({'error': str(e)}), 500
+
+    heartbeat = current_app.config['STREAM_HEARTBEAT_SECONDS']
+    return Response(events.stream(subscriber, heartbeat, first_frames), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ===== METRICS =====
+@expense_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
\ No newline at end of file
@@ -1,14 +1,14 @@
+"""Development server with the debugger and auto-reload (FLASK_DEBUG=0 turns them off).
+
+Not for production: use ``gunicorn -c gunicorn.conf.py wsgi:app`` instead.
+"""
 from api import create_app
 import os
 
 app = create_app()
 
 if __name__ == '__main__':
-    # Ensure database tables are created
-    with app.app_context():
-        from api.models.expense import db
-        db.create_all()
-    
     # Run the application
     port = int(os.environ.get('PORT', 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
+    debug = os.environ.get('FLASK_DEBUG', '1') == '1'
+    app.run(debug=debug, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""Full-text search over expense and income descriptions and categories/sources.
+
+On SQLite the text lives in an FTS5 table, ``transaction_search``, kept in
+sync by triggers on ``expenses`` and ``incomes``, so every write path (routes,
+batch, bulk import, data generation) updates it in the same transaction. Its
+rowid encodes the source row (``id * 2`` for expenses, ``id * 2 + 1`` for
+incomes), which makes trigger updates point lookups and lets hits join
+straight back to their rows by primary key. The owning user is indexed as a
+``tenant`` token (``u<id>``) and required inside the MATCH expression, so a
+search only walks the posting lists of the current user's rows instead of
+scoring every tenant's matches and filtering them afterwards.
+
+Queries are tokenized and every term is a prefix match (``ub`` finds "Uber
+ride"); results are ranked by bm25 or ordered by date, filtered by kind and
+date range, and paged with an opaque offset cursor. Other databases, or an
+SQLite build without FTS5, fall back to LIKE matching ordered by date.
+"""
+import base64
+import logging
+import re
+from sqlalchemy import Date, Integer, String, and_, literal, or_, text, union_all
+from sqlalchemy.exc import OperationalError
+from api import db
+from api.models.expense import Expense
+from api.models.income import Income
+from api.money import from_cents
+from api.pagination import PaginationError, parse_date, parse_limit
+from api.tenancy import current_user_id
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('expense', 'income')
+ORDERS = ('rank', 'date')
+MAX_TERMS = 8
+FIELDS = ('kind', 'id', 'label', 'amount', 'description', 'date')
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+_SCHEMA = [
+    # prefix='2 3' keeps extra indexes for 2- and 3-character prefixes so short prefix queries stay fast
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transaction_search USING fts5(
+        description, label, tenant,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+]
+_TRIGGERS = []
+for _table, _label, _parity in (('expenses', 'category', 0), ('incomes', 'source', 1)):
+    _TRIGGERS += [f'{_table}_search_insert', f'{_table}_search_update', f'{_table}_search_delete']
+    _SCHEMA += [
+        f"""CREATE TRIGGER IF NOT EXISTS {_table}_search_insert AFTER INSERT ON {_table} BEGIN
+            INSERT INTO transaction_search (rowid, description, label, tenant)
+            VALUES (new.id * 2 + {_parity}, new.description, new.{_label}, 'u' || new.user_id);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {_table}_search_update
+        AFTER UPDATE OF description, {_label}, user_id ON {_table} BEGIN
+            UPDATE transaction_search
+            SET description = new.description, label = new.{_label}, tenant = 'u' || new.user_id
+            WHERE rowid = old.id * 2 + {_parity};
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {_table}_search_delete AFTER DELETE ON {_table} BEGIN
+            DELETE FROM transaction_search WHERE rowid = old.id * 2 + {_parity};
+        END""",
+    ]
+
+_BACKFILL = """
+    INSERT INTO transaction_search (rowid, description, label, tenant)
+    SELECT id * 2, description, category, 'u' || user_id FROM expenses
+    UNION ALL
+    SELECT id * 2 + 1, description, source, 'u' || user_id FROM incomes
+"""
+
+_available = None
+
+
+def available():
+    """True when the FTS5 index is in use (SQLite with FTS5 compiled in); checked once per process"""
+    global _available
+    if _available is None:
+        _available = db.engine.dialect.name == 'sqlite' and db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transaction_search'"
+        )).first() is not None
+    return _available
+
+
+def ensure_index():
+    """Create the FTS5 table and its triggers, filling the table when it is new.
+
+    A table from before the ``tenant`` column is dropped with its triggers and
+    rebuilt. Returns True when the index was (re)built. Call inside an app
+    context after ``db.create_all()``.
+    """
+    global _available
+    if db.engine.dialect.name != 'sqlite':
+        _available = False
+        return False
+    try:
+        with db.engine.begin() as connection:
+            existed = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transaction_search'"
+            )).first() is not None
+            if existed and 'tenant' not in {row[1] for row in connection.execute(
+                    text('PRAGMA table_info(transaction_search)'))}:
+                for trigger in _TRIGGERS:
+                    connection.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+                connection.execute(text('DROP TABLE transaction_search'))
+                existed = False
+            for statement in _SCHEMA:
+                connection.execute(text(statement))
+            if not existed:
+                connection.execute(text(_BACKFILL))
+    except OperationalError as e:
+        logger.warning('FTS5 unavailable, search falls back to LIKE matching: %s', e)
+        _available = False
+        return False
+    _available = True
+    return not existed
+
+
+def rebuild():
+    """Refill the FTS5 table from the transaction rows"""
+    if not available():
+        return
+    with db.engine.begin() as connection:
+        connection.execute(text('DELETE FROM transaction_search'))
+        connection.execute(text(_BACKFILL))
+        connection.execute(text("INSERT INTO transaction_search (transaction_search) VALUES ('optimize')"))
+
+
+# ===== QUERY PARSING =====
+def parse_terms(value):
+    """Split free text into at most MAX_TERMS lower-cased search terms"""
+    terms = [term.lower() for term in _TOKEN.findall(value or '')]
+    if not terms:
+        raise PaginationError('Missing search query. Use ?q=<text>')
+    return terms[:MAX_TERMS]
+
+
+def match_expression(terms, user_id):
+    """FTS5 MATCH string: the user's tenant token, and every term as a word prefix of the description or label"""
+    prefixes = ' '.join(f'"{term}"*' for term in terms)
+    return f'tenant : "u{int(user_id)}" AND {{description label}} : ({prefixes})'
+
+
+def _encode_offset(offset):
+    return base64.urlsafe_b64encode(f'o{offset}'.encode()).decode().rstrip('=')
+
+
+def _decode_offset(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        if raw[0] != 'o':
+            raise ValueError(raw)
+        return int(raw[1:])
+    except Exception:
+        raise PaginationError('Invalid cursor')
+
+
+def parse_args(args):
+    """Validate the /search query string into keyword arguments for ``search``"""
+    kind = args.get('kind')
+    if kind and kind not in KINDS:
+        raise PaginationError(f"Invalid kind '{kind}'. Use expense or income")
+    order = args.get('order', 'rank')
+    if order not in ORDERS:
+        raise PaginationError(f"Invalid order '{order}'. Use rank or date")
+    cursor = args.get('cursor')
+    return {
+        'terms': parse_terms(args.get('q')),
+        'kind': kind,
+        'date_from': parse_date(args, 'from'),
+        'date_to': parse_date(args, 'to'),
+        'order': order,
+        'limit': parse_limit(args),
+        'offset': _decode_offset(cursor) if cursor else 0,
+    }
+
+
+# ===== SEARCH =====
+def _fts_rows(terms, kind, date_from, date_to, order, limit, offset):
+    parts = []
+    params = {'query': match_expression(terms, current_user_id()), 'limit': limit, 'offset': offset}
+    for name, table, label, parity in (('expense', 'expenses', 'category', 0), ('income', 'incomes', 'source', 1)):
+        if kind and kind != name:
+            continue
+        conditions = [f'hits.doc % 2 = {parity}']
+        if date_from:
+            conditions.append('t.date >= :date_from')
+        if date_to:
+            conditions.append('t.date <= :date_to')
+        parts.append(
+            f"SELECT '{name}' AS kind, t.id AS id, t.{label} AS label, t.amount_cents AS amount_cents, "
+            f"t.description AS description, t.date AS date, hits.score AS score "
+            f"FROM hits JOIN {table} t ON t.id = hits.doc / 2 WHERE {' AND '.join(conditions)}"
+        )
+    # SQLAlchemy stores Date columns on SQLite as ISO strings, which compare in date order
+    params.update(date_from=date_from and date_from.isoformat(), date_to=date_to and date_to.isoformat())
+    ordering = 'score, date DESC, id DESC' if order == 'rank' else 'date DESC, id DESC'
+    statement = text(
+        'WITH hits AS ('
+        ' SELECT rowid AS doc, bm25(transaction_search, 1.0, 1.0, 0.0) AS score FROM transaction_search'
+        ' WHERE transaction_search MATCH :query'
+        f") {' UNION ALL '.join(parts)} ORDER BY {ordering} LIMIT :limit OFFSET :offset"
+    ).columns(kind=String, id=Integer, label=String, amount_cents=Integer, description=String, date=Date)
+    return db.session.execute(statement, params).all()
+
+
+def _like_rows(terms, kind, date_from, date_to, order, limit, offset):
+    selects = []
+    for name, model, label in (('expense', Expense, Expense.category), ('income', Income, Income.source)):
+        if kind and kind != name:
+            continue
+        conditions = [model.user_id == current_user_id()]
+        conditions += [or_(model.description.ilike(f'%{term}%'), label.ilike(f'%{term}%')) for term in terms]
+        if date_from:
+            conditions.append(model.date >= date_from)
+        if date_to:
+            conditions.append(model.date <= date_to)
+        selects.append(db.select(
+            literal(name).label('kind'), model.id.label('id'), label.label('label'),
+            model.amount_cents.label('amount_cents'), model.description.label('description'),
+            model.date.label('date'),
+        ).where(and_(*conditions)))
+    combined = union_all(*selects).subquery() if len(selects) > 1 else selects[0].subquery()
+    statement = (db.select(combined).order_by(combined.c.date.desc(), combined.c.id.desc())
+                 .limit(limit).offset(offset))
+    return db.session.execute(statement).all()
+
+
+def search(terms, kind=None, date_from=None, date_to=None, order='rank', limit=100, offset=0):
+    """Return (rows, next_cursor) for the current user; rows are tuples in FIELDS order"""
+    find = _fts_rows if available() else _like_rows
+    rows = find(terms, kind, date_from, date_to, order, limit + 1, offset)
+    next_cursor = _encode_offset(offset + limit) if len(rows) > limit else None
+    return [(row.kind, row.id, row.label, from_cents(row.amount_cents), row.description, row.date)
+            for row in rows[:limit]], next_cursor
\ No newline at end of file
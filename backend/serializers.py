@@ -0,0 +1,102 @@
+"""Fast JSON serialization for transaction listings.
+
+Listings are read as plain column tuples (``db.session.query(*columns)``), so
+no ORM objects enter the identity map, and encoded in one call:
+
+* with ``orjson`` installed, dates and datetimes are encoded natively in C;
+* otherwise the stdlib encoder is used and date columns are formatted in bulk,
+  once per distinct value (a page usually shares a handful of dates).
+
+Two response shapes are supported: ``records`` (a list of objects, the
+default, same keys as ``to_dict()``) and ``columnar`` (one array per field,
+compact and ready for charts).
+"""
+import json
+from datetime import date, datetime
+from flask import current_app
+from api.models.expense import Expense
+from api.models.income import Income
+from api.money import amount_expr
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; the stdlib encoder is used instead
+    orjson = None
+
+SHAPES = ('records', 'columnar')
+
+_FIELDS = {
+    Expense: ('id', 'category', 'amount', 'description', 'date', 'created_at'),
+    Income: ('id', 'source', 'amount', 'description', 'date', 'is_recurring', 'created_at'),
+}
+_DATE_FIELDS = ('date', 'created_at')
+
+
+def columns_for(model):
+    """Return (field names, column expressions) serialized for ``model``, in ``to_dict`` order.
+
+    ``amount`` is computed in SQL from the integer ``amount_cents`` column.
+    """
+    names = _FIELDS[model]
+    return names, [amount_expr(model.amount_cents).label('amount') if name == 'amount' else getattr(model, name)
+                   for name in names]
+
+
+def _iso_column(values):
+    """isoformat() a column, formatting each distinct value once"""
+    formatted = {}
+    out = []
+    for value in values:
+        text = formatted.get(value)
+        if text is None:
+            text = formatted[value] = value.isoformat() if value is not None else None
+        out.append(text)
+    return out
+
+
+def _columns(names, rows):
+    """Transpose rows into per-field lists, formatting date columns unless orjson will"""
+    if rows:
+        data = [list(column) for column in zip(*rows)]
+    else:
+        data = [[] for _ in names]
+    if orjson is None:
+        for index, name in enumerate(names):
+            if name in _DATE_FIELDS:
+                data[index] = _iso_column(data[index])
+    return data
+
+
+def records(names, rows):
+    """List of dicts, one per row"""
+    if orjson is not None:
+        return [dict(zip(names, row)) for row in rows]
+    return [dict(zip(names, values)) for values in zip(*_columns(names, rows))]
+
+
+def columnar(names, rows):
+    """{'fields': [...], 'count': n, 'data': {field: [values...]}}"""
+    return {'fields': list(names), 'count': len(rows), 'data': dict(zip(names, _columns(names, rows)))}
+
+
+def shape(names, rows, shape_name='records'):
+    if shape_name == 'columnar':
+        return columnar(names, rows)
+    return records(names, rows)
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    """Encode ``payload`` to compact JSON bytes with the fastest available encoder"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), default=_default).encode()
+
+
+def json_response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
\ No newline at end of file
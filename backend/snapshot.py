@@ -0,0 +1,511 @@
+"""Optional in-memory columnar snapshot of each user's expenses and incomes.
+
+With SNAPSHOT_ENABLED the analytics reads in ``aggregates`` (dashboard,
+summaries, ExpenseService) and the insights columns in ``analytics`` are
+answered from NumPy arrays held in process instead of SQL. A user's slice is
+one ``_Table`` per kind: ids, days, month indexes, dictionary-encoded
+category/source codes and amounts in cents, about ``ROW_BYTES`` per row.
+Writes still go to the database only; the mutation hooks ``record`` the
+changed rows and ``mutations.after_commit`` applies them once the commit
+succeeded. A change builds a new table and swaps the slice, so a reader
+always sees one consistent state without taking a lock: appends go into
+spare capacity past the old table's end, updates and deletes copy the
+arrays. Unbounded totals come from a month x category grid kept per table
+and adjusted by each change rather than rescanned.
+
+A slice is tagged with the user's data version (see ``cache``) and only
+served while that version is current, so a change the hooks did not see
+(another process, a bulk load) makes the next read reload the slice. Under
+several workers use CACHE_BACKEND=filesystem so they share versions.
+
+Slices are kept in an LRU bounded by SNAPSHOT_MEMORY_MB; a user whose rows
+would not fit is served from SQL as before. ``warm`` loads the largest users
+that fit at start-up; with gunicorn's ``preload_app`` that happens once in the
+master and the workers share the pages. NumPy is only imported once a
+snapshot is enabled.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from flask import g, has_app_context
+from sqlalchemy import String, cast, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from api import cache, db
+from api.models.expense import Expense
+from api.models.income import Income
+from api.models.rollup import ExpenseMonthlyRollup, IncomeMonthlyRollup
+from api.tenancy import current_user_id
+
+logger = logging.getLogger(__name__)
+
+ROW_BYTES = 28  # id int64 + day int32 + month int32 + code int32 + cents int64
+LOAD_CHUNK_ROWS = 50_000
+GROWTH = 1.25  # spare capacity allocated when a table's buffers are copied
+_COLUMNS = ('ids', 'days', 'months', 'codes', 'cents')
+_EPOCH = date(1970, 1, 1)
+
+# kind: (model, label column, monthly rollup)
+_KINDS = {
+    'expenses': (Expense, Expense.category, ExpenseMonthlyRollup),
+    'incomes': (Income, Income.source, IncomeMonthlyRollup),
+}
+_LABEL_FIELDS = {'expenses': 'category', 'incomes': 'source'}
+
+_settings = {'enabled': False, 'memory_bytes': 256 * 1024 * 1024}
+_slices = OrderedDict()  # user_id -> UserSnapshot, least recently used first
+_oversized = {}  # user_id -> data version at which the user's rows did not fit the budget
+_loads = 0
+_lock = threading.Lock()
+
+
+def _day(value):
+    return (value - _EPOCH).days
+
+
+def _month_label(index):
+    return f"{index // 12}-{index % 12 + 1:02d}"
+
+
+def _month_index(key):
+    year, month = key.split('-')
+    return int(year) * 12 + int(month) - 1
+
+
+def _copy_kept(column, removed, out):
+    """Copy ``column`` without the rows at the sorted positions ``removed`` into ``out``"""
+    import numpy as np
+    if len(removed) > 64:  # many gaps: one masked pass beats a copy per gap
+        keep = np.ones(len(column), dtype=bool)
+        keep[removed] = False
+        np.compress(keep, column, out=out)
+        return
+    written = start = 0
+    for position in [*removed.tolist(), len(column)]:
+        out[written:written + position - start] = column[start:position]
+        written += position - start
+        start = position + 1
+
+
+class _Table:
+    """One user's expenses or incomes as parallel arrays (in no particular order); never modified once built.
+
+    Appends write past the table's end into spare capacity of buffers shared
+    with the table they were appended to (``_store``), which that older table
+    never reads, so a create costs O(rows added). Updates and deletes copy the
+    kept rows into new buffers.
+    """
+    __slots__ = _COLUMNS + ('dictionary', 'labels', '_store', '_grid', '_max_id')
+
+    def __init__(self, ids, days, months, codes, cents, dictionary, store=None):
+        self.ids = ids          # int64 row ids
+        self.days = days        # int32 days since 1970-01-01
+        self.months = months    # int32 month index: year * 12 + month - 1
+        self.codes = codes      # int32 index into labels
+        self.cents = cents      # int64 amounts
+        self.dictionary = dictionary  # label -> code, in first-seen order
+        self.labels = list(dictionary)
+        self._store = store     # [buffers, rows written] when the columns are views of larger buffers
+        self._grid = None
+        self._max_id = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def max_id(self):
+        if self._max_id is None:
+            self._max_id = int(self.ids.max()) if len(self) else 0
+        return self._max_id
+
+    @property
+    def columns(self):
+        return tuple(getattr(self, field) for field in _COLUMNS)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self._store[0] if self._store else self.columns))
+
+    @classmethod
+    def from_rows(cls, rows, dictionary):
+        """Build from (id, date or YYYY-MM-DD, label, cents) tuples; new labels are added to ``dictionary``"""
+        import numpy as np
+        if not rows:
+            ids, dates, names, cents = (), (), (), ()
+        else:
+            ids, dates, names, cents = zip(*rows)
+        days = np.array(dates, dtype='datetime64[D]')
+        return cls(
+            np.array(ids, dtype=np.int64),
+            days.astype(np.int32),
+            (days.astype('datetime64[M]').astype(np.int32) + 1970 * 12).astype(np.int32),
+            np.fromiter((dictionary.setdefault(name, len(dictionary)) for name in names),
+                        dtype=np.int32, count=len(names)),
+            np.array(cents, dtype=np.int64),
+            dictionary
+        )
+
+    @classmethod
+    def concatenate(cls, tables, dictionary):
+        import numpy as np
+        return cls(*(np.concatenate([getattr(table, field) for table in tables]) for field in _COLUMNS), dictionary)
+
+    def with_changes(self, changes):
+        """A new table with ``changes`` ({id: (id, date, label, cents) or None for deleted}) applied"""
+        import numpy as np
+        dictionary = dict(self.dictionary)
+        added = _Table.from_rows([row for row in changes.values() if row is not None], dictionary)
+        changed = np.fromiter(changes, dtype=np.int64, count=len(changes))
+        if len(changed) and int(changed.min()) <= self.max_id():
+            removed = np.flatnonzero(np.isin(self.ids, changed))
+        else:  # only new ids (creates): nothing to look up
+            removed = np.zeros(0, dtype=np.int64)
+        kept = len(self) - len(removed)
+        size = kept + len(added)
+
+        store = self._store
+        if len(removed) or store is None or store[1] != len(self) or len(store[0][0]) < size:
+            buffers = tuple(np.empty(max(int(size * GROWTH), size + 16), dtype=column.dtype) for column in self.columns)
+            for buffer, column in zip(buffers, self.columns):
+                _copy_kept(column, removed, buffer[:kept])
+            store = [buffers, kept]
+        for buffer, column in zip(store[0], added.columns):
+            buffer[store[1]:size] = column
+        store[1] = size
+
+        table = _Table(*(buffer[:size] for buffer in store[0]), dictionary, store)
+        table._max_id = max(self.max_id(), int(changed.max()) if len(changed) else 0)
+        if self._grid is not None:
+            table._grid = self._grid_after(removed, added, len(dictionary))
+        return table
+
+    # ===== QUERIES =====
+    def grid(self):
+        """(first month index, counts, cents, cents^2) as month x code matrices, built on first use.
+
+        Unbounded queries read these few hundred cells instead of the rows.
+        Sums go through float64 ``bincount``: cents are exact below 2**53.
+        """
+        import numpy as np
+        if self._grid is None:
+            first = int(self.months.min()) if len(self) else 0
+            shape = (int(self.months.max()) - first + 1 if len(self) else 0, len(self.labels))
+            cells = (self.months - first).astype(np.int64) * shape[1] + self.codes
+            cents = self.cents.astype(np.float64)
+            size = shape[0] * shape[1]
+            self._grid = (first, *(np.bincount(cells, weights=weights, minlength=size).reshape(shape)
+                                   for weights in (None, cents, cents * cents)))
+        return self._grid
+
+    def _grid_after(self, removed, added, labels):
+        """This table's grid minus the rows at positions ``removed``, plus the ``added`` table's rows"""
+        import numpy as np
+        months = np.concatenate([self.months[removed], added.months]).astype(np.int64)
+        if not len(months):
+            return self._grid
+        codes = np.concatenate([self.codes[removed], added.codes]).astype(np.int64)
+        signs = np.concatenate([np.full(len(removed), -1, dtype=np.int64), np.ones(len(added), dtype=np.int64)])
+        cents = np.concatenate([self.cents[removed], added.cents]).astype(np.float64)
+
+        first, *matrices = self._grid
+        span = len(matrices[0])
+        if not span:
+            first = int(months.min())
+        low, high = min(first, int(months.min())), max(first + span - 1, int(months.max()))
+        grid = [low]
+        for matrix, weights in zip(matrices, (signs, signs * cents, signs * cents * cents)):
+            grown = np.zeros((high - low + 1, labels), dtype=matrix.dtype)
+            grown[first - low:first - low + span, :matrix.shape[1]] = matrix
+            np.add.at(grown, (months - low, codes), weights)
+            grid.append(grown)
+        return tuple(grid)
+
+    def _window(self, start, end):
+        """Mask selecting the rows dated within [start, end] (either bound optional)"""
+        import numpy as np
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.days >= _day(start)
+        if end is not None:
+            mask &= self.days <= _day(end)
+        return mask
+
+    def stats(self, start=None, end=None):
+        """(count, sum(cents), float sum(cents^2))"""
+        import numpy as np
+        if start is None and end is None:
+            _, counts, totals, sum_sq = self.grid()
+            return int(counts.sum()), int(totals.sum()), float(sum_sq.sum())
+        cents = self.cents[self._window(start, end)]
+        squares = cents.astype(np.float64)
+        return len(cents), int(cents.sum()), float((squares * squares).sum())
+
+    def by_label(self, start=None, end=None):
+        """{label: (count, sum(cents), float sum(cents^2))} for labels with rows in range"""
+        import numpy as np
+        if start is None and end is None:
+            counts, totals, sum_sq = (matrix.sum(axis=0) for matrix in self.grid()[1:])
+        else:
+            window = self._window(start, end)
+            codes, cents = self.codes[window], self.cents[window].astype(np.float64)
+            counts, totals, sum_sq = (np.bincount(codes, weights=weights, minlength=len(self.labels))
+                                      for weights in (None, cents, cents * cents))
+        return {self.labels[code]: (int(counts[code]), int(totals[code]), float(sum_sq[code]))
+                for code in np.flatnonzero(counts)}
+
+    def by_month(self, start=None, end=None):
+        """[(YYYY-MM, cents)] ordered by month, for months with rows in range"""
+        import numpy as np
+        if start is None and end is None:
+            first, counts, totals, _ = self.grid()
+            counts, totals = counts.sum(axis=1), totals.sum(axis=1)
+        else:
+            window = self._window(start, end)
+            months = self.months[window]
+            if not len(months):
+                return []
+            first = int(months.min())
+            counts = np.bincount(months - first)
+            totals = np.bincount(months - first, weights=self.cents[window])
+        return [(_month_label(first + int(offset)), int(totals[offset])) for offset in np.flatnonzero(counts)]
+
+    def month_cents(self, months):
+        """{YYYY-MM: cents} for the given month keys that have rows"""
+        first, counts, totals, _ = self.grid()
+        sums = {}
+        for key in months:
+            offset = _month_index(key) - first
+            if 0 <= offset < len(counts) and counts[offset].any():
+                sums[key] = int(totals[offset].sum())
+        return sums
+
+    def count_above(self, cents):
+        return int((self.cents > cents).sum())
+
+    def month_label_rows(self):
+        """The grid's non-empty cells shaped and ordered like the monthly rollups (by month, then label).
+
+        Returns (months, codes, labels, counts, totals, sum_sq); codes index
+        ``labels``, which holds only the labels present, in first-seen order.
+        """
+        import numpy as np
+        first, counts, totals, sum_sq = self.grid()
+        columns = sorted((self.labels[code], code) for code in np.flatnonzero(counts.sum(axis=0)))
+        columns = [code for _, code in columns]
+        offsets, ranks = np.nonzero(counts[:, columns])  # row-major: by month, then label name
+        order = np.argsort(np.unique(ranks, return_index=True)[1])  # label ranks by their first cell
+        first_seen = np.empty(len(columns), dtype=np.int64)
+        first_seen[order] = np.arange(len(columns))
+        cells = (offsets, np.asarray(columns, dtype=np.int64)[ranks])
+        return (
+            (offsets + first).astype(np.int64),
+            first_seen[ranks],
+            np.array([self.labels[columns[rank]] for rank in order], dtype=object),
+            counts[cells].astype(np.int64),
+            np.rint(totals[cells]).astype(np.int64),
+            sum_sq[cells]
+        )
+
+
+class UserSnapshot:
+    """A user's expense and income tables as of one data version"""
+    __slots__ = ('user_id', 'version', 'expenses', 'incomes')
+
+    def __init__(self, user_id, version, expenses, incomes):
+        self.user_id = user_id
+        self.version = version
+        self.expenses = expenses
+        self.incomes = incomes
+
+    @property
+    def nbytes(self):
+        return self.expenses.nbytes + self.incomes.nbytes
+
+    def table(self, model):
+        return self.expenses if model is Expense else self.incomes
+
+
+# ===== LOADING =====
+def _load_table(kind, user_id):
+    """Read one kind of the user's rows in chunks, so the Python row objects never all exist at once"""
+    model, label_column, _ = _KINDS[kind]
+    dictionary = {}
+    # Core rows with the date as text: no ORM row processing, and NumPy parses the dates in bulk
+    result = db.session.connection().execute(
+        select(model.id, cast(model.date, String), label_column, model.amount_cents).where(model.user_id == user_id)
+        .execution_options(yield_per=LOAD_CHUNK_ROWS)
+    )
+    tables = [_Table.from_rows(chunk, dictionary) for chunk in result.partitions()]
+    return _Table.concatenate(tables, dictionary) if tables else _Table.from_rows([], dictionary)
+
+
+def _row_counts(user_id=None):
+    """{user_id: expense + income rows} from the monthly rollups (all users, or just ``user_id``)"""
+    counts = {}
+    for _, _, rollup in _KINDS.values():
+        query = db.session.query(rollup.user_id, func.sum(rollup.count)).group_by(rollup.user_id)
+        if user_id is not None:
+            query = query.filter(rollup.user_id == user_id)
+        for owner, count in query:
+            counts[owner] = counts.get(owner, 0) + (count or 0)
+    return counts
+
+
+def _evict(keep=None):
+    """Drop least recently used slices until the total fits the budget (caller holds _lock)"""
+    total = sum(view.nbytes for view in _slices.values())
+    for user_id in list(_slices):
+        if total <= _settings['memory_bytes']:
+            break
+        if user_id != keep:
+            total -= _slices.pop(user_id).nbytes
+    if total > _settings['memory_bytes'] and keep in _slices:
+        _slices.pop(keep)
+
+
+def _load(user_id, version, rows=None):
+    """Load and register the user's slice at ``version``; None when it would not fit the budget"""
+    global _loads
+    rows = _row_counts(user_id).get(user_id, 0) if rows is None else rows
+    if rows * ROW_BYTES > _settings['memory_bytes']:
+        with _lock:
+            _oversized[user_id] = version
+        return None
+    view = UserSnapshot(user_id, version, _load_table('expenses', user_id), _load_table('incomes', user_id))
+    with _lock:
+        _loads += 1
+        _slices[user_id] = view
+        _slices.move_to_end(user_id)
+        _evict(keep=user_id)
+    return view if user_id in _slices else None
+
+
+def current():
+    """The current user's snapshot, or None when disabled or over budget (read from the database then)"""
+    if not _settings['enabled'] or not has_app_context():
+        return None
+    if '_snapshot' in g:
+        return g._snapshot
+    user_id = current_user_id()
+    version = cache.data_version(user_id)  # read first: a write committed meanwhile makes the next read reload
+    with _lock:
+        view = _slices.get(user_id)
+        if view is not None and view.version == version:
+            _slices.move_to_end(user_id)
+        elif _oversized.get(user_id) == version:
+            view = None
+        else:
+            view = False
+    if view is False:
+        view = _load(user_id, version)
+    g._snapshot = view
+    return view
+
+
+def warm():
+    """Load the users with the most rows until the budget is full; call at start-up inside an app context"""
+    if not _settings['enabled']:
+        return
+    try:
+        budget = _settings['memory_bytes']
+        for user_id, rows in sorted(_row_counts().items(), key=lambda item: item[1], reverse=True):
+            if rows * ROW_BYTES > budget:
+                continue
+            if _load(user_id, cache.data_version(user_id), rows) is not None:
+                budget -= _slices[user_id].nbytes
+        logger.info(f"Snapshot loaded for {len(_slices)} users ({status()['bytes'] / 2 ** 20:.1f} MiB)")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.warning(f'Snapshot not warmed: {e}')
+
+
+# ===== WRITES =====
+def record(kind, upserted=(), deleted=()):
+    """Stage created/updated rows (models or snapshots) and deleted rows for ``apply_pending``.
+
+    Call from the mutation hooks before the commit. Each touched user's slice
+    is remembered as it was now: if it is replaced or loaded before the changes
+    are applied, it may or may not contain them and is dropped instead.
+    """
+    if not _settings['enabled']:
+        return
+    label = _LABEL_FIELDS[kind]
+    pending = g.setdefault('_snapshot_pending', {})
+
+    def changes(user_id):
+        entry = pending.get(user_id)
+        if entry is None:
+            entry = pending[user_id] = {'seen': _slices.get(user_id), 'expenses': {}, 'incomes': {}}
+        return entry[kind] if entry['seen'] is not None else None
+
+    for row in upserted:
+        staged = changes(row.user_id)
+        if staged is not None:
+            if row.id is None:
+                db.session.flush()  # assigns the id; commit would flush anyway
+            staged[row.id] = (row.id, row.date, getattr(row, label), row.amount_cents)
+    for row in deleted:
+        staged = changes(row.user_id)
+        if staged is not None:
+            staged[row.id] = None
+
+
+def apply_pending(user_id, version):
+    """Apply the rows recorded since the last commit; call once the commit bumped ``user_id`` to ``version``.
+
+    The writer's slice moves to the new version only if it was current before
+    the bump; otherwise it missed a change and is dropped to be reloaded.
+    """
+    if not _settings['enabled'] or not has_app_context():
+        return
+    g.pop('_snapshot', None)
+    pending = g.pop('_snapshot_pending', {})
+    with _lock:
+        for owner, entry in pending.items():
+            view = _slices.get(owner)
+            if view is None:
+                continue
+            if view is not entry['seen']:
+                del _slices[owner]
+                continue
+            expenses, incomes = view.expenses, view.incomes
+            if entry['expenses']:
+                expenses = expenses.with_changes(entry['expenses'])
+            if entry['incomes']:
+                incomes = incomes.with_changes(entry['incomes'])
+            _slices[owner] = UserSnapshot(owner, view.version, expenses, incomes)
+        view = _slices.get(user_id)
+        if view is not None:
+            if view.version == version - 1:
+                _slices[user_id] = UserSnapshot(user_id, version, view.expenses, view.incomes)
+            else:
+                del _slices[user_id]
+        if pending:
+            _evict()
+
+
+# ===== SETUP =====
+def enabled():
+    return _settings['enabled']
+
+
+def status():
+    """Loaded users and their memory, for /api/metrics"""
+    with _lock:
+        return {'enabled': _settings['enabled'], 'users': len(_slices),
+                'bytes': sum(view.nbytes for view in _slices.values()), 'loads': _loads}
+
+
+def init_snapshot(app):
+    """Read the snapshot settings from app config and drop any slices of a previous app"""
+    global _loads
+    app.config.setdefault('SNAPSHOT_ENABLED', os.environ.get('SNAPSHOT_ENABLED', '0') == '1')
+    app.config.setdefault('SNAPSHOT_MEMORY_MB', float(os.environ.get('SNAPSHOT_MEMORY_MB', 256)))
+    _settings.update(
+        enabled=app.config['SNAPSHOT_ENABLED'],
+        memory_bytes=int(app.config['SNAPSHOT_MEMORY_MB'] * 1024 * 1024),
+    )
+    with _lock:
+        _slices.clear()
+        _oversized.clear()
+        _loads = 0
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""Per-user partitioning of the transaction data.
+
+Every expense, income and derived row carries a ``user_id``; requests name
+their user in the ``TENANT_HEADER`` header (``X-User-Id`` by default, falling
+back to ``DEFAULT_USER_ID``). Authentication is expected to happen in front of
+the app, which trusts the header. Queries filter on the current user and the
+composite indexes lead with ``user_id``, so a tenant's queries only touch that
+tenant's index ranges however many tenants share the tables.
+"""
+import os
+from flask import g, has_app_context, jsonify, request
+
+DEFAULT_USER_ID = 1
+
+
+def init_tenancy(app):
+    """Resolve the current user at the start of every request"""
+    app.config.setdefault('TENANT_HEADER', os.environ.get('TENANT_HEADER', 'X-User-Id'))
+    header = app.config['TENANT_HEADER']
+
+    @app.before_request
+    def _resolve_user():
+        value = request.headers.get(header)
+        if value is None:
+            g.user_id = DEFAULT_USER_ID
+        elif value.isdigit() and int(value) > 0:
+            g.user_id = int(value)
+        else:
+            return jsonify({'error': f'{header} must be a positive integer'}), 400
+
+
+def current_user_id():
+    """The requesting user, or DEFAULT_USER_ID outside a request (CLI commands, startup)"""
+    if has_app_context():
+        return g.get('user_id', DEFAULT_USER_ID)
+    return DEFAULT_USER_ID
+
+
+def scoped(query, model):
+    """Restrict ``query`` to the current user's rows of ``model``"""
+    return query.filter(model.user_id == current_user_id())
\ No newline at end of file
@@ -0,0 +1,184 @@
+import re
+from datetime import datetime
+from decimal import InvalidOperation
+from api.money import MAX_AMOUNT, MAX_AMOUNT_CENTS, to_cents
+from api.models.budget import DEFAULT_THRESHOLDS
+from api.models.recurrence import FREQUENCIES, KINDS
+
+_MONTH = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+class ValidationError(ValueError):
+    """Raised when a transaction payload fails validation; the message is user facing"""
+
+
+def _parse_amount(value):
+    """Decimal amount -> integer cents, at most MAX_AMOUNT either way"""
+    try:
+        cents = to_cents(value)
+    except (TypeError, ValueError):
+        raise ValidationError('Amount must be a number')
+    except InvalidOperation:  # too many digits to round to cents
+        cents = None
+    if cents is None or abs(cents) > MAX_AMOUNT_CENTS:
+        raise ValidationError(f'Amount must not exceed {MAX_AMOUNT}')
+    return cents
+
+
+def _parse_date(value, default=None):
+    if not value:
+        return default if default is not None else datetime.utcnow().date()
+    try:
+        return datetime.fromisoformat(value).date()
+    except (TypeError, ValueError):
+        raise ValidationError('Invalid date format. Use YYYY-MM-DD')
+
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def parse_expense(data):
+    """Validate a create payload and return the Expense column values"""
+    if not data.get('category') or not data.get('amount'):
+        raise ValidationError('Category and amount are required')
+    return {
+        'category': data['category'],
+        'amount_cents': _parse_amount(data['amount']),
+        'description': data.get('description') or '',
+        'date': _parse_date(data.get('date'))
+    }
+
+
+def parse_income(data):
+    """Validate a create payload and return the Income column values"""
+    if not data.get('source') or not data.get('amount'):
+        raise ValidationError('Source and amount are required')
+    return {
+        'source': data['source'],
+        'amount_cents': _parse_amount(data['amount']),
+        'description': data.get('description') or '',
+        'date': _parse_date(data.get('date')),
+        'is_recurring': _parse_bool(data.get('is_recurring', False))
+    }
+
+
+def parse_expense_changes(data):
+    """Validate an update payload and return only the fields it changes"""
+    changes = {}
+    if data.get('category'):
+        changes['category'] = data['category']
+    if data.get('amount'):
+        changes['amount_cents'] = _parse_amount(data['amount'])
+    if 'description' in data:
+        changes['description'] = data['description']
+    if data.get('date'):
+        changes['date'] = _parse_date(data['date'])
+    return changes
+
+
+def parse_income_changes(data):
+    """Validate an update payload and return only the fields it changes"""
+    changes = {}
+    if data.get('source'):
+        changes['source'] = data['source']
+    if data.get('amount'):
+        changes['amount_cents'] = _parse_amount(data['amount'])
+    if 'description' in data:
+        changes['description'] = data['description']
+    if 'is_recurring' in data:
+        changes['is_recurring'] = _parse_bool(data['is_recurring'])
+    if data.get('date'):
+        changes['date'] = _parse_date(data['date'])
+    return changes
+
+
+def parse_recurrence(data):
+    """Validate a recurrence rule payload and return the RecurrenceRule column values"""
+    if data.get('kind') not in KINDS:
+        raise ValidationError('Kind must be income or expense')
+    if not data.get('label') or not data.get('amount'):
+        raise ValidationError('Label and amount are required')
+    frequency = data.get('frequency') or 'monthly'
+    if frequency not in FREQUENCIES:
+        raise ValidationError('Frequency must be monthly, weekly or custom')
+    try:
+        interval = int(data.get('interval') or 1)
+    except (TypeError, ValueError):
+        raise ValidationError('Interval must be a positive integer')
+    if interval < 1:
+        raise ValidationError('Interval must be a positive integer')
+    start_date = _parse_date(data.get('start_date'))
+    end_date = _parse_date(data['end_date']) if data.get('end_date') else None
+    if end_date is not None and end_date < start_date:
+        raise ValidationError('end_date must not be before start_date')
+    return {
+        'kind': data['kind'],
+        'label': data['label'],
+        'amount_cents': _parse_amount(data['amount']),
+        'description': data.get('description') or '',
+        'frequency': frequency,
+        'interval': interval,
+        'start_date': start_date,
+        'end_date': end_date
+    }
+
+
+def parse_month(value):
+    """Validate an optional YYYY-MM month key"""
+    if not value:
+        return None
+    if not isinstance(value, str) or not _MONTH.match(value):
+        raise ValidationError('Invalid month format. Use YYYY-MM')
+    return value
+
+
+def _parse_thresholds(value):
+    """List of percents -> the comma-separated form stored on Budget"""
+    if not isinstance(value, list) or not value:
+        raise ValidationError('thresholds must be a non-empty list of percentages')
+    try:
+        thresholds = sorted({int(item) for item in value})
+    except (TypeError, ValueError):
+        raise ValidationError('thresholds must be a non-empty list of percentages')
+    if thresholds[0] < 1 or thresholds[-1] > 1000:
+        raise ValidationError('thresholds must be between 1 and 1000 percent')
+    return ','.join(str(threshold) for threshold in thresholds)
+
+
+def _parse_limit(value):
+    if not value:
+        raise ValidationError('Limit is required')
+    try:
+        limit_cents = to_cents(value)
+    except (TypeError, ValueError):
+        raise ValidationError('Limit must be a number')
+    if limit_cents <= 0:
+        raise ValidationError('Limit must be positive')
+    return limit_cents
+
+
+def parse_budget(data):
+    """Validate a budget payload and return the Budget column values.
+
+    ``category`` omitted means all categories; ``month`` (YYYY-MM) omitted means every month.
+    """
+    month = parse_month(data.get('month'))
+    return {
+        'category': data.get('category') or None,
+        'month': month,
+        'limit_cents': _parse_limit(data.get('limit')),
+        'thresholds': _parse_thresholds(data.get('thresholds', list(DEFAULT_THRESHOLDS)))
+    }
+
+
+def parse_budget_changes(data):
+    """Validate a budget update; only the limit and thresholds can change"""
+    changes = {}
+    if 'limit' in data:
+        changes['limit_cents'] = _parse_limit(data['limit'])
+    if 'thresholds' in data:
+        changes['thresholds'] = _parse_thresholds(data['thresholds'])
+    return changes
\ No newline at end of file
@@ -0,0 +1,12 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+``create_app()`` runs once here; with ``preload_app`` (see gunicorn.conf.py)
+that is in the master process, so the schema version check (and, with
+``DB_AUTO_INIT``, any schema initialization) happens once instead of once per
+worker. Run ``flask init-db`` when deploying and set ``DB_AUTO_INIT=0``.
+"""
+from api import create_app
+
+app = create_app()
\ No newline at end of file